@@ -16,54 +16,231 @@ Some code generate with ChatGPT (OpenAI)
 
 import argparse
 import logging
-import logging.config
 import sys
+from typing import TYPE_CHECKING, Any, Optional
 
-from raypack.build import run_with_config
-from raypack.config_loading import CONFIG_INFO, Config
-from raypack.logging_utils import configure_logging
-from raypack.pyproject_interface import override_config_from_toml
+# Only argparse at startup, so --help and --version stay fast. Each command
+# imports what it needs (boto3, toml, poetry) when it runs.
+if TYPE_CHECKING:
+    from raypack.config_loading import Config
 
 logger = logging.getLogger(__name__)
 
+# CLI options that override [tool.raypack] when given on the command line.
+CLI_OVERRIDES = ["incremental", "pack_jobs", "compression", "deterministic", "from_wheels"]
 
-def main() -> int:
-    """Parse args and run the application."""
-    parser = argparse.ArgumentParser(description="Raypack will create a package for AWS Glue, Ray.io tasks.")
+COMMANDS = ("build", "watch", "deploy", "inspect", "cache", "bench")
+
+
+def add_build_arguments(parser: argparse.ArgumentParser, suppress: bool = False) -> None:
+    """Options of the build command, also accepted without naming the command.
+
+    With suppress, options not given leave no value behind, so `raypack --jobs 4 build`
+    keeps the 4 instead of getting the build subcommand's default.
+    """
+
+    def default(value: Any) -> Any:
+        return argparse.SUPPRESS if suppress else value
 
     # Adding arguments based on the CONFIG_INFO structure
     parser.add_argument(
         "--exclude-packaging-cruft",
         action="store_true",
         help="Exclude packaging cruft files. Default is True.",
-        default=True,
+        default=default(True),
     )
     parser.add_argument(
-        "--outer-folder-name", type=str, help="Name of the outer folder. Default is 'venv'.", default="venv"
+        "--outer-folder-name", type=str, help="Name of the outer folder. Default is 'venv'.", default=default("venv")
     )
     parser.add_argument(
-        "--source-venv", type=str, help="Source virtual environment. Default is 'vendor'.", default="vendor"
+        "--source-venv", type=str, help="Source virtual environment. Default is 'vendor'.", default=default("vendor")
     )
     parser.add_argument(
         "--venv-tool",
         type=str,
-        choices=["poetry", "pip"],
-        help="Tool used for managing the virtual environment. Default is 'poetry'.",
-        default="poetry",
+        choices=["poetry", "pip", "uv"],
+        help="Tool used for managing the virtual environment, uv installs from uv.lock. Default is 'poetry'.",
+        default=default("poetry"),
     )
     parser.add_argument(
         "--deps-are-pure-python",
         action="store_true",
         help="Specify if the dependencies are pure Python. Default is True.",
-        default=True,
+        default=default(True),
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Reuse unchanged entries from the previous zip. Default is False.",
+        default=default(None),
+    )
+    parser.add_argument(
+        "--jobs",
+        dest="pack_jobs",
+        type=int,
+        help="Threads used to compress files. Default is 0, one per CPU.",
+        default=default(None),
     )
+    parser.add_argument(
+        "--compression",
+        type=str,
+        help="Compression method and optional level, e.g. stored, deflate:9, bzip2, lzma. Default is deflate.",
+        default=default(None),
+    )
+    parser.add_argument(
+        "--compression-report",
+        action="store_true",
+        help="Compare the size and time of compression policies on the virtual environment, then exit.",
+        default=default(False),
+    )
+    parser.add_argument(
+        "--deterministic",
+        action="store_true",
+        help="Sorted entries, fixed timestamps (SOURCE_DATE_EPOCH) and permissions. Default is False.",
+        default=default(None),
+    )
+    parser.add_argument(
+        "--from-wheels",
+        action="store_true",
+        help="Copy dependencies straight out of downloaded wheels instead of installing them. Default is False.",
+        default=default(None),
+    )
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="Build one shared zip and one zip per [tool.raypack.jobs.<name>] table. Default is False.",
+        default=default(False),
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="PATH",
+        help="Write wall time, CPU time, files and bytes of each build phase to this file.",
+        default=default(None),
+    )
+    parser.add_argument(
+        "--profile-format",
+        choices=["json", "chrome"],
+        help="json, or chrome for a trace that chrome://tracing and Perfetto open. Default is json.",
+        default=default("json"),
+    )
+    parser.add_argument(
+        "--cprofile",
+        action="store_true",
+        help="Also run cProfile, stats go to the --profile path plus .pstats.",
+        default=default(False),
+    )
+    parser.add_argument(
+        "--verify",
+        nargs=2,
+        metavar=("ZIP_A", "ZIP_B"),
+        help="Check that two builds are bit-identical, then exit.",
+        default=default(None),
+    )
+    parser.add_argument("--verbose", action="store_true", help="Increase output verbosity.", default=default(False))
+
 
-    # Adding version and verbose options
+def make_parser() -> argparse.ArgumentParser:
+    """Parser for all commands. Building needs no command name, `raypack` alone builds."""
+    parser = argparse.ArgumentParser(description="Raypack will create a package for AWS Glue, Ray.io tasks.")
+    add_build_arguments(parser)
     parser.add_argument("--version", action="version", version="%(prog)s 1.0")
-    parser.add_argument("--verbose", action="store_true", help="Increase output verbosity.", default=False)
 
-    # Parse the arguments
-    args = parser.parse_args()
+    subparsers = parser.add_subparsers(dest="command", metavar="{" + ",".join(COMMANDS) + "}")
+    build_parser = subparsers.add_parser("build", help="Build the zip. The default command.")
+    add_build_arguments(build_parser, suppress=True)
+
+    watch_parser = subparsers.add_parser(
+        "watch", help="Build, then update the zip as files change. Dependencies must be installed, run build first."
+    )
+    watch_parser.add_argument("--output", help="Zip to keep up to date. Default is the build's name.", default=None)
+    watch_parser.add_argument("--poll", action="store_true", help="Poll for changes instead of using inotify.")
+    watch_parser.add_argument("--interval", type=float, help="Seconds between polls. Default is 0.5.", default=0.5)
+
+    deploy_parser = subparsers.add_parser("deploy", help="Point Glue jobs at an uploaded artifact, many at once.")
+    deploy_parser.add_argument("jobs", nargs="+", metavar="JOB", help="Glue job names.")
+    deploy_parser.add_argument(
+        "--py-modules", nargs="+", required=True, metavar="S3_URL", help="Zips for --s3-py-modules, in order."
+    )
+    deploy_parser.add_argument("--script-location", help="New script for every job. Default keeps theirs.", default="")
+    deploy_parser.add_argument(
+        "--concurrency", type=int, help="Jobs updated at once. Default is glue_update_concurrency.", default=None
+    )
+    deploy_parser.add_argument("--endpoint-url", help="Glue endpoint, e.g. for a local test server.", default=None)
+
+    inspect_parser = subparsers.add_parser(
+        "inspect", help="Sizes, compression and binaries of a built zip. Exits 1 if a binary won't load on Glue."
+    )
+    inspect_parser.add_argument("zip", metavar="ZIP", help="Zip to inspect.")
+    inspect_parser.add_argument("--json", dest="json_path", help="Write the report to this file.", default=None)
+    inspect_parser.add_argument("--top", type=int, help="Top-level entries to list, biggest first.", default=20)
+
+    cache_parser = subparsers.add_parser("cache", help="Inspect and prune the shared wheel cache.")
+    cache_parser.add_argument("action", choices=["list", "prune", "clear"], nargs="?", default="list")
+    cache_parser.add_argument(
+        "--max-mb", type=int, help="Prune down to this size. Default is wheel_cache_max_mb.", default=None
+    )
+
+    bench_parser = subparsers.add_parser("bench", help="Cold start benchmark of a built zip, or two side by side.")
+    bench_parser.add_argument("zips", nargs="+", metavar="ZIP", help="One zip, or two to compare.")
+    bench_parser.add_argument("--json", dest="json_path", help="Write the report to this file.", default=None)
+    bench_parser.add_argument("--python", help="Interpreter to import with. Default is this one.", default=None)
+    bench_parser.add_argument("--modules", nargs="+", help="Modules to import. Default is every top-level package.")
+    bench_parser.add_argument("--repeat", type=int, help="Imports per module, the fastest counts.", default=1)
+    bench_parser.add_argument(
+        "--mode",
+        choices=["extracted", "zipimport"],
+        help="Import from the extracted zip or the zip itself.",
+        default="extracted",
+    )
+    bench_parser.add_argument(
+        "--fail-over",
+        type=float,
+        help="Exit 1 if the second zip is worse by more than this, e.g. 0.1 for 10%%.",
+        default=None,
+    )
+    return parser
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """Parse args and run the command."""
+    parser = make_parser()
+    args = parser.parse_args(argv)
+
+    if args.command == "cache":
+        return cache_command(args.action, args.max_mb)
+    if args.command == "watch":
+        return watch_command(args.output, args.poll, args.interval, args.verbose)
+    if args.command == "deploy":
+        return deploy_command(args.jobs, args.py_modules, args.script_location, args.concurrency, args.endpoint_url)
+    if args.command == "inspect":
+        return inspect_command(args.zip, args.json_path, args.top)
+    if args.command == "bench":
+        if len(args.zips) > 2:  # noqa: PLR2004
+            parser.error("bench takes one zip, or two to compare")
+        from raypack.bench import run_bench  # pylint: disable=import-outside-toplevel
+
+        return run_bench(
+            args.zips,
+            json_path=args.json_path,
+            python=args.python,
+            modules=args.modules,
+            repeat=args.repeat,
+            mode=args.mode,
+            fail_over=args.fail_over,
+        )
+    return build_command(args)
+
+
+def build_command(args: argparse.Namespace) -> int:
+    """raypack [build] [options]"""
+    # pylint: disable=import-outside-toplevel
+    from raypack.config_loading import CONFIG_INFO, Config
+    from raypack.profiling import profiling
+
+    if args.verify:
+        from raypack.reproducible import verify_identical
+
+        return 0 if verify_identical(*args.verify) else 1
 
     # Use the gathered values
     config_info = {
@@ -81,9 +258,13 @@ def main() -> int:
     }
     config = Config.from_dict(config_info)
 
+    # Options that were explicitly passed win over pyproject.toml
+    overrides = {key: getattr(args, key) for key in CLI_OVERRIDES if getattr(args, key) is not None}
+
     # pylint: disable=broad-except,bare-except
     try:
-        use_args(config, args.verbose)
+        with profiling(args.profile, args.profile_format, args.cprofile):
+            use_args(config, args.verbose, overrides, args.compression_report, args.batch)
         return 0
     except:
         if args.verbose:
@@ -91,14 +272,113 @@ def main() -> int:
         return -1
 
 
-def use_args(_config: Config, verbose: bool) -> None:
+def watch_command(
+    output: Optional[str] = None, poll: bool = False, interval: float = 0.5, verbose: bool = False
+) -> int:
+    """raypack watch"""
+    # pylint: disable=import-outside-toplevel
+    from logging.config import dictConfig
+
+    from raypack.config_loading import CONFIG_INFO, Config
+    from raypack.logging_utils import configure_logging
+    from raypack.pyproject_interface import override_config_from_toml
+    from raypack.watch import run_watch
+
+    if verbose:
+        dictConfig(configure_logging())
+    override_config_from_toml(CONFIG_INFO)
+    config = Config.from_dict(CONFIG_INFO)
+    return run_watch(config, output, poll, interval)
+
+
+def inspect_command(zip_path: str, json_path: Optional[str] = None, top: int = 20) -> int:
+    """raypack inspect ZIP"""
+    # pylint: disable=import-outside-toplevel
+    from raypack.config_loading import CONFIG_INFO, Config
+    from raypack.inspect_zip import run_inspect
+    from raypack.pyproject_interface import override_config_from_toml
+
+    override_config_from_toml(CONFIG_INFO)
+    config = Config.from_dict(CONFIG_INFO)
+    return run_inspect(zip_path, json_path, top, config.target_machine, config.target_glibc)
+
+
+def cache_command(action: str, max_mb: Optional[int] = None) -> int:
+    """raypack cache list|prune|clear"""
+    # pylint: disable=import-outside-toplevel
+    from raypack.config_loading import CONFIG_INFO, Config
+    from raypack.pyproject_interface import override_config_from_toml
+    from raypack.wheel_cache import WheelCache, format_entries
+
+    override_config_from_toml(CONFIG_INFO)
+    config = Config.from_dict(CONFIG_INFO)
+    cache = WheelCache(config.wheel_cache_dir or None, config.wheel_cache_max_mb)
+    if action == "prune":
+        removed = cache.prune(max_mb * 1024 * 1024 if max_mb is not None else None)
+        print(f"Removed {len(removed)} wheels from {cache.root}")
+    elif action == "clear":
+        print(f"Removed {cache.clear()} wheels from {cache.root}")
+    else:
+        print(f"Wheel cache at {cache.root}")
+        print(format_entries(cache.entries()))
+    return 0
+
+
+def deploy_command(
+    jobs: list[str],
+    py_modules: list[str],
+    script_location: str = "",
+    concurrency: Optional[int] = None,
+    endpoint_url: Optional[str] = None,
+) -> int:
+    """raypack deploy JOB... --py-modules S3_URL..."""
+    # pylint: disable=import-outside-toplevel
+    from raypack.config_loading import CONFIG_INFO, Config
+    from raypack.deploy import deploy_to_jobs
+    from raypack.glue_interface import JobTarget
+    from raypack.pyproject_interface import override_config_from_toml
+
+    override_config_from_toml(CONFIG_INFO)
+    config = Config.from_dict(CONFIG_INFO)
+    targets = [JobTarget(job, py_modules, script_location) for job in jobs]
+    ok = deploy_to_jobs(targets, concurrency or config.glue_update_concurrency, endpoint_url)
+    return 0 if ok else 1
+
+
+def use_args(
+    _config: "Config",
+    verbose: bool,
+    overrides: Optional[dict[str, Any]] = None,
+    compression_report: bool = False,
+    batch: bool = False,
+) -> None:
     """Run the application."""
+    # pylint: disable=import-outside-toplevel
+    from logging.config import dictConfig
+
+    from raypack.build import report_compression, run_with_config
+    from raypack.config_loading import CONFIG_INFO, Config
+    from raypack.deploy import build_and_deploy, build_and_deploy_batch
+    from raypack.logging_utils import configure_logging
+    from raypack.pyproject_interface import override_config_from_toml
+
     if verbose:
         logging_config = configure_logging()
-        logging.config.dictConfig(logging_config)
+        dictConfig(logging_config)
         logger.info("Verbose mode enabled")
     override_config_from_toml(CONFIG_INFO)
+    if overrides:
+        CONFIG_INFO.update(overrides)
     final_config = Config.from_dict(CONFIG_INFO)
+    if compression_report:
+        report_compression(final_config)
+        return
+    if batch:
+        build_and_deploy_batch(final_config)
+        return
+    if final_config.upload_to_s3:
+        build_and_deploy(final_config)
+        return
     run_with_config(config=final_config)
 
 
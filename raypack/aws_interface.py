@@ -5,16 +5,46 @@ bucket = "your_bucket_name"
 upload_to_s3(output_zip_path, bucket)
 """
 
+import hashlib
+import json
 import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
+from typing import Any, Optional
 
 import boto3
+import botocore.exceptions
 
+from raypack.manifest import hash_file
 
-def upload_to_s3(output_zip_path: str, bucket: str) -> None:
-    """Upload a file to an S3 bucket"""
+logger = logging.getLogger(__name__)
+
+# S3 rejects smaller parts, except for the last one.
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+
+# Object metadata key for the sha256 of the uploaded artifact.
+DIGEST_METADATA_KEY = "raypack-sha256"
+
+# boto3's upload_file switches to multipart at 8 MB with 8 MB parts.
+TRANSFER_PART_SIZE = 8 * 1024 * 1024
+
+
+def upload_to_s3(
+    output_zip_path: str,
+    bucket: str,
+    skip_unchanged: bool = False,
+    s3_client: Any = None,
+    part_size: Optional[int] = None,
+) -> bool:
+    """Upload a file to an S3 bucket. Returns False if skipped because the object is already identical.
+
+    part_size is the part size of an earlier streaming upload, to compare its ETag.
+    """
     # Create an S3 client
-    s3 = boto3.client("s3")
+    s3 = s3_client or boto3.client("s3")
 
     # Convert the string path to a Path object
     path_obj = Path(output_zip_path)
@@ -24,5 +54,215 @@ def upload_to_s3(output_zip_path: str, bucket: str) -> None:
     # Extract the filename from the path to use as the S3 object name
     filename = path_obj.name
 
+    if skip_unchanged and remote_artifact_matches(s3, bucket, filename, str(path_obj), part_size):
+        logger.info(f"s3://{bucket}/{filename} is unchanged, not uploading")
+        return False
+
     # Upload the file to S3
-    s3.upload_file(str(path_obj), bucket, filename)
+    s3.upload_file(
+        str(path_obj), bucket, filename, ExtraArgs={"Metadata": {DIGEST_METADATA_KEY: hash_file(str(path_obj))}}
+    )
+    return True
+
+
+def multipart_etag(path: str, part_size: int) -> str:
+    """ETag S3 gives an object uploaded in parts of part_size."""
+    part_digests = []
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(part_size), b""):
+            part_digests.append(hashlib.md5(chunk).digest())  # noqa: S324 # nosec - S3 ETags are md5
+    combined = hashlib.md5(b"".join(part_digests)).hexdigest()  # noqa: S324 # nosec
+    return f"{combined}-{len(part_digests)}"
+
+
+def file_md5(path: str) -> str:
+    """md5 of a file, the ETag of a single part upload."""
+    digest = hashlib.md5()  # noqa: S324 # nosec - S3 ETags are md5
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(TRANSFER_PART_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def head_object(s3: Any, bucket: str, key: str) -> Optional[dict[str, Any]]:
+    """Metadata of the object at key, None if there is none."""
+    try:
+        return dict(s3.head_object(Bucket=bucket, Key=key))
+    except botocore.exceptions.ClientError as error:
+        if error.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+            return None
+        raise
+
+
+def remote_artifact_matches(s3: Any, bucket: str, key: str, path: str, part_size: Optional[int] = None) -> bool:
+    """Is the object at key the same as the local file?
+
+    Compares the sha256 raypack stores in object metadata, falling back to the
+    ETag for objects uploaded without it.
+    """
+    head = head_object(s3, bucket, key)
+    if head is None:
+        return False
+    if head.get("ContentLength") != os.path.getsize(path):
+        return False
+    remote_digest = head.get("Metadata", {}).get(DIGEST_METADATA_KEY)
+    if remote_digest:
+        return bool(remote_digest == hash_file(path))
+
+    etag = head.get("ETag", "").strip('"')
+    if "-" not in etag:
+        return etag == file_md5(path)
+    part_sizes = {TRANSFER_PART_SIZE} if part_size is None else {part_size, TRANSFER_PART_SIZE}
+    return any(etag == multipart_etag(path, size) for size in part_sizes)
+
+
+class StreamingUploader:
+    """Multipart upload of a file that is still being written.
+
+    Call feed() whenever more of the file is final, complete() once it is closed.
+    Part boundaries are fixed multiples of part_size, so an interrupted upload can
+    be resumed from the state file: parts whose bytes are unchanged are not sent again.
+    """
+
+    def __init__(
+        self,
+        bucket: str,
+        key: str,
+        *,
+        part_size: int = 8 * 1024 * 1024,
+        concurrency: int = 4,
+        state_file: Optional[str] = None,
+        s3_client: Any = None,
+    ) -> None:
+        if part_size < MIN_PART_SIZE:
+            raise ValueError(f"S3 parts must be at least {MIN_PART_SIZE} bytes, got {part_size}")
+        self.bucket = bucket
+        self.key = key
+        self.part_size = part_size
+        self.state_file = state_file
+        self.s3 = s3_client or boto3.client("s3")
+        self.upload_id = ""
+        # part number -> {"ETag": ..., "md5": ...}
+        self.parts: dict[int, dict[str, str]] = {}
+        self.next_part = 1
+        self.uploaded = 0
+        self.skipped = 0
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max(1, concurrency))
+        self._futures: list[Future[None]] = []
+
+    def start(self) -> None:
+        """Resume the upload in the state file, or start a new one."""
+        state = self._load_state()
+        if state:
+            self.upload_id = state["upload_id"]
+            self.parts = {int(number): part for number, part in state["parts"].items()}
+            logger.info(f"Resuming upload of s3://{self.bucket}/{self.key}, {len(self.parts)} parts already sent")
+            return
+        response = self.s3.create_multipart_upload(Bucket=self.bucket, Key=self.key)
+        self.upload_id = response["UploadId"]
+        self._save_state()
+
+    def _load_state(self) -> Optional[dict[str, Any]]:
+        """State of an earlier upload of the same object, if S3 still knows about it."""
+        if not self.state_file or not os.path.exists(self.state_file):
+            return None
+        try:
+            with open(self.state_file, encoding="utf-8") as file:
+                state = json.load(file)
+        except ValueError:
+            logger.warning(f"Ignoring unreadable upload state {self.state_file}")
+            return None
+        if (state.get("bucket"), state.get("key"), state.get("part_size")) != (
+            self.bucket,
+            self.key,
+            self.part_size,
+        ):
+            return None
+        try:
+            listed = self.s3.list_parts(Bucket=self.bucket, Key=self.key, UploadId=state["upload_id"])
+        except self.s3.exceptions.NoSuchUpload:
+            logger.info("Previous multipart upload is gone, starting over")
+            return None
+        remote = {part["PartNumber"]: part["ETag"] for part in listed.get("Parts", [])}
+        state["parts"] = {
+            number: part for number, part in state.get("parts", {}).items() if remote.get(int(number)) == part["ETag"]
+        }
+        return dict(state)
+
+    def _save_state(self) -> None:
+        if not self.state_file:
+            return
+        with self._lock:
+            state = {
+                "bucket": self.bucket,
+                "key": self.key,
+                "part_size": self.part_size,
+                "upload_id": self.upload_id,
+                "parts": {str(number): part for number, part in sorted(self.parts.items())},
+            }
+        with open(self.state_file, "w", encoding="utf-8") as file:
+            json.dump(state, file, indent=1)
+
+    def feed(self, path: str, stable_size: int) -> None:
+        """Queue every whole part that lies below stable_size."""
+        while self.next_part * self.part_size <= stable_size:
+            self._submit(path, self.next_part, self.part_size)
+            self.next_part += 1
+
+    def _submit(self, path: str, part_number: int, size: int) -> None:
+        self._futures.append(self._pool.submit(self._upload_part, path, part_number, size))
+
+    def _upload_part(self, path: str, part_number: int, size: int) -> None:
+        with open(path, "rb") as file:
+            file.seek((part_number - 1) * self.part_size)
+            data = file.read(size)
+        md5 = hashlib.md5(data).hexdigest()  # noqa: S324 # nosec - same digest S3 uses for ETags
+        with self._lock:
+            previous = self.parts.get(part_number)
+        if previous and previous["md5"] == md5:
+            with self._lock:
+                self.skipped += 1
+            return
+        response = self.s3.upload_part(
+            Bucket=self.bucket, Key=self.key, UploadId=self.upload_id, PartNumber=part_number, Body=data
+        )
+        with self._lock:
+            self.parts[part_number] = {"ETag": response["ETag"], "md5": md5}
+            self.uploaded += 1
+        self._save_state()
+
+    def wait(self) -> None:
+        """Wait for the parts queued so far, e.g. before the file they are read from is renamed."""
+        for future in self._futures:
+            future.result()
+
+    def complete(self, path: str) -> dict[str, Any]:
+        """Send the rest of the file, wait for all parts and finish the upload."""
+        total = os.path.getsize(path)
+        self.feed(path, total)
+        remainder = total - (self.next_part - 1) * self.part_size
+        if remainder > 0 or self.next_part == 1:
+            self._submit(path, self.next_part, remainder)
+            self.next_part += 1
+        try:
+            self.wait()
+        finally:
+            self._pool.shutdown(wait=True)
+        last_part = self.next_part - 1
+        parts = [{"PartNumber": number, "ETag": self.parts[number]["ETag"]} for number in range(1, last_part + 1)]
+        response = self.s3.complete_multipart_upload(
+            Bucket=self.bucket, Key=self.key, UploadId=self.upload_id, MultipartUpload={"Parts": parts}
+        )
+        logger.info(f"Uploaded s3://{self.bucket}/{self.key}: {self.uploaded} parts sent, {self.skipped} reused")
+        if self.state_file and os.path.exists(self.state_file):
+            os.remove(self.state_file)
+        return dict(response)
+
+    def abort(self) -> None:
+        """Give up on the upload and forget it."""
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        if self.upload_id:
+            self.s3.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+        if self.state_file and os.path.exists(self.state_file):
+            os.remove(self.state_file)
@@ -0,0 +1,228 @@
+"""
+Build zips for several Glue jobs of one repository at once.
+
+Each [tool.raypack.jobs.<name>] table describes a job: the top-level
+distributions it needs and globs of files only it uses. The virtual
+environment is installed and scanned once. Distributions every job needs,
+with our own wheel, go into one common zip; each job gets a small zip with the
+rest. A job is given both, as a comma separated --s3-py-modules list.
+"""
+
+import logging
+import os
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from raypack.build import (
+    DEFAULT_EXCLUSIONS,
+    check_venv_binaries,
+    compression_policy,
+    create_filename,
+    find_single_whl_in_dist,
+    prepare_venv_index,
+    report_binaries,
+    validate_modes,
+    zipup_own_module,
+    zipup_own_module_from_wheel,
+    zipup_virtualenv,
+)
+from raypack.bytecode import precompile
+from raypack.config_loading import Config
+from raypack.packing import resolve_jobs
+from raypack.profiling import phase
+from raypack.pyproject_interface import get_project_info_from_toml
+from raypack.reproducible import reproducible_date_time
+from raypack.runtime_baseline import Distribution, find_distributions
+from raypack.scanner import FileIndex
+from raypack.slimming import Slimmer, rules_for
+from raypack.wheel_cache import normalize_name
+
+logger = logging.getLogger(__name__)
+
+JOB_KEYS = {"glue_job_name", "script_location", "dependencies", "include"}
+
+COMMON_LAYER = "common"
+
+
+@dataclass
+class JobSpec:
+    """One [tool.raypack.jobs.<name>] table."""
+
+    name: str
+    # defaults to the table name
+    glue_job_name: str = ""
+    script_location: str = ""
+    # top-level distributions the job needs, empty for all installed ones
+    dependencies: list[str] = field(default_factory=list)
+    # globs of the job's own files, relative to the project
+    include: list[str] = field(default_factory=list)
+
+    @classmethod
+    def from_table(cls, name: str, table: dict[str, Any]) -> "JobSpec":
+        """From a toml table, rejecting unknown keys so typos don't go unnoticed."""
+        unknown = set(table) - JOB_KEYS
+        if unknown:
+            raise ValueError(f"Unknown keys in [tool.raypack.jobs.{name}]: {', '.join(sorted(unknown))}")
+        return cls(name, **table)
+
+    @property
+    def job_name(self) -> str:
+        """Glue job to update."""
+        return self.glue_job_name or self.name
+
+
+@dataclass
+class BatchResult:
+    """Zips of a batch build, and which of them each job runs with."""
+
+    common_zip: str
+    job_zips: dict[str, str] = field(default_factory=dict)
+
+    def py_modules(self, job: str) -> list[str]:
+        """Zips for the job's --s3-py-modules, common one first."""
+        return [self.common_zip, self.job_zips[job]]
+
+
+def load_jobs(tables: dict[str, dict[str, Any]]) -> list[JobSpec]:
+    """Jobs from the jobs tables, in name order."""
+    if not tables:
+        raise ValueError("No [tool.raypack.jobs.<name>] tables in pyproject.toml")
+    if COMMON_LAYER in tables:
+        raise ValueError(f"A job can't be called {COMMON_LAYER}, that name is taken by the shared zip")
+    return [JobSpec.from_table(name, table) for name, table in sorted(tables.items())]
+
+
+def dependency_closure(roots: list[str], distributions: dict[str, Distribution]) -> set[str]:
+    """Normalized names of the roots and everything they require that is installed."""
+    needed: set[str] = set()
+    pending = [normalize_name(root) for root in roots]
+    while pending:
+        name = pending.pop()
+        if name in needed or name not in distributions:
+            if name not in distributions:
+                logger.debug(f"{name} is required but not packaged")
+            continue
+        needed.add(name)
+        pending.extend(distributions[name].requires)
+    return needed
+
+
+def plan_layers(jobs: list[JobSpec], distributions: list[Distribution]) -> tuple[set[str], dict[str, set[str]]]:
+    """Distributions every job needs, and per job the ones it needs beyond those."""
+    by_name = {normalize_name(distribution.name): distribution for distribution in distributions}
+    needs = {}
+    for job in jobs:
+        missing = [root for root in job.dependencies if normalize_name(root) not in by_name]
+        if missing:
+            logger.warning(f"Job {job.name} depends on {', '.join(missing)}, which isn't installed")
+        needs[job.name] = dependency_closure(job.dependencies, by_name) if job.dependencies else set(by_name)
+    common = set.intersection(*needs.values()) if needs else set()
+    return common, {name: needed - common for name, needed in needs.items()}
+
+
+def layer_index(index: FileIndex, owners: dict[str, str], names: set[str], include_unowned: bool) -> FileIndex:
+    """The files of some distributions. Files no distribution claims go with include_unowned."""
+    files = [
+        entry
+        for entry in index.files
+        if (owners[entry.relpath] in names if entry.relpath in owners else include_unowned)
+    ]
+    return FileIndex(index.root, files, index.folders)
+
+
+def write_layer(
+    config: Config,
+    zip_name: str,
+    outer_folder_name: str,
+    index: FileIndex,
+    *,
+    own_wheel: Optional[str] = None,
+    includes: Optional[list[str]] = None,
+) -> str:
+    """Write one zip: some of site-packages, optionally our own wheel and files matching include globs."""
+    policy = compression_policy(config)
+    date_time = reproducible_date_time() if config.deterministic else None
+    with phase(f"zip {zip_name}") as zipping:
+        with zipfile.ZipFile(
+            zip_name, "w", policy.compress_type, compresslevel=policy.compresslevel  # type: ignore[arg-type]
+        ) as zipf:
+            count = zipup_virtualenv(
+                config,
+                DEFAULT_EXCLUSIONS,
+                outer_folder_name,
+                index.root,
+                zipf,
+                policy=policy,
+                date_time=date_time,
+                index=index,
+            )
+            if own_wheel:
+                count += zipup_own_module_from_wheel(own_wheel, outer_folder_name, zipf, policy, date_time)
+            if includes:
+                count += zipup_own_module(config, includes, outer_folder_name, zipf)
+        zipping.add(count, sum(info.file_size for info in zipf.filelist))
+    if count == 0:
+        logger.warning(f"Nothing was added to {zip_name}")
+    print(f"{zip_name}: {count} files, {os.path.getsize(zip_name) / 1024 / 1024:.2f} MB")
+    return zip_name
+
+
+def file_owners(distributions: list[Distribution]) -> dict[str, str]:
+    """Distribution of each file, by relative path."""
+    return {path: normalize_name(distribution.name) for distribution in distributions for path in distribution.files}
+
+
+def build_batch(config: Config, output_dir: str = ".") -> BatchResult:
+    """Install and scan once, then write the common zip and the job zips in parallel."""
+    jobs = load_jobs(config.jobs)
+    validate_modes(config)
+    # the layers are cut from an installed virtual environment, and written from scratch
+    for option in ("from_wheels", "incremental"):
+        if getattr(config, option):
+            raise ValueError(f"{option} isn't supported with --batch, set it to false")
+    rules = rules_for(config.slimming, config.slimming_rules)
+    slimmer = Slimmer(rules) if rules or config.strip_binaries else None
+    index = prepare_venv_index(config, DEFAULT_EXCLUSIONS, slimmer)
+    report_binaries(config, check_venv_binaries(config, index))
+    distributions = find_distributions(index)
+    common, per_job = plan_layers(jobs, distributions)
+    owners = file_owners(distributions)
+    logger.info(f"{len(common)} distributions are shared by all {len(jobs)} jobs")
+
+    project, version = get_project_info_from_toml()
+    os.makedirs(output_dir, exist_ok=True)
+    own_wheel = find_single_whl_in_dist()
+
+    def layer(names: set[str], include_unowned: bool) -> FileIndex:
+        sub_index = layer_index(index, owners, names, include_unowned)
+        return precompile(sub_index, config.compile_bytecode, config.target_python, config.pack_jobs)
+
+    common_index = layer(common, True)
+    job_indexes = {job.name: layer(per_job[job.name], False) for job in jobs}
+    with ThreadPoolExecutor(max_workers=min(resolve_jobs(config.pack_jobs), len(jobs) + 1)) as pool:
+        common_zip = pool.submit(
+            write_layer,
+            config,
+            os.path.join(output_dir, create_filename(f"{project}-{COMMON_LAYER}", version)),
+            config.outer_folder_name,
+            common_index,
+            own_wheel=own_wheel,
+        )
+        job_zips = {
+            job.name: pool.submit(
+                write_layer,
+                config,
+                os.path.join(output_dir, create_filename(f"{project}-{job.name}", version)),
+                # a folder of its own, so extracting both zips doesn't mix them
+                f"{config.outer_folder_name}_{job.name}",
+                job_indexes[job.name],
+                includes=job.include,
+            )
+            for job in jobs
+        }
+        result = BatchResult(common_zip.result(), {name: future.result() for name, future in job_zips.items()})
+    if slimmer is not None:
+        print(slimmer.report())
+    return result
@@ -0,0 +1,261 @@
+"""
+Cold start benchmark of a built zip.
+
+Each top-level package is imported in a fresh interpreter with -X importtime,
+from the extracted zip (what Ray does with py_modules) or straight from the
+zip with zipimport. Reports import time, peak RSS and extraction time as
+JSON, and compares two builds side by side.
+"""
+
+import json
+import logging
+import os
+import re
+import shutil
+import subprocess  # nosec
+import sys
+import tempfile
+import time
+import zipfile
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+BENCH_MODES = ("extracted", "zipimport")
+
+# Prints peak RSS in KB as the last line of stdout, 0 on Windows, which has no
+# resource module. -X importtime writes to stderr.
+IMPORT_SCRIPT = """
+import sys
+sys.path.insert(0, sys.argv[1])
+__import__(sys.argv[2])
+if sys.platform == "win32":
+    print(0)
+else:
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(peak // 1024 if sys.platform == "darwin" else peak)
+"""
+
+# Wall clock time, too noisy between runs to gate on.
+TIMING_TOTALS = {"extraction_seconds"}
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+MODULE_SUFFIXES = (".py", ".pyc", ".so", ".pyd")
+
+
+def outer_folder(names: list[str]) -> str:
+    """The wrapper folder every member is in, e.g. venv/, or "" if there is none."""
+    tops = {name.split("/", 1)[0] for name in names}
+    if len(tops) == 1 and all("/" in name for name in names):
+        return tops.pop()
+    return ""
+
+
+def top_level_packages(names: list[str]) -> list[str]:
+    """Importable top-level packages and modules in a zip."""
+    prefix = outer_folder(names)
+    found = set()
+    for name in names:
+        relative = name[len(prefix) + 1 :] if prefix else name
+        first, _, rest = relative.partition("/")
+        if rest and first.isidentifier() and rest.split("/")[0].startswith("__init__."):
+            found.add(first)
+        elif not rest and relative.endswith(MODULE_SUFFIXES):
+            module = relative.split(".", 1)[0]
+            if module.isidentifier():
+                found.add(module)
+    return sorted(found)
+
+
+def parse_importtime(stderr: str, module: str) -> dict[str, int]:
+    """Self and cumulative microseconds of a module, and how many modules it pulled in."""
+    cumulative = 0
+    self_us = 0
+    count = 0
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        count += 1
+        if match.group(4) == module and len(match.group(3)) == 1:
+            self_us, cumulative = int(match.group(1)), int(match.group(2))
+    return {"self_us": self_us, "cumulative_us": cumulative, "modules_imported": count}
+
+
+def measure_import(python: str, path_entry: str, module: str) -> dict[str, Any]:
+    """Import one module in a new interpreter with -X importtime."""
+    started = time.perf_counter()
+    result = subprocess.run(  # nosec
+        [python, "-X", "importtime", "-I", "-S", "-c", IMPORT_SCRIPT, path_entry, module],
+        capture_output=True,
+        text=True,
+        check=False,
+        shell=False,
+    )
+    wall = time.perf_counter() - started
+    if result.returncode != 0:
+        error = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else f"exit {result.returncode}"
+        return {"error": error, "wall_seconds": wall}
+    return {
+        **parse_importtime(result.stderr, module),
+        "peak_rss_kb": int(result.stdout.strip().splitlines()[-1]),
+        "wall_seconds": wall,
+    }
+
+
+def best_of(runs: list[dict[str, Any]]) -> dict[str, Any]:
+    """Fastest run. Errors win, so they aren't hidden."""
+    errors = [run for run in runs if "error" in run]
+    if errors:
+        return errors[0]
+    return min(runs, key=lambda run: run["cumulative_us"])
+
+
+def bench_artifact(
+    zip_path: str,
+    python: Optional[str] = None,
+    modules: Optional[list[str]] = None,
+    repeat: int = 1,
+    mode: str = "extracted",
+) -> dict[str, Any]:
+    """Extraction time, then import time and peak RSS of each top-level package."""
+    if mode not in BENCH_MODES:
+        raise ValueError(f"mode must be one of {', '.join(BENCH_MODES)}, got {mode!r}")
+    python = python or sys.executable
+    with zipfile.ZipFile(zip_path) as zipf:
+        names = zipf.namelist()
+        extracted_bytes = sum(info.file_size for info in zipf.infolist())
+    prefix = outer_folder(names)
+    modules = modules or top_level_packages(names)
+
+    work_dir = tempfile.mkdtemp(prefix="raypack-bench-")
+    try:
+        started = time.perf_counter()
+        with zipfile.ZipFile(zip_path) as zipf:
+            zipf.extractall(work_dir)
+        extraction = time.perf_counter() - started
+        root = work_dir if mode == "extracted" else os.path.abspath(zip_path)
+        path_entry = os.path.join(root, prefix) if prefix else root
+        packages = {
+            module: best_of([measure_import(python, path_entry, module) for _ in range(max(repeat, 1))])
+            for module in modules
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    imported = [result for result in packages.values() if "error" not in result]
+    return {
+        "artifact": zip_path,
+        "python": python,
+        "mode": mode,
+        "zip_bytes": os.path.getsize(zip_path),
+        "extracted_bytes": extracted_bytes,
+        "files": len(names),
+        "extraction_seconds": extraction,
+        "total_import_us": sum(result["cumulative_us"] for result in imported),
+        "max_peak_rss_kb": max((result["peak_rss_kb"] for result in imported), default=0),
+        "errors": sorted(module for module, result in packages.items() if "error" in result),
+        "packages": packages,
+    }
+
+
+def compare(left: dict[str, Any], right: dict[str, Any]) -> dict[str, Any]:
+    """Side by side of two reports. Ratios above 1 mean the right one is slower or bigger."""
+
+    def ratio(before: float, after: float) -> Optional[float]:
+        return after / before if before else None
+
+    packages = {}
+    for module in sorted(set(left["packages"]) | set(right["packages"])):
+        before = left["packages"].get(module, {}).get("cumulative_us")
+        after = right["packages"].get(module, {}).get("cumulative_us")
+        packages[module] = {
+            "left_us": before,
+            "right_us": after,
+            "ratio": ratio(before, after) if before is not None and after is not None else None,
+        }
+    totals = {}
+    for key in ["zip_bytes", "extracted_bytes", "extraction_seconds", "total_import_us", "max_peak_rss_kb"]:
+        totals[key] = {"left": left[key], "right": right[key], "ratio": ratio(left[key], right[key])}
+    return {"left": left["artifact"], "right": right["artifact"], "totals": totals, "packages": packages}
+
+
+def format_report(report: dict[str, Any]) -> str:
+    """Plain text table of one report."""
+    lines = [
+        f"{report['artifact']}: {report['zip_bytes'] / 1024 / 1024:.2f} MB, {report['files']} files, "
+        f"extracted in {report['extraction_seconds']:.2f} s",
+        f"{'package':<30} {'import ms':>10} {'modules':>8} {'peak RSS MB':>12}",
+    ]
+    for module, result in sorted(report["packages"].items()):
+        if "error" in result:
+            lines.append(f"{module:<30} {'error: ' + result['error']}")
+            continue
+        lines.append(
+            f"{module:<30} {result['cumulative_us'] / 1000:>10.1f} {result['modules_imported']:>8} "
+            f"{result['peak_rss_kb'] / 1024:>12.1f}"
+        )
+    return "\n".join(lines)
+
+
+def format_comparison(comparison: dict[str, Any]) -> str:
+    """Plain text table of two reports side by side."""
+    lines = [f"left: {comparison['left']}", f"right: {comparison['right']}"]
+    lines.append(f"{'':<30} {'left':>12} {'right':>12} {'ratio':>7}")
+    for key, row in comparison["totals"].items():
+        ratio = f"{row['ratio']:.2f}" if row["ratio"] is not None else "-"
+        lines.append(f"{key:<30} {row['left']:>12.6g} {row['right']:>12.6g} {ratio:>7}")
+    lines.append(f"{'package import ms':<30}")
+    for module, row in comparison["packages"].items():
+        left = f"{row['left_us'] / 1000:.1f}" if row["left_us"] is not None else "-"
+        right = f"{row['right_us'] / 1000:.1f}" if row["right_us"] is not None else "-"
+        ratio = f"{row['ratio']:.2f}" if row["ratio"] is not None else "-"
+        lines.append(f"{module:<30} {left:>12} {right:>12} {ratio:>7}")
+    return "\n".join(lines)
+
+
+def regressions(comparison: dict[str, Any], threshold: float) -> list[str]:
+    """Totals where the right artifact is worse than the left by more than threshold (0.1 is 10%).
+
+    Extraction time is reported, but not counted.
+    """
+    return [
+        key
+        for key, row in comparison["totals"].items()
+        if key not in TIMING_TOTALS and row["ratio"] is not None and row["ratio"] > 1 + threshold
+    ]
+
+
+def run_bench(
+    zip_paths: list[str],
+    *,
+    json_path: Optional[str] = None,
+    python: Optional[str] = None,
+    modules: Optional[list[str]] = None,
+    repeat: int = 1,
+    mode: str = "extracted",
+    fail_over: Optional[float] = None,
+) -> int:
+    """raypack bench: one report, or a comparison of two. Returns the exit code."""
+    reports = [bench_artifact(path, python, modules, repeat, mode) for path in zip_paths]
+    result: dict[str, Any]
+    if len(reports) == 1:
+        result = reports[0]
+        print(format_report(result))
+    else:
+        result = {"reports": reports, "comparison": compare(reports[0], reports[1])}
+        print(format_comparison(result["comparison"]))
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as file:
+            json.dump(result, file, indent=1)
+    errors = sorted({module for report in reports for module in report["errors"]})
+    if errors:
+        logger.warning(f"Could not import: {', '.join(errors)}")
+    if fail_over is not None and len(reports) > 1:
+        worse = regressions(result["comparison"], fail_over)
+        if worse:
+            print(f"Regressed by more than {fail_over:.0%}: {', '.join(worse)}")
+            return 1
+    return 0
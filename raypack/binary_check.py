@@ -0,0 +1,391 @@
+"""
+Tell from their headers whether binary files will load on Glue.
+
+Ray jobs on Glue run Linux on ARM64 (aarch64) with the glibc of Amazon Linux 2.
+Only headers are read: ELF class and machine plus the GLIBC_x.y symbol versions
+a library needs, or the magic numbers of macOS (Mach-O) and Windows (PE)
+binaries. Candidates are files with a binary extension, versioned libraries
+(.so.1) and anything marked executable, and of those only the ones starting
+with one of these magic numbers are hashed and read further, so scripts
+marked executable cost one short read.
+
+Results are cached by content hash, next to the folder checked. Files whose
+size and mtime haven't changed since the last check are not read at all. For
+wheel members, the glibc version comes from the wheel's manylinux tag, since
+the symbol versions are at the end of the file and reading that far means
+decompressing all of it.
+"""
+
+import json
+import logging
+import os
+import re
+import struct
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import IO, Any, Optional
+
+from raypack.manifest import hash_file
+from raypack.packing import resolve_jobs
+from raypack.scanner import FileEntry, FileIndex, SuffixMatcher
+from raypack.wheel_cache import parse_wheel_filename
+
+logger = logging.getLogger(__name__)
+
+BINARY_CHECK_MODES = ("error", "warn", "off")
+
+BINARY_EXTENSIONS = SuffixMatcher([".so", ".pyd", ".dll", ".dylib", ".exe"])
+
+CACHE_VERSION = 1
+
+TARGET_MACHINE = "aarch64"
+
+# Amazon Linux 2
+TARGET_GLIBC = "2.26"
+
+ELF_MAGIC = b"\x7fELF"
+
+ELF_MACHINES = {3: "i386", 8: "mips", 20: "ppc", 21: "ppc64", 22: "s390x", 40: "arm", 62: "x86_64", 183: "aarch64"}
+
+SHT_GNU_VERNEED = 0x6FFFFFFE
+
+# sections bigger than this are not a version table worth reading
+MAX_SECTION_SIZE = 16 * 1024 * 1024
+
+MACHO_MAGICS = {
+    b"\xfe\xed\xfa\xce": (">", 32),
+    b"\xce\xfa\xed\xfe": ("<", 32),
+    b"\xfe\xed\xfa\xcf": (">", 64),
+    b"\xcf\xfa\xed\xfe": ("<", 64),
+}
+
+# also the magic of Java class files, which have their version where this has the arch count
+MACHO_FAT_MAGIC = b"\xca\xfe\xba\xbe"
+
+MACHO_CPU_TYPES = {7: "i386", 0x01000007: "x86_64", 12: "arm", 0x0100000C: "arm64"}
+
+PE_MACHINES = {0x14C: "i386", 0x1C4: "arm", 0x8664: "x86_64", 0xAA64: "arm64"}
+
+BINARY_MAGICS = (ELF_MAGIC, *MACHO_MAGICS, MACHO_FAT_MAGIC, b"MZ")
+
+# cache key of candidates without a binary magic number, so they aren't hashed
+NO_MAGIC_KEY = "no-magic"
+
+GLIBC_SYMBOL_VERSION = re.compile(r"^GLIBC_(\d+(?:\.\d+)+)$")
+
+# manylinux_2_28_aarch64, and the aliases from before PEP 600
+MANYLINUX_TAG = re.compile(r"^manylinux_(\d+)_(\d+)_")
+LEGACY_MANYLINUX_GLIBC = {"manylinux1": "2.5", "manylinux2010": "2.12", "manylinux2014": "2.17"}
+
+
+@dataclass
+class BinaryInfo:
+    """What a file's header says it is."""
+
+    # elf, mach-o or pe
+    format: str
+    machine: str = ""
+    bits: int = 0
+    # newest GLIBC_x.y symbol version needed, empty if none or unknown
+    glibc: str = ""
+
+
+@dataclass
+class BinaryFile:
+    """A binary and whether it will load on the target."""
+
+    path: str
+    info: BinaryInfo
+    # empty if it should load
+    problem: str = ""
+
+
+def version_key(version: str) -> tuple[int, ...]:
+    """2.17 -> (2, 17), for comparing."""
+    return tuple(int(part) for part in version.split("."))
+
+
+def cache_path_for(folder: str) -> str:
+    """Saved next to the folder checked, not in it, so it doesn't end up in the zip."""
+    return os.path.normpath(folder) + ".binary-check.json"
+
+
+def is_candidate(name: str, mode: int) -> bool:
+    """Could this be a binary? Binary extension, versioned library or executable."""
+    return BINARY_EXTENSIONS(name) or ".so." in name or bool(mode & 0o111)
+
+
+def has_binary_magic(path: str) -> bool:
+    """Does the file start like an ELF, Mach-O or PE binary?"""
+    with open(path, "rb") as file:
+        return file.read(4).startswith(BINARY_MAGICS)
+
+
+def read_at(file: IO[bytes], offset: int, size: int) -> bytes:
+    """size bytes at offset, or ValueError if the file is shorter or the size absurd."""
+    if size > MAX_SECTION_SIZE:
+        raise ValueError(f"Section of {size} bytes")
+    file.seek(offset)
+    data = file.read(size)
+    if len(data) != size:
+        raise ValueError("Truncated file")
+    return data
+
+
+def needed_versions(file: IO[bytes], head: bytes, order: str, bits: int) -> list[str]:
+    """Names in the ELF version needs table (.gnu.version_r), e.g. GLIBC_2.17."""
+    if bits == 64:  # noqa: PLR2004
+        (shoff,) = struct.unpack_from(order + "Q", head, 40)
+        shentsize, shnum = struct.unpack_from(order + "HH", head, 58)
+        section_format = order + "IIQQQQIIQQ"
+    else:
+        (shoff,) = struct.unpack_from(order + "I", head, 32)
+        shentsize, shnum = struct.unpack_from(order + "HH", head, 46)
+        section_format = order + "IIIIIIIIII"
+    if not shoff or not shnum:
+        return []
+    table = read_at(file, shoff, shentsize * shnum)
+    # name, type, flags, address, offset, size, link, info, alignment, entry size
+    sections = [struct.unpack_from(section_format, table, number * shentsize) for number in range(shnum)]
+    verneed = next((section for section in sections if section[1] == SHT_GNU_VERNEED), None)
+    if verneed is None or verneed[6] >= len(sections):
+        return []
+    data = read_at(file, verneed[4], verneed[5])
+    strings = sections[verneed[6]]
+    string_table = read_at(file, strings[4], strings[5])
+
+    names = []
+    position = 0
+    for _ in range(verneed[7]):
+        _version, aux_count, _file, aux, next_entry = struct.unpack_from(order + "HHIII", data, position)
+        aux_position = position + aux
+        for _ in range(aux_count):
+            _hash, _flags, _other, name, next_aux = struct.unpack_from(order + "IHHII", data, aux_position)
+            end = string_table.find(b"\0", name)
+            names.append(string_table[name : end if end >= 0 else None].decode("ascii", "replace"))
+            aux_position += next_aux
+        if not next_entry:
+            break
+        position += next_entry
+    return names
+
+
+def read_elf(file: IO[bytes], head: bytes, symbol_versions: bool = True) -> BinaryInfo:
+    """Class and machine from the ELF header, newest glibc symbol version from the section table."""
+    bits = {1: 32, 2: 64}.get(head[4], 0)
+    order = "<" if head[5] == 1 else ">"
+    (machine,) = struct.unpack_from(order + "H", head, 18)
+    info = BinaryInfo("elf", ELF_MACHINES.get(machine, f"machine {machine}"), bits)
+    if not symbol_versions or not bits:
+        return info
+    try:
+        versions = [GLIBC_SYMBOL_VERSION.match(name) for name in needed_versions(file, head, order, bits)]
+    except (struct.error, ValueError) as error:
+        logger.debug(f"Can't read symbol versions: {error}")
+        return info
+    glibc = [match.group(1) for match in versions if match]
+    info.glibc = max(glibc, key=version_key) if glibc else ""
+    return info
+
+
+def read_pe(file: IO[bytes], head: bytes) -> Optional[BinaryInfo]:
+    """Machine of a Windows executable or DLL. None if MZ was a coincidence."""
+    (pe_offset,) = struct.unpack_from("<I", head, 0x3C)
+    try:
+        header = read_at(file, pe_offset, 6)
+    except ValueError:
+        return None
+    if header[:4] != b"PE\0\0":
+        return None
+    (machine,) = struct.unpack_from("<H", header, 4)
+    return BinaryInfo("pe", PE_MACHINES.get(machine, hex(machine)), 32 if machine in (0x14C, 0x1C4) else 64)
+
+
+def classify(file: IO[bytes], symbol_versions: bool = True) -> Optional[BinaryInfo]:
+    """What kind of binary the file is, from its header. None if it isn't one."""
+    head = file.read(64)
+    magic = head[:4]
+    if magic == ELF_MAGIC and len(head) == 64:  # noqa: PLR2004
+        return read_elf(file, head, symbol_versions)
+    if magic in MACHO_MAGICS and len(head) >= 8:  # noqa: PLR2004
+        order, bits = MACHO_MAGICS[magic]
+        (cpu_type,) = struct.unpack_from(order + "I", head, 4)
+        return BinaryInfo("mach-o", MACHO_CPU_TYPES.get(cpu_type, hex(cpu_type)), bits)
+    # a Java class has its version here, 45 and up
+    if magic == MACHO_FAT_MAGIC and len(head) >= 8 and struct.unpack_from(">I", head, 4)[0] < 30:  # noqa: PLR2004
+        return BinaryInfo("mach-o", "universal")
+    if head[:2] == b"MZ" and len(head) == 64:  # noqa: PLR2004
+        return read_pe(file, head)
+    return None
+
+
+def compatibility_problem(info: BinaryInfo, machine: str = TARGET_MACHINE, max_glibc: str = TARGET_GLIBC) -> str:
+    """Why the binary won't load on Linux of that machine and glibc. Empty if it should."""
+    if info.format == "mach-o":
+        return f"macOS binary ({info.machine})"
+    if info.format == "pe":
+        return f"Windows binary ({info.machine})"
+    if info.machine != machine:
+        return f"built for {info.machine}, not {machine}"
+    if info.bits != 64:  # noqa: PLR2004
+        return f"{info.bits} bit"
+    if info.glibc and version_key(info.glibc) > version_key(max_glibc):
+        return f"needs glibc {info.glibc}, newer than {max_glibc}"
+    return ""
+
+
+def wheel_glibc(wheel_path: str) -> str:
+    """Oldest glibc a manylinux wheel says it works with. Empty if it doesn't say."""
+    try:
+        platform_tag = parse_wheel_filename(os.path.basename(wheel_path))[3]
+    except ValueError:
+        return ""
+    versions = []
+    for tag in platform_tag.split("."):
+        match = MANYLINUX_TAG.match(tag)
+        if match:
+            versions.append(f"{match.group(1)}.{match.group(2)}")
+        elif tag.split("_")[0] in LEGACY_MANYLINUX_GLIBC:
+            versions.append(LEGACY_MANYLINUX_GLIBC[tag.split("_")[0]])
+    return min(versions, key=version_key) if versions else ""
+
+
+class BinaryCache:
+    """Header results by content hash, and content hashes by path, size and mtime."""
+
+    def __init__(self, path: str = "") -> None:
+        self.path = path
+        # path -> [size, mtime_ns, key]
+        self.files: dict[str, list[Any]] = {}
+        # key -> BinaryInfo as a dict, None for not a binary
+        self.results: dict[str, Optional[dict[str, Any]]] = {}
+        self.hits = 0
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as file:
+                    data = json.load(file)
+                if data.get("version") == CACHE_VERSION:
+                    self.files = data["files"]
+                    self.results = data["results"]
+            except (ValueError, KeyError) as error:
+                logger.warning(f"Ignoring binary check cache {path}: {error}")
+
+    def key_for(self, path: str, size: int, mtime_ns: int) -> Optional[str]:
+        """Content hash seen for this path, if the file is unchanged."""
+        known = self.files.get(path)
+        if known and known[0] == size and known[1] == mtime_ns:
+            return str(known[2])
+        return None
+
+    def get(self, key: str) -> tuple[bool, Optional[BinaryInfo]]:
+        """(found, result) for a content key."""
+        with self._lock:
+            if key not in self.results:
+                return False, None
+            self.hits += 1
+            result = self.results[key]
+        return True, BinaryInfo(**result) if result is not None else None
+
+    def put(self, key: str, info: Optional[BinaryInfo], path: str = "", size: int = 0, mtime_ns: int = 0) -> None:
+        """Remember a result, and the file it came from if given."""
+        with self._lock:
+            self.results[key] = asdict(info) if info is not None else None
+            if path:
+                self.files[path] = [size, mtime_ns, key]
+
+    def save(self) -> None:
+        """Write the cache, if it has a path."""
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as file:
+            json.dump({"version": CACHE_VERSION, "files": self.files, "results": self.results}, file)
+
+
+def classify_entry(entry: FileEntry, cache: BinaryCache) -> Optional[BinaryInfo]:
+    """Header result for a file, from the cache when its content was seen before."""
+    key = cache.key_for(entry.path, entry.size, entry.mtime_ns)
+    if key is None:
+        key = f"sha256:{hash_file(entry.path)}" if has_binary_magic(entry.path) else NO_MAGIC_KEY
+    found, info = cache.get(key)
+    if not found:
+        with open(entry.path, "rb") as file:
+            info = classify(file)
+    cache.put(key, info, entry.path, entry.size, entry.mtime_ns)
+    return info
+
+
+def check_index(
+    index: FileIndex,
+    jobs: int = 0,
+    cache: Optional[BinaryCache] = None,
+    machine: str = TARGET_MACHINE,
+    max_glibc: str = TARGET_GLIBC,
+) -> list[BinaryFile]:
+    """Binaries in a scanned folder, in index order, each with what keeps it from loading."""
+    cache = cache or BinaryCache()
+    candidates = [entry for entry in index.files if is_candidate(entry.name, entry.mode)]
+    with ThreadPoolExecutor(max_workers=resolve_jobs(jobs)) as pool:
+        infos = list(pool.map(lambda entry: (entry.path, classify_entry(entry, cache)), candidates))
+    cache.save()
+    return [
+        BinaryFile(path, info, compatibility_problem(info, machine, max_glibc))
+        for path, info in infos
+        if info is not None
+    ]
+
+
+def check_wheel(
+    wheel_path: str, cache: BinaryCache, machine: str = TARGET_MACHINE, max_glibc: str = TARGET_GLIBC
+) -> list[BinaryFile]:
+    """Binaries in one wheel. Members are keyed by CRC and size from the central directory."""
+    glibc = wheel_glibc(wheel_path)
+    binaries = []
+    with zipfile.ZipFile(wheel_path) as whl:
+        for member in whl.infolist():
+            if member.is_dir() or not is_candidate(member.filename, member.external_attr >> 16):
+                continue
+            key = f"crc32:{member.CRC:08x}:{member.file_size}"
+            found, info = cache.get(key)
+            if not found:
+                with whl.open(member) as file:
+                    info = classify(file, symbol_versions=False)
+                cache.put(key, info)
+            if info is None:
+                continue
+            if info.format == "elf":
+                info.glibc = glibc
+            binaries.append(
+                BinaryFile(f"{wheel_path}:{member.filename}", info, compatibility_problem(info, machine, max_glibc))
+            )
+    return binaries
+
+
+def check_wheels(
+    wheel_paths: list[str],
+    jobs: int = 0,
+    cache: Optional[BinaryCache] = None,
+    machine: str = TARGET_MACHINE,
+    max_glibc: str = TARGET_GLIBC,
+) -> list[BinaryFile]:
+    """Binaries inside wheels, a wheel per thread, without extracting anything."""
+    cache = cache or BinaryCache()
+    with ThreadPoolExecutor(max_workers=resolve_jobs(jobs)) as pool:
+        per_wheel = list(pool.map(lambda path: check_wheel(path, cache, machine, max_glibc), wheel_paths))
+    cache.save()
+    return [binary for binaries in per_wheel for binary in binaries]
+
+
+def format_report(binaries: list[BinaryFile]) -> str:
+    """One line per binary, problems first."""
+    lines = [f"{'status':<7} {'format':<7} {'machine':<9} {'glibc':<6} path"]
+    for binary in sorted(binaries, key=lambda binary: (not binary.problem, binary.path)):
+        info = binary.info
+        line = f"{'FAIL' if binary.problem else 'ok':<7} {info.format:<7} {info.machine:<9} {info.glibc or '-':<6} "
+        lines.append(line + binary.path + (f"  ({binary.problem})" if binary.problem else ""))
+    failed = sum(bool(binary.problem) for binary in binaries)
+    lines.append(f"{len(binaries)} binaries, {failed} won't load")
+    return "\n".join(lines)
@@ -9,29 +9,102 @@ import glob
 import logging
 import os
 import platform
+import shutil
 import sys
 import zipfile
 from pathlib import PurePath
-from typing import Optional
-
-from raypack import poetry_interface
+from typing import Any, Callable, Optional, Union
+
+from raypack import binary_check, lock_fingerprint, poetry_interface, uv_interface
+from raypack.bytecode import precompile
+from raypack.compression import (
+    REPORT_POLICIES,
+    CompressionPolicy,
+    compression_report,
+    format_report,
+)
 from raypack.config_loading import Config
+from raypack.import_graph import TREE_SHAKING_MODES, shake_tree
+from raypack.manifest import BuildManifest, manifest_path_for
+from raypack.packing import pack_files
+from raypack.profiling import phase
 from raypack.pyproject_interface import get_project_info_from_toml
+from raypack.reproducible import reproducible_date_time
+from raypack.runtime_baseline import (
+    exclude_runtime_provided,
+    exclude_runtime_provided_wheels,
+)
+from raypack.scanner import FileIndex, SuffixMatcher, scan_tree
+from raypack.slimming import Slimmer, rules_for, strip_shared_libraries
+from raypack.wheel_cache import WheelCache
+from raypack.wheels import copy_wheel_member, find_wheels, iter_wheel_members
+from raypack.zip_utils import StableOffsetFile
 
 logger = logging.getLogger(__name__)
 
-
-def check_for_binary_files(directory: str) -> list[str]:
-    """Check for binary files in a directory."""
-    binary_extensions = {".so", ".pyd", ".dll", ".dylib"}  # Add more extensions as needed
-    binary_files = []
-
-    for root, _dirs, files in os.walk(directory):
-        for filename in files:
-            if any(filename.endswith(ext) for ext in binary_extensions):
-                binary_files.append(os.path.join(root, filename))
-
-    return binary_files
+# poetry and pip install with poetry export and pip, uv from uv.lock
+VENV_TOOLS = ("poetry", "pip", "uv")
+
+# implied that this is not wanted, but who knows, maybe someone's app depends on one of these.
+DEFAULT_EXCLUSIONS = [
+    "_distutils_hack",
+    "wheel",
+    "pkg_resources",
+    "pip",
+    "setuptools",
+    "__pycache__",
+]
+
+
+PACKAGING_CRUFT = SuffixMatcher([".pth", ".virtualenv"])
+
+
+def check_for_binary_files(
+    config: Config, directory: str, index: Optional[FileIndex] = None, cache: Optional[binary_check.BinaryCache] = None
+) -> list[binary_check.BinaryFile]:
+    """Binary files in a directory, and whether they will load on the target."""
+    if index is None:
+        index = scan_tree(directory)
+    return binary_check.check_index(index, config.pack_jobs, cache, config.target_machine, config.target_glibc)
+
+
+def check_wheel_binaries(config: Config, wheel_paths: list[str]) -> list[binary_check.BinaryFile]:
+    """Binary files in the dependency wheels, unless binary_check is off."""
+    if config.binary_check == "off":
+        return []
+    with phase("check for binary files") as checking:
+        cache = binary_check.BinaryCache(binary_check.cache_path_for(config.wheel_dir))
+        binaries = check_for_binary_wheels(config, wheel_paths, cache)
+        checking.add(len(wheel_paths), sum(os.path.getsize(path) for path in wheel_paths))
+    return binaries
+
+
+def check_venv_binaries(config: Config, index: FileIndex) -> list[binary_check.BinaryFile]:
+    """Binary files of the scanned virtual environment, unless binary_check is off."""
+    if config.binary_check == "off":
+        return []
+    with phase("check for binary files") as checking:
+        cache = binary_check.BinaryCache(binary_check.cache_path_for(config.source_venv))
+        binaries = check_for_binary_files(config, index.root, index, cache)
+        checking.add(len(index.files))
+    return binaries
+
+
+def report_binaries(config: Config, binaries: list[binary_check.BinaryFile]) -> None:
+    """Print a line per binary. Stop the build if some won't load and binary_check is error."""
+    if not binaries:
+        return
+    print(binary_check.format_report(binaries))
+    incompatible = [binary for binary in binaries if binary.problem]
+    target = f"Linux {config.target_machine} with glibc {config.target_glibc}"
+    if incompatible and config.binary_check == "error":
+        logger.error(f"{len(incompatible)} binary files won't load on {target}.")
+        logger.error("Use wheels built for it, or set binary_check to warn to package them anyway.")
+        sys.exit(-1)
+    if incompatible:
+        logger.warning(f"{len(incompatible)} binary files won't load on {target}, packaging them anyway.")
+    elif config.deps_are_pure_python:
+        logger.warning(f"Binary files found, but deps_are_pure_python is true. They look loadable on {target}.")
 
 
 def create_filename(name: str, version: str) -> str:
@@ -51,12 +124,11 @@ def create_filename(name: str, version: str) -> str:
     return f"{name}-{version}-{python_version}-{os_name}-{os_bitness}.zip"
 
 
-def find_site_packages(start_dir: str = ".virtualenv") -> Optional[str]:
+def find_site_packages(start_dir: str = ".virtualenv", index: Optional[FileIndex] = None) -> Optional[str]:
     """Find the site-packages directory in a virtual environment."""
-    return next(
-        (os.path.join(root, "site-packages") for root, dirs, _files in os.walk(start_dir) if "site-packages" in dirs),
-        None,
-    )
+    if index is None:
+        index = scan_tree(start_dir)
+    return index.find_folder("site-packages")
 
 
 def find_single_whl_in_dist(dist_folder: str = "dist/") -> str:
@@ -72,30 +144,132 @@ def find_single_whl_in_dist(dist_folder: str = "dist/") -> str:
 
 def get_site_packages_dir(config: Config) -> str:
     """Find site-packages regardless of virtual environment or OS."""
-    venv_name = config.source_venv
-    if not os.path.exists(venv_name):
-        # will fall back to faking it on non-arm64
-        poetry_interface.create_native_arm64_venv()
-    full_path = os.path.abspath(venv_name)
+    return scan_site_packages(config).root
+
+
+def scan_site_packages(config: Config, exclusions: Optional[list[str]] = None) -> FileIndex:
+    """Install the dependencies if needed, then index site-packages, see scan_installed."""
+    install_dependencies(config, config.source_venv)
+    return scan_installed(config, exclusions)
+
+
+def scan_installed(config: Config, exclusions: Optional[list[str]] = None) -> FileIndex:
+    """Walk the virtual environment as it is once and return the index of its site-packages.
+
+    Sub-folders of excluded folders are not walked at all.
+    """
+    full_path = os.path.abspath(config.source_venv)
     print(f"Virtual environment found at {full_path}")
 
-    site_package_dir = find_site_packages(venv_name)
-    if not site_package_dir or not os.path.exists(site_package_dir):
+    excluded = SuffixMatcher(DEFAULT_EXCLUSIONS if exclusions is None else exclusions)
+    with phase("scan virtualenv") as scanning:
+        index = scan_tree(full_path, descend=lambda folder: not excluded(folder))
+        scanning.add(len(index.files), sum(entry.size for entry in index.files))
+    site_package_dir = find_site_packages(full_path, index)
+    if not site_package_dir:
         logger.warning(f"No site-packages, assuming installed with --target at {full_path}")
-        return full_path
+        return index
         # raise TypeError("Could not find site-packages directory")
-    return site_package_dir
+    return index.subindex(site_package_dir)
+
+
+def current_lock_fingerprint(config: Config) -> Optional[lock_fingerprint.LockFingerprint]:
+    """Fingerprint of the lock file the configured tool installs from, None if there is none."""
+    return lock_fingerprint.current_fingerprint(config.venv_tool, poetry_interface.target_platform_tag())
+
+
+def install_dependencies(config: Config, venv_name: str) -> None:
+    """Install the locked dependencies into venv_name, unless they are already, see lock_fingerprint."""
+    fingerprint = current_lock_fingerprint(config) if config.skip_unchanged_install else None
+    plan = lock_fingerprint.plan_install(venv_name, fingerprint)
+    print(f"Dependencies: {plan.action} install, {plan.reason}")
+    if plan.action == "skip":
+        return
+    timeout = config.command_timeout or None
+    if plan.action == "partial":
+        logger.info(f"Installing again: {', '.join(plan.changed)}. Removing: {', '.join(plan.removed)}")
+        with phase("reinstall changed packages"):
+            if config.venv_tool == "uv":
+                uv_interface.reinstall_packages(
+                    venv_name,
+                    plan.changed,
+                    plan.removed,
+                    config.wheel_index,
+                    timeout,
+                    target_python=config.target_python,
+                )
+            else:
+                poetry_interface.reinstall_packages(venv_name, plan.changed, plan.removed, config.wheel_index, timeout)
+    else:
+        if os.path.exists(lock_fingerprint.fingerprint_path(venv_name)):
+            # raypack installed it, for another lock file, platform or python
+            logger.warning(f"Removing {venv_name}, it doesn't match the lock file")
+            shutil.rmtree(venv_name)
+        elif os.path.exists(venv_name):
+            logger.warning(f"Installing into {venv_name} as it is, it has no fingerprint so raypack doesn't remove it")
+        with phase("create virtualenv"):
+            if config.venv_tool == "uv":
+                uv_interface.create_venv(venv_name, config.wheel_index, timeout, target_python=config.target_python)
+            else:
+                # will fall back to faking it on non-arm64
+                poetry_interface.create_native_arm64_venv(wheel_cache(config), config.wheel_index, timeout)
+    if fingerprint is not None and os.path.exists(venv_name):
+        fingerprint.save(lock_fingerprint.fingerprint_path(venv_name))
 
 
-def uses_aarch64manylinux() -> bool:
-    """Is build server AWS compatible AFAIK?"""
-    return platform.machine() == "aarch64" and platform.system() == "Linux"
+def compression_policy(config: Config) -> CompressionPolicy:
+    """Compression settings from config."""
+    return CompressionPolicy.from_config(config.compression, config.compression_level, config.compression_overrides)
 
 
-def run_with_config(config: Config, output_zip_name: Optional[str] = None) -> None:
-    """Package files for AWS Glue, Ray.io tasks."""
+def report_compression(config: Config) -> list[dict[str, Any]]:
+    """Compare compression policies on the files that would go into the zip."""
+    index = scan_site_packages(config)
+    files = collect_virtualenv_files(config, DEFAULT_EXCLUSIONS, config.outer_folder_name, index.root, index)
+    policies = list(REPORT_POLICIES)
+    configured = (
+        config.compression if config.compression_level is None else f"{config.compression}:{config.compression_level}"
+    )
+    if configured not in policies:
+        policies.append(configured)
+    results = compression_report(files, policies)
+    print(format_report(results))
+    return results
 
-    if not uses_aarch64manylinux():
+
+def default_output_zip_name() -> str:
+    """Zip name from the project name and version in pyproject.toml."""
+    name, version = get_project_info_from_toml()
+    return create_filename(name, version)
+
+
+def validate_modes(config: Config) -> None:
+    """Reject unknown values of the options that pick between modes."""
+    if config.binary_check not in binary_check.BINARY_CHECK_MODES:
+        raise ValueError(
+            f"binary_check must be one of {', '.join(binary_check.BINARY_CHECK_MODES)}, got {config.binary_check!r}"
+        )
+    if config.venv_tool not in VENV_TOOLS:
+        raise ValueError(f"venv_tool must be one of {', '.join(VENV_TOOLS)}, got {config.venv_tool!r}")
+    if config.tree_shaking not in TREE_SHAKING_MODES:
+        raise ValueError(f"tree_shaking must be one of {', '.join(TREE_SHAKING_MODES)}, got {config.tree_shaking!r}")
+
+
+def run_with_config(
+    config: Config,
+    output_zip_name: Optional[str] = None,
+    on_stable: Optional[Callable[[str, int], None]] = None,
+    on_written: Optional[Callable[[], None]] = None,
+) -> str:
+    """Package files for AWS Glue, Ray.io tasks.
+
+    on_stable is called with the path and size of the part of the zip that is
+    already final, while the zip is still being written. on_written is called
+    once the zip is closed, before an incremental build moves it into place, so
+    whoever reads it by the path on_stable gave can finish first.
+    """
+
+    if not poetry_interface.building_on_aarch64():
         logger.warning(
             "From AWS documentation: Ray jobs can run provided binaries, but they must be\n"
             "compiled for Linux on ARM64. "
@@ -108,110 +282,350 @@ def run_with_config(config: Config, output_zip_name: Optional[str] = None) -> No
     logger.debug(f"Current working directory: {cwd}")
 
     if not output_zip_name:
-        name, version = get_project_info_from_toml()
-        output_zip_name = create_filename(name, version)
+        output_zip_name = default_output_zip_name()
         logger.info(f"Using default output filename: {output_zip_name}")
-    venv_path = get_site_packages_dir(Config())
-    logger.info(f"Packaging site-packages from {venv_path}")
-
-    binaries_in_venv = check_for_binary_files(venv_path)
-    if binaries_in_venv:
-        logger.warning("Binary files found in virtualenv.")
-    if binaries_in_venv and config.deps_are_pure_python:
-        logger.warning("Binary files found in virtualenv, but deps_are_pure_python is true.")
-        logger.warning("You need to be on an ARM64 to safely build binaries")
-        logger.warning("Please set deps_are_pure_python to `false` in pyproject.toml.")
-        sys.exit(-1)
-
+    validate_modes(config)
+    warn_about_unused_options(config)
+    rules = rules_for(config.slimming, config.slimming_rules)
+    slimmer = Slimmer(rules) if rules or config.strip_binaries else None
+    index: Optional[FileIndex] = None
+    wheel_paths: list[str] = []
+    if config.from_wheels:
+        wheel_paths = dependency_wheels_to_pack(config)
+        binaries = check_wheel_binaries(config, wheel_paths)
+    else:
+        index = virtualenv_to_pack(config, DEFAULT_EXCLUSIONS, slimmer)
+        binaries = check_venv_binaries(config, index)
+    report_binaries(config, binaries)
+
+    manifest, target_zip_name = incremental_target(config, output_zip_name)
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(target_zip_name)
+    sink = StableOffsetFile(target_zip_name, on_stable) if on_stable else None
+    try:
+        total_count = write_zip(config, sink or target_zip_name, index, wheel_paths, manifest=manifest, slimmer=slimmer)
+    finally:
+        if sink is not None:
+            sink.close()
+        if manifest is not None:
+            manifest.close()
+    if slimmer is not None:
+        print(slimmer.report())
+    if total_count == 0:
+        raise TypeError("No files were added to the zip file. Check the path to site-packages.")
+    if on_written is not None:
+        on_written()
+    if manifest is not None:
+        os.replace(target_zip_name, output_zip_name)
+        manifest.save(manifest_path_for(output_zip_name))
+        logger.info(f"Incremental build reused {manifest.reused} entries, compressed {manifest.compressed}")
+    return output_zip_name
+
+
+def warn_about_unused_options(config: Config) -> None:
+    """Say which options a from_wheels build can't apply."""
+    if not config.from_wheels:
+        return
+    needs_venv = {
+        "tree_shaking": config.tree_shaking != "off",
+        "strip_binaries": config.strip_binaries,
+        "compile_bytecode": config.compile_bytecode != "none",
+    }
+    for option, used in needs_venv.items():
+        if used:
+            logger.warning(f"{option} needs an installed virtual environment, skipped with from_wheels")
+    if config.incremental:
+        logger.info("Wheel members are copied without recompressing, incremental has nothing to add")
+
+
+def dependency_wheels_to_pack(config: Config) -> list[str]:
+    """Wheels of the locked dependencies, without those the runtime provides."""
+    wheel_paths = get_dependency_wheels(config)
+    if config.exclude_runtime_provided:
+        with phase("runtime baseline"):
+            wheel_paths, _report = exclude_runtime_provided_wheels(wheel_paths, config.runtime_baseline)
+    return wheel_paths
+
+
+def virtualenv_to_pack(config: Config, exclusions: list[str], slimmer: Optional[Slimmer] = None) -> FileIndex:
+    """site-packages as it goes into the zip, see prepare_venv_index, with bytecode if configured."""
+    venv_index = prepare_venv_index(config, exclusions, slimmer)
+    with phase("compile bytecode"):
+        venv_index = precompile(venv_index, config.compile_bytecode, config.target_python, config.pack_jobs)
+    logger.info(f"Packaging site-packages from {venv_index.root}, {len(venv_index.files)} files")
+    return venv_index
+
+
+def incremental_target(config: Config, output_zip_name: str) -> tuple[Optional[BuildManifest], str]:
+    """Manifest of the previous build, if incremental, and the file to write the zip to."""
+    if not config.incremental or config.from_wheels:
+        return None, output_zip_name
+    # previous zip is read while the new one is written, so write beside it.
+    manifest = BuildManifest.load(manifest_path_for(output_zip_name), output_zip_name)
+    return manifest, f"{output_zip_name}.partial"
+
+
+def write_zip(
+    config: Config,
+    target: Union[str, StableOffsetFile],
+    index: Optional[FileIndex],
+    wheel_paths: list[str],
+    *,
+    manifest: Optional[BuildManifest] = None,
+    slimmer: Optional[Slimmer] = None,
+) -> int:
+    """Zip the dependencies, from the index or else the wheels, then our own wheel. Returns the files written."""
     # includes = own_package_includes()
 
-    # Zip the directory
-    count = 0
-
-    # implied that this is not wanted, but who knows, maybe someone's app depends on one of these.
-    exclusions = [
-        "_distutils_hack",
-        "wheel",
-        "pkg_resources",
-        "pip",
-        "setuptools",
-        "__pycache__",
-    ]
     # own_package_exclusions = [
     #     "__pycache__",
     # ]
     outer_folder_name = config.outer_folder_name
-
-    with contextlib.suppress(FileNotFoundError):
-        os.remove(output_zip_name)
-    with zipfile.ZipFile(output_zip_name, "w") as zipf:
-        count = zipup_virtualenv(config, count, exclusions, outer_folder_name, venv_path, zipf)
+    policy = compression_policy(config)
+    date_time = reproducible_date_time() if config.deterministic else None
+    with zipfile.ZipFile(
+        target, "w", policy.compress_type, compresslevel=policy.compresslevel  # type: ignore[arg-type]
+    ) as zipf:
+        with phase("zip dependencies") as zipping:
+            count = (
+                zipup_wheels(
+                    config,
+                    DEFAULT_EXCLUSIONS,
+                    outer_folder_name,
+                    wheel_paths,
+                    zipf,
+                    policy=policy,
+                    date_time=date_time,
+                    slimmer=slimmer,
+                )
+                if index is None
+                else zipup_virtualenv(
+                    config,
+                    DEFAULT_EXCLUSIONS,
+                    outer_folder_name,
+                    index.root,
+                    zipf,
+                    manifest=manifest,
+                    policy=policy,
+                    date_time=date_time,
+                    index=index,
+                )
+            )
+            zipping.add(count, sum(info.file_size for info in zipf.filelist))
         if count == 0:
             logger.warning("No files were added to the zip file from virtual env")
 
         # own_count = zipup_own_module(config, includes, outer_folder_name, zipf)
         whl_file = find_single_whl_in_dist()
-        own_count = zipup_own_module_from_wheel(whl_file, outer_folder_name, zipf)
+        with phase("zip own module") as zipping:
+            before = len(zipf.filelist)
+            own_count = zipup_own_module_from_wheel(whl_file, outer_folder_name, zipf, policy, date_time)
+            zipping.add(own_count, sum(info.file_size for info in zipf.filelist[before:]))
         if own_count == 0:
             logger.warning("No files were added to the zip file from own module")
-        total_count = count + own_count
-    if total_count == 0:
-        raise TypeError("No files were added to the zip file. Check the path to site-packages.")
+    return count + own_count
+
+
+def prepare_venv_index(
+    config: Config, exclusions: list[str], slimmer: Optional[Slimmer] = None, *, install: bool = True
+) -> FileIndex:
+    """site-packages of the virtual environment, without what the runtime provides, tree shaking or slimming drop.
+
+    Without install, the virtual environment is taken as it is.
+    """
+    venv_index = scan_site_packages(config, exclusions) if install else scan_installed(config, exclusions)
+    if config.exclude_runtime_provided:
+        with phase("runtime baseline"):
+            venv_index, _report = exclude_runtime_provided(venv_index, config.runtime_baseline)
+    if config.tree_shaking != "off":
+        with phase("tree shaking"):
+            venv_index, _graph = shake_tree(
+                venv_index,
+                import_roots(config, find_single_whl_in_dist()),
+                config.import_allowlist,
+                config.tree_shaking == "prune",
+            )
+    if slimmer is not None:
+        with phase("slimming"):
+            venv_index = slimmer.slim(venv_index)
+        if config.strip_binaries:
+            with phase("strip shared libraries"):
+                venv_index = strip_shared_libraries(venv_index, slimmer)
+    return venv_index
+
+
+def collect_virtualenv_files(
+    config: Config,
+    exclusions: list[str],
+    outer_folder_name: str,
+    venv_path: str,
+    index: Optional[FileIndex] = None,
+) -> list[tuple[str, str]]:
+    """Files from the virtual environment that belong in the zip, as (filepath, arcname)."""
+    excluded = SuffixMatcher(exclusions)
+    if index is None:
+        index = scan_tree(venv_path, descend=lambda folder: not excluded(folder))
+
+    files: list[tuple[str, str]] = []
+    arcname_prefix = os.path.join(outer_folder_name, "")
+    # virtual environment. Cache per folder, files come grouped by folder.
+    skipped_folders: dict[str, bool] = {}
+    for entry in index.files:
+        foldername = entry.folder
+        skip_folder = skipped_folders.get(foldername)
+        if skip_folder is None:
+            skip_folder = False
+            if config.exclude_packaging_cruft and excluded(foldername):
+                logger.warning(f"excluding: {foldername}")
+                skip_folder = True
+            # AWS explicitly asks to remove this, including sub-folders like dist-info/licenses
+            elif any(part.endswith(".dist-info") for part in PurePath(entry.relpath).parts[:-1]):
+                skip_folder = True
+            skipped_folders[foldername] = skip_folder
+        if skip_folder:
+            continue
+
+        filename = entry.name
+        is_packaging_cruft = PACKAGING_CRUFT(filename) or filename == "_virtualenv.py"
+        if "__MACOSX" not in filename and not (config.exclude_packaging_cruft and is_packaging_cruft):
+            # AWS Glue wants an extra folder (docs call it temp_folder, but name doesn't seem to matter)
+            files.append((entry.path, arcname_prefix + entry.relpath))
+        else:
+            logger.warning(f"Skipping {filename}")
+    if config.deterministic:
+        files.sort(key=lambda item: item[1])
+    return files
 
 
 def zipup_virtualenv(
-    config: Config, count: int, exclusions: list[str], outer_folder_name: str, venv_path: str, zipf: zipfile.ZipFile
+    config: Config,
+    exclusions: list[str],
+    outer_folder_name: str,
+    venv_path: str,
+    zipf: zipfile.ZipFile,
+    *,
+    manifest: Optional[BuildManifest] = None,
+    policy: Optional[CompressionPolicy] = None,
+    date_time: Optional[tuple[int, int, int, int, int, int]] = None,
+    index: Optional[FileIndex] = None,
 ) -> int:
-    """Zip up the virtual environment."""
-    # virtual environment.
-    for foldername, _subfolders, filenames in os.walk(venv_path, topdown=True):
-        _subfolders[:] = [d for d in _subfolders if not any(foldername.endswith(folder) for folder in exclusions)]
-
-        if config.exclude_packaging_cruft and any(foldername.endswith(folder) for folder in exclusions):
-            logger.warning(f"excluding: {foldername}")
-            continue
+    """Zip up the virtual environment, reusing entries from the last build if there is a manifest."""
+    files = collect_virtualenv_files(config, exclusions, outer_folder_name, venv_path, index)
+    max_memory = config.max_memory_mb * 1024 * 1024
+    return pack_files(
+        zipf,
+        files,
+        jobs=config.pack_jobs,
+        manifest=manifest,
+        policy=policy,
+        date_time=date_time,
+        max_memory=max_memory,
+    )
 
-        # AWS explicitly asks to remove this.
-        if foldername.endswith("dist-info"):
-            # remove dist-info
-            continue
 
-        for filename in filenames:
-            skip_this = False
+def zipup_own_module_from_wheel(
+    source_whl: str,
+    outer_folder_name: str,
+    new_zip: zipfile.ZipFile,
+    policy: Optional[CompressionPolicy] = None,
+    date_time: Optional[tuple[int, int, int, int, int, int]] = None,
+) -> int:
+    """Copy a .whl file to a new .zip file, excluding the .dist-info/ folders.
 
-            # check again for dist-info
-            path_parts = PurePath(filename).parts
-            if any(part.endswith(".dist-info") for part in path_parts):
-                skip_this = True
-            is_packaging_cruft = (
-                filename.endswith(".pth") or filename.endswith(".virtualenv") or filename == "_virtualenv.py"
-            )
-            if config.exclude_packaging_cruft and is_packaging_cruft:
-                skip_this = True
-            if "__MACOSX" not in filename and not skip_this:
-                count += 1
-                # AWS Glue wants an extra folder (docs call it temp_folder, but name doesn't seem to matter)
-                filepath = os.path.join(foldername, filename)
-                # print(f"Adding {filepath}")
-                zipf.write(filepath, os.path.join(outer_folder_name, os.path.relpath(filepath, venv_path)))
-            else:
-                logger.warning(f"Skipping {filename}")
+    Members are copied without recompressing when their compression already
+    matches. With a date_time, members are sorted and get reproducible headers.
+    """
+    # copy_without_dist_info('source.whl', 'destination.zip')
+    count = 0
+    copied = 0
+    with zipfile.ZipFile(source_whl, "r") as whl:
+        for file_info, path in iter_wheel_members(whl, sort=date_time is not None):
+            filepath = os.path.join(outer_folder_name, path)
+            copied += copy_wheel_member(whl, file_info, filepath, new_zip, policy=policy, date_time=date_time)
+            count += 1
+    logger.debug(f"Copied {copied} of {count} members of {source_whl} without recompressing")
     return count
 
 
-def zipup_own_module_from_wheel(source_whl: str, outer_folder_name: str, new_zip: zipfile.ZipFile) -> int:
-    """Copy a .whl file to a new .zip file, excluding the .dist-info/ folders."""
-    # copy_without_dist_info('source.whl', 'destination.zip')
+def wheel_cache(config: Config) -> Optional[WheelCache]:
+    """The shared wheel cache, unless turned off."""
+    if not config.use_wheel_cache:
+        return None
+    return WheelCache(config.wheel_cache_dir or None, config.wheel_cache_max_mb)
+
+
+def import_roots(config: Config, whl_file: str) -> dict[str, bytes]:
+    """Sources imports are followed from: the entry scripts and every module in our own wheel."""
+    roots = {}
+    for script in config.entry_scripts:
+        with open(script, "rb") as file:
+            roots[os.path.basename(script)] = file.read()
+    with zipfile.ZipFile(whl_file) as whl:
+        for file_info, path in iter_wheel_members(whl):
+            if path.endswith(".py"):
+                roots[path] = whl.read(file_info)
+    return roots
+
+
+def get_dependency_wheels(config: Config) -> list[str]:
+    """Wheels of the locked dependencies, downloaded to wheel_dir if it has none yet."""
+    wheel_paths = find_wheels(config.wheel_dir)
+    if not wheel_paths:
+        with phase("download wheels") as downloading:
+            installer = uv_interface if config.venv_tool == "uv" else poetry_interface
+            installer.download_wheels(
+                config.wheel_dir, wheel_cache(config), config.wheel_index, config.command_timeout or None
+            )
+            wheel_paths = find_wheels(config.wheel_dir)
+            downloading.add(len(wheel_paths), sum(os.path.getsize(path) for path in wheel_paths))
+    print(f"Found {len(wheel_paths)} wheels in {os.path.abspath(config.wheel_dir)}")
+    return wheel_paths
+
+
+def check_for_binary_wheels(
+    config: Config, wheel_paths: list[str], cache: Optional[binary_check.BinaryCache] = None
+) -> list[binary_check.BinaryFile]:
+    """Binary files inside wheels, classified without extracting the wheels."""
+    return binary_check.check_wheels(wheel_paths, config.pack_jobs, cache, config.target_machine, config.target_glibc)
+
+
+def zipup_wheels(
+    config: Config,
+    exclusions: list[str],
+    outer_folder_name: str,
+    wheel_paths: list[str],
+    zipf: zipfile.ZipFile,
+    *,
+    policy: Optional[CompressionPolicy] = None,
+    date_time: Optional[tuple[int, int, int, int, int, int]] = None,
+    slimmer: Optional[Slimmer] = None,
+) -> int:
+    """Put the members of dependency wheels into the zip, as if they had been installed and zipped up."""
+    excluded = SuffixMatcher(exclusions)
+    seen: set[str] = set()
     count = 0
-    with zipfile.ZipFile(source_whl, "r") as whl:
-        for file_info in whl.infolist():
-            path_parts = PurePath(file_info.filename).parts
-            if any(part.endswith(".dist-info") for part in path_parts):
-                continue
-            with whl.open(file_info.filename) as source_file:
-                filepath = os.path.join(outer_folder_name, file_info.filename)
-                new_zip.writestr(filepath, source_file.read())
+    copied = 0
+    for wheel_path in wheel_paths:
+        with zipfile.ZipFile(wheel_path) as whl:
+            for file_info, path in iter_wheel_members(whl, sort=date_time is not None):
+                folders, _, filename = path.rstrip("/").rpartition("/")
+                if config.exclude_packaging_cruft and any(excluded(folder) for folder in folders.split("/") if folder):
+                    continue
+                is_packaging_cruft = PACKAGING_CRUFT(filename) or filename == "_virtualenv.py"
+                if "__MACOSX" in filename or (config.exclude_packaging_cruft and is_packaging_cruft):
+                    logger.warning(f"Skipping {filename}")
+                    continue
+                if slimmer is not None and slimmer.drop(path, file_info.file_size):
+                    continue
+                if path in seen:
+                    logger.warning(f"{path} from {wheel_path} is already in the zip, skipping")
+                    continue
+                seen.add(path)
+                copied += copy_wheel_member(
+                    whl, file_info, os.path.join(outer_folder_name, path), zipf, policy=policy, date_time=date_time
+                )
                 count += 1
+    logger.info(f"Copied {copied} of {count} members from {len(wheel_paths)} wheels without recompressing")
     return count
 
 
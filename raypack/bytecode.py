@@ -0,0 +1,174 @@
+"""
+Precompile dependencies to bytecode for the Python that runs the job.
+
+Bytecode is specific to the interpreter version, so the compiling is done by
+the target interpreter in a subprocess, never by the build host's. The .pyc
+files use unchecked hashes: no timestamps, so the zip stays reproducible and
+the runtime never compares them against the sources.
+
+"alongside" keeps the sources and adds __pycache__/<module>.<tag>.pyc, which
+is what the import system looks for once the zip is extracted. "sourceless"
+replaces each .py with a <module>.pyc in the same folder, which works when
+extracted and when imported straight from the zip with zipimport.
+"""
+
+import json
+import logging
+import os
+import shutil
+import subprocess  # nosec
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+
+from raypack.packing import resolve_jobs
+from raypack.scanner import FileEntry, FileIndex
+
+logger = logging.getLogger(__name__)
+
+BYTECODE_MODES = ("none", "alongside", "sourceless")
+
+BYTECODE_DIR = os.path.join(".raypack", "bytecode")
+
+# Runs in the target interpreter. Reads [source, pyc, display name] triples, prints the ones that failed.
+COMPILE_SCRIPT = """
+import json, py_compile, sys
+failed = []
+for source, cfile, dfile in json.load(sys.stdin):
+    try:
+        py_compile.compile(source, cfile=cfile, dfile=dfile, doraise=True,
+                           invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH)
+    except (py_compile.PyCompileError, UnicodeDecodeError, ValueError):
+        failed.append(source)
+json.dump(failed, sys.stdout)
+"""
+
+# Files per compile subprocess.
+BATCH_SIZE = 500
+
+
+def find_target_python(target_python: str) -> str:
+    """Interpreter path from a version ("3.9" finds python3.9 on PATH), a path, or "" for this one."""
+    if not target_python:
+        return sys.executable
+    if target_python.replace(".", "").isdigit():
+        found = shutil.which(f"python{target_python}")
+        if found is None:
+            raise ValueError(f"python{target_python} not found on PATH, set target_python to its path")
+        return found
+    if not os.path.exists(target_python):
+        raise ValueError(f"target_python {target_python} does not exist")
+    return target_python
+
+
+def target_python_version(target_python: str) -> str:
+    """major.minor of the job's interpreter, configured like find_target_python."""
+    if not target_python:
+        return f"{sys.version_info.major}.{sys.version_info.minor}"
+    if target_python.replace(".", "").isdigit():
+        return target_python
+    result = subprocess.run(  # nosec
+        [find_target_python(target_python), "-c", "import sys; print('%d.%d' % sys.version_info[:2])"],
+        capture_output=True,
+        text=True,
+        check=True,
+        shell=False,
+    )
+    return result.stdout.strip()
+
+
+def cache_tag(python: str) -> str:
+    """e.g. cpython-39, the interpreter's name for its bytecode."""
+    result = subprocess.run(  # nosec
+        [python, "-c", "import sys; print(sys.implementation.cache_tag)"],
+        capture_output=True,
+        text=True,
+        check=True,
+        shell=False,
+    )
+    return result.stdout.strip()
+
+
+def compile_batch(python: str, jobs: list[list[str]]) -> list[str]:
+    """Compile in one target interpreter process. Returns the sources that didn't compile."""
+    result = subprocess.run(  # nosec
+        [python, "-c", COMPILE_SCRIPT],
+        input=json.dumps(jobs),
+        capture_output=True,
+        text=True,
+        check=False,
+        shell=False,
+    )
+    if result.returncode != 0:
+        logger.warning(f"Compiling with {python} failed: {result.stderr.strip()}")
+        return [source for source, _cfile, _dfile in jobs]
+    return list(json.loads(result.stdout))
+
+
+def pyc_relpath(relpath: str, mode: str, tag: str) -> str:
+    """Where the .pyc for a source goes in the zip."""
+    folder, filename = os.path.split(relpath)
+    stem = filename[: -len(".py")]
+    if mode == "sourceless":
+        return os.path.join(folder, f"{stem}.pyc")
+    return os.path.join(folder, "__pycache__", f"{stem}.{tag}.pyc")
+
+
+def precompile(
+    index: FileIndex, mode: str, target_python: str = "", jobs: int = 0, stage_dir: str = BYTECODE_DIR
+) -> FileIndex:
+    """The index with .pyc files for every .py, compiled by the target interpreter.
+
+    Compiled files are staged per interpreter and reused while the source is
+    unchanged. Sources that don't compile (e.g. Python 2 only test files) are
+    packed as they are.
+    """
+    if mode not in BYTECODE_MODES:
+        raise ValueError(f"compile_bytecode must be one of {', '.join(BYTECODE_MODES)}, got {mode!r}")
+    if mode == "none":
+        return index
+    python = find_target_python(target_python)
+    tag = cache_tag(python)
+    stage_root = os.path.abspath(os.path.join(stage_dir, tag))
+    logger.info(f"Compiling bytecode with {python} ({tag})")
+
+    sources = [entry for entry in index.files if entry.name.endswith(".py")]
+    staged = {entry.path: os.path.join(stage_root, pyc_relpath(entry.relpath, mode, tag)) for entry in sources}
+    pending = [
+        [entry.path, staged[entry.path], entry.relpath.replace(os.sep, "/")]
+        for entry in sources
+        if not os.path.exists(staged[entry.path]) or os.stat(staged[entry.path]).st_mtime_ns < entry.mtime_ns
+    ]
+    for folder in {os.path.dirname(cfile) for _source, cfile, _dfile in pending}:
+        os.makedirs(folder, exist_ok=True)
+    failed: set[str] = set()
+    batches = [pending[start : start + BATCH_SIZE] for start in range(0, len(pending), BATCH_SIZE)]
+    with ThreadPoolExecutor(max_workers=resolve_jobs(jobs)) as pool:
+        for batch_failed in pool.map(lambda batch: compile_batch(python, batch), batches):
+            failed.update(batch_failed)
+    logger.info(f"Compiled {len(pending) - len(failed)} files, {len(sources) - len(pending)} were up to date")
+    if failed:
+        logger.warning(f"{len(failed)} files didn't compile for {tag} and are packed as source")
+
+    files: list[FileEntry] = []
+    for entry in index.files:
+        cfile = staged.get(entry.path)
+        if cfile is None or entry.path in failed or not os.path.exists(cfile):
+            files.append(entry)
+            continue
+        if mode == "alongside":
+            files.append(entry)
+        stat = os.stat(cfile)
+        # folder stays the source's, __pycache__ folders are excluded when collecting
+        relpath = pyc_relpath(entry.relpath, mode, tag)
+        files.append(
+            replace(
+                entry,
+                path=cfile,
+                relpath=relpath,
+                name=os.path.basename(relpath),
+                size=stat.st_size,
+                mtime_ns=stat.st_mtime_ns,
+            )
+        )
+    return FileIndex(index.root, files, index.folders)
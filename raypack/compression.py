@@ -0,0 +1,128 @@
+"""
+Compression method and level, per file type.
+
+Policies are written as "method" or "method:level", e.g. "deflate:9", "stored", "lzma".
+"""
+
+import logging
+import os
+import time
+import zipfile
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from raypack.zip_utils import compressed_size, zipinfo_for_file
+
+logger = logging.getLogger(__name__)
+
+COMPRESSION_METHODS = {
+    "stored": zipfile.ZIP_STORED,
+    "deflate": zipfile.ZIP_DEFLATED,
+    "deflated": zipfile.ZIP_DEFLATED,
+    "bzip2": zipfile.ZIP_BZIP2,
+    "lzma": zipfile.ZIP_LZMA,
+}
+
+# Already compressed or not worth the CPU to compress. Overridden by compression_overrides.
+DEFAULT_OVERRIDES = {
+    ".so": "stored",
+    ".pyd": "stored",
+    ".dylib": "stored",
+    ".dll": "stored",
+    ".zip": "stored",
+    ".whl": "stored",
+    ".egg": "stored",
+    ".jar": "stored",
+    ".gz": "stored",
+    ".tgz": "stored",
+    ".bz2": "stored",
+    ".xz": "stored",
+    ".lzma": "stored",
+    ".zst": "stored",
+    ".7z": "stored",
+    ".png": "stored",
+    ".jpg": "stored",
+    ".jpeg": "stored",
+    ".gif": "stored",
+    ".webp": "stored",
+}
+
+# Policies compared by the compression report.
+REPORT_POLICIES = ["stored", "deflate:1", "deflate:6", "deflate:9", "bzip2:9", "lzma"]
+
+
+def parse_policy(policy: str) -> tuple[int, Optional[int]]:
+    """Turn "deflate:9" into (ZIP_DEFLATED, 9)."""
+    method, _, level = policy.strip().lower().partition(":")
+    if method not in COMPRESSION_METHODS:
+        raise ValueError(f"Unknown compression method {method!r}, expected one of {', '.join(COMPRESSION_METHODS)}")
+    if not level:
+        return COMPRESSION_METHODS[method], None
+    if not level.isdigit():
+        raise ValueError(f"Compression level must be a number, got {policy!r}")
+    return COMPRESSION_METHODS[method], int(level)
+
+
+@dataclass
+class CompressionPolicy:
+    """Default method and level plus per-extension overrides."""
+
+    compress_type: int = zipfile.ZIP_DEFLATED
+    compresslevel: Optional[int] = None
+    overrides: dict[str, tuple[int, Optional[int]]] = field(default_factory=dict)
+
+    @classmethod
+    def from_config(cls, method: str, level: Optional[int], overrides: dict[str, str]) -> "CompressionPolicy":
+        """Build a policy from the compression* config values."""
+        compress_type, parsed_level = parse_policy(method)
+        parsed = {extension.lower(): parse_policy(value) for extension, value in DEFAULT_OVERRIDES.items()}
+        parsed |= {extension.lower(): parse_policy(value) for extension, value in overrides.items()}
+        policy = cls(compress_type, level if level is not None else parsed_level, parsed)
+        if any(
+            value[0] in (zipfile.ZIP_BZIP2, zipfile.ZIP_LZMA) for value in [(compress_type, None), *parsed.values()]
+        ):
+            logger.warning("bzip2 and lzma zips can be extracted, but can't be imported directly with zipimport.")
+        return policy
+
+    def for_file(self, filename: str) -> tuple[int, Optional[int]]:
+        """Compression method and level for one file, longest matching extension wins."""
+        lowered = filename.lower()
+        matches = [extension for extension in self.overrides if lowered.endswith(extension)]
+        if matches:
+            return self.overrides[max(matches, key=len)]
+        return self.compress_type, self.compresslevel
+
+
+def compression_report(files: list[tuple[str, str]], policies: list[str]) -> list[dict[str, Any]]:
+    """Compress the files with each policy, without writing a zip, and report size and time."""
+    total_size = sum(os.path.getsize(filepath) for filepath, _arcname in files)
+    results = []
+    for policy in policies:
+        compress_type, level = parse_policy(policy)
+        started = time.perf_counter()
+        compressed = sum(
+            compressed_size(filepath, zipinfo_for_file(filepath, arcname, compress_type, level))
+            for filepath, arcname in files
+        )
+        elapsed = time.perf_counter() - started
+        results.append(
+            {
+                "policy": policy,
+                "files": len(files),
+                "input_bytes": total_size,
+                "compressed_bytes": compressed,
+                "ratio": compressed / total_size if total_size else 1.0,
+                "seconds": elapsed,
+            }
+        )
+    return results
+
+
+def format_report(results: list[dict[str, Any]]) -> str:
+    """Plain text table of a compression report."""
+    lines = [f"{'policy':<12} {'compressed MB':>14} {'ratio':>7} {'seconds':>9}"]
+    for row in results:
+        lines.append(
+            f"{row['policy']:<12} {row['compressed_bytes'] / 1024 / 1024:>14.2f} {row['ratio']:>7.1%} {row['seconds']:>9.2f}"
+        )
+    return "\n".join(lines)
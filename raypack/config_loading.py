@@ -3,8 +3,8 @@ All config related code
 """
 
 import logging
-from dataclasses import dataclass
-from typing import Any
+from dataclasses import dataclass, field
+from typing import Any, Optional
 
 logger = logging.getLogger(__name__)
 
@@ -12,9 +12,73 @@ CONFIG_INFO = {
     "exclude_packaging_cruft": True,
     "outer_folder_name": "venv",
     "source_venv": "vendor",
-    # TODO: support pip as well
+    # poetry or pip (poetry export, then pip install), or uv (uv export from uv.lock, then uv pip install)
     "venv_tool": "poetry",
     "deps_are_pure_python": True,
+    # fingerprint the lock file, skip installing when unchanged and reinstall only changed packages
+    "skip_unchanged_install": True,
+    # binaries that won't load on target_machine with target_glibc: error stops the build, warn only reports
+    "binary_check": "error",
+    "target_machine": "aarch64",
+    "target_glibc": "2.26",
+    "incremental": False,
+    # 0 means one per CPU
+    "pack_jobs": 0,
+    # compressed files waiting to be written, bigger files are streamed
+    "max_memory_mb": 256,
+    # stored, deflate, bzip2 or lzma, optionally with a level, e.g. deflate:9
+    "compression": "deflate",
+    "compression_level": None,
+    # per extension, e.g. {".py": "deflate:9", ".so": "stored"}
+    "compression_overrides": {},
+    # upload parts while the zip is still being written
+    "streaming_upload": False,
+    "upload_part_size_mb": 8,
+    "upload_concurrency": 4,
+    # lets an interrupted streaming upload resume
+    "upload_state_file": ".raypack-upload.json",
+    # don't upload or update the job if the same zip is already in the bucket
+    "skip_unchanged_upload": True,
+    # optional, Glue job to point at the new zip after upload
+    "glue_job_name": "",
+    "script_location": "",
+    # Glue jobs updated at once by --batch and raypack deploy
+    "glue_update_concurrency": 8,
+    # sorted entries, fixed timestamps (SOURCE_DATE_EPOCH) and permissions
+    "deterministic": False,
+    # copy dependencies straight out of wheels in wheel_dir instead of installing them
+    "from_wheels": False,
+    "wheel_dir": "wheels",
+    # wheels shared between builds and projects, "" is RAYPACK_CACHE_DIR or ~/.cache/raypack/wheels
+    "use_wheel_cache": True,
+    "wheel_cache_dir": "",
+    # least recently used wheels are removed past this, 0 is no limit
+    "wheel_cache_max_mb": 4096,
+    # "" is PyPI, a folder or file:// URL of wheels works offline
+    "wheel_index": "",
+    # leave out packages the Glue Ray runtime already has, a shipped baseline name or a requirements file
+    "exclude_runtime_provided": False,
+    "runtime_baseline": "glue-ray-2023-11-07",
+    # off, report (how much of each dependency is imported) or prune (also drop unimported tests/docs/examples)
+    "tree_shaking": "off",
+    # scripts Glue runs, imports are followed from these and from our own wheel
+    "entry_scripts": [],
+    # modules imported dynamically, they and everything below them count as imported
+    "import_allowlist": [],
+    # off, safe (stubs, C sources, markdown) or aggressive (also tests, docs, examples)
+    "slimming": "off",
+    # more rules, name to globs on the path in site-packages, e.g. {"locales" = ["*/locale/*"]}
+    "slimming_rules": {},
+    # strip debug sections from .so copies, needs binutils strip
+    "strip_binaries": False,
+    # none, alongside (__pycache__ next to the sources) or sourceless (.pyc instead of .py)
+    "compile_bytecode": "none",
+    # interpreter the job runs on, a version like "3.9" found on PATH or a path, "" is the one running raypack
+    "target_python": "",
+    # seconds each poetry/pip command may run, 0 is no limit
+    "command_timeout": 0,
+    # [tool.raypack.jobs.<name>] tables for --batch: glue_job_name, script_location, dependencies, include
+    "jobs": {},
 }
 
 
@@ -29,6 +93,43 @@ class Config:
     source_venv: str = "vendor"
     venv_tool: str = "poetry"
     deps_are_pure_python: bool = True
+    skip_unchanged_install: bool = True
+    binary_check: str = "error"
+    target_machine: str = "aarch64"
+    target_glibc: str = "2.26"
+    incremental: bool = False
+    pack_jobs: int = 0
+    max_memory_mb: int = 256
+    compression: str = "deflate"
+    compression_level: Optional[int] = None
+    compression_overrides: dict[str, str] = field(default_factory=dict)
+    streaming_upload: bool = False
+    upload_part_size_mb: int = 8
+    upload_concurrency: int = 4
+    upload_state_file: str = ".raypack-upload.json"
+    skip_unchanged_upload: bool = True
+    glue_job_name: str = ""
+    script_location: str = ""
+    glue_update_concurrency: int = 8
+    deterministic: bool = False
+    from_wheels: bool = False
+    wheel_dir: str = "wheels"
+    use_wheel_cache: bool = True
+    wheel_cache_dir: str = ""
+    wheel_cache_max_mb: int = 4096
+    wheel_index: str = ""
+    exclude_runtime_provided: bool = False
+    runtime_baseline: str = "glue-ray-2023-11-07"
+    tree_shaking: str = "off"
+    entry_scripts: list[str] = field(default_factory=list)
+    import_allowlist: list[str] = field(default_factory=list)
+    slimming: str = "off"
+    slimming_rules: dict[str, list[str]] = field(default_factory=dict)
+    strip_binaries: bool = False
+    compile_bytecode: str = "none"
+    target_python: str = ""
+    command_timeout: int = 0
+    jobs: dict[str, dict[str, Any]] = field(default_factory=dict)
 
     @classmethod
     def from_dict(cls, d: dict[str, Any]) -> "Config":
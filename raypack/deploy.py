@@ -3,61 +3,168 @@ Deploy script and zip to S3.
 """
 
 import logging
+import os
 import sys
-from http import HTTPStatus
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional, Union
 
 import boto3
+import botocore.config
 
-from raypack.aws_interface import upload_to_s3
+from raypack.aws_interface import StreamingUploader, head_object, upload_to_s3
+from raypack.batch import BatchResult, build_batch, load_jobs
+from raypack.build import default_output_zip_name, run_with_config
 from raypack.config_loading import Config
+from raypack.glue_interface import DEFAULT_CONCURRENCY, JobTarget, format_results, glue_client, update_jobs
+from raypack.profiling import phase
 
 logger = logging.getLogger(__name__)
 
 
-def deploy_script_and_zip(config: Config, output_zip_name: str) -> None:
-    """Deploy script and zip to S3."""
+def deploy_script_and_zip(config: Config, output_zip_name: str) -> bool:
+    """Deploy script and zip to S3. Returns False if nothing was uploaded."""
     print(f"Packaged files saved as {output_zip_name}")
     if config.upload_to_s3 and config.s3_bucket_name == "example":
         print("Can't upload, need bucket name, configure via pyproject.toml")
         sys.exit(-1)
     if config.upload_to_s3:
-        logger.info(f"Uploading {output_zip_name} to {config.s3_bucket_name}")
-        upload_to_s3(output_zip_name, config.s3_bucket_name)
+        return upload_zip(config, output_zip_name)
+    return False
 
 
-def update_job_with_script_and_zip(
-    job_name: str,
-    script_name: str,
-    zip_name: str,
-    bucket_for_zip: str,
-) -> None:
-    """Update a Glue job with a new script and zip."""
-    # Initialize a Glue client
-    glue_client = boto3.client("glue")
+def upload_zip(config: Config, output_zip_name: str) -> bool:
+    """Upload the finished zip. Returns False if the bucket already has it."""
+    logger.info(f"Uploading {output_zip_name} to {config.s3_bucket_name}")
+    with phase("upload to s3") as uploading:
+        uploaded = upload_to_s3(
+            output_zip_name,
+            config.s3_bucket_name,
+            skip_unchanged=config.skip_unchanged_upload,
+            part_size=config.upload_part_size_mb * 1024 * 1024 if config.streaming_upload else None,
+        )
+        uploading.add(1, os.path.getsize(output_zip_name) if uploaded else 0)
+    if not uploaded:
+        print(f"{output_zip_name} is already in s3://{config.s3_bucket_name}, skipped upload")
+    return uploaded
 
-    # Specify the new S3 path to the Python modules zip file
-    new_s3_py_modules = f"{bucket_for_zip}/{zip_name}"
 
-    # Specify the new list of packages to be installed using pip
-    # new_pip_install_packages = ['package1', 'package2', 'package3']
+def update_configured_job(config: Config, output_zip_name: str) -> None:
+    """Point the configured Glue job at the uploaded zip, if there is one."""
+    if not config.glue_job_name:
+        return
+    update_job_with_script_and_zip(
+        config.glue_job_name, config.script_location, Path(output_zip_name).name, f"s3://{config.s3_bucket_name}"
+    )
+
+
+def build_and_deploy(config: Config) -> str:
+    """Build the zip and upload it, streaming parts while the zip is written if configured."""
+    if not config.streaming_upload:
+        output_zip_name = run_with_config(config)
+        if deploy_script_and_zip(config, output_zip_name):
+            update_configured_job(config, output_zip_name)
+        return output_zip_name
+
+    if config.s3_bucket_name == "example":
+        print("Can't upload, need bucket name, configure via pyproject.toml")
+        sys.exit(-1)
+    output_zip_name = default_output_zip_name()
+    key = Path(output_zip_name).name
+    if config.skip_unchanged_upload and head_object(boto3.client("s3"), config.s3_bucket_name, key) is not None:
+        # Streamed parts are sent before the zip can be compared with what is there.
+        logger.info(f"s3://{config.s3_bucket_name}/{key} exists, uploading after the build if it changed")
+        run_with_config(config, output_zip_name)
+        print(f"Packaged files saved as {output_zip_name}")
+        if upload_zip(config, output_zip_name):
+            update_configured_job(config, output_zip_name)
+        return output_zip_name
 
-    # Get the current job definition
-    job_response = glue_client.get_job(JobName=job_name)
-    job = job_response["Job"]
+    uploader = StreamingUploader(
+        config.s3_bucket_name,
+        key,
+        part_size=config.upload_part_size_mb * 1024 * 1024,
+        concurrency=config.upload_concurrency,
+        state_file=config.upload_state_file or None,
+    )
+    uploader.start()
+    logger.info(f"Streaming {output_zip_name} to {config.s3_bucket_name} while building")
+    try:
+        # incremental builds write <zip>.partial and rename it, queued parts read it by name
+        run_with_config(config, output_zip_name, on_stable=uploader.feed, on_written=uploader.wait)
+    except BaseException:
+        if not config.upload_state_file:
+            uploader.abort()
+        raise
+    print(f"Packaged files saved as {output_zip_name}")
+    uploader.complete(output_zip_name)
+    update_configured_job(config, output_zip_name)
+    return output_zip_name
 
-    # Update the job parameters
-    job["Command"]["ScriptLocation"] = script_name
-    # job['Command']['PythonVersion'] = '3'  # Specify the desired Python version
-    job["DefaultArguments"]["--s3-py-modules"] = new_s3_py_modules
 
-    # TODO
-    # job['DefaultArguments']['--pip-install'] = ','.join(new_pip_install_packages)
+def build_and_deploy_batch(config: Config) -> BatchResult:
+    """Build the common and job zips, then upload them and point each job at its pair."""
+    result = build_batch(config)
+    if not config.upload_to_s3:
+        return result
+    if config.s3_bucket_name == "example":
+        print("Can't upload, need bucket name, configure via pyproject.toml")
+        sys.exit(-1)
+    zips = [result.common_zip, *result.job_zips.values()]
+    concurrency = max(config.upload_concurrency, 1)
+    # clients are thread safe, the default session that boto3.client uses is not
+    s3 = boto3.client("s3", config=botocore.config.Config(max_pool_connections=concurrency))
+    with phase("upload to s3") as uploading:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            futures = {
+                path: pool.submit(
+                    upload_to_s3, path, config.s3_bucket_name, skip_unchanged=config.skip_unchanged_upload, s3_client=s3
+                )
+                for path in zips
+            }
+            uploaded = {path: future.result() for path, future in futures.items()}
+        uploading.add(sum(uploaded.values()), sum(os.path.getsize(path) for path, done in uploaded.items() if done))
+    for path, done in uploaded.items():
+        if not done:
+            print(f"{path} is already in s3://{config.s3_bucket_name}, skipped upload")
+    if not any(uploaded.values()):
+        return result
+    targets = [
+        JobTarget(
+            job.job_name,
+            [f"s3://{config.s3_bucket_name}/{Path(path).name}" for path in result.py_modules(job.name)],
+            job.script_location,
+        )
+        for job in load_jobs(config.jobs)
+    ]
+    deploy_to_jobs(targets, config.glue_update_concurrency)
+    return result
 
-    # Update the job
-    response = glue_client.update_job(JobName=job_name, JobUpdate=job)
 
-    # Check the response for success
-    if response["ResponseMetadata"]["HTTPStatusCode"] == HTTPStatus.OK:
+def update_job_with_script_and_zip(
+    job_name: str,
+    script_name: str,
+    zip_name: Union[str, list[str]],
+    bucket_for_zip: str,
+) -> None:
+    """Update a Glue job with a new script and zip, or several zips."""
+    zip_names = [zip_name] if isinstance(zip_name, str) else zip_name
+    target = JobTarget(job_name, [f"{bucket_for_zip}/{name}" for name in zip_names], script_name)
+    result = update_jobs([target], concurrency=1)[0]
+    if result.status == "updated":
         print(f"Job '{job_name}' updated successfully.")
+    elif result.status == "unchanged":
+        print(f"Job '{job_name}' already uses {target.py_modules_argument}.")
     else:
         print(f"Failed to update job '{job_name}'.")
+
+
+def deploy_to_jobs(
+    targets: list[JobTarget], concurrency: int = DEFAULT_CONCURRENCY, endpoint_url: Optional[str] = None
+) -> bool:
+    """Roll an artifact out to many jobs at once. Returns False if any update failed."""
+    with phase("update glue jobs") as updating:
+        results = update_jobs(targets, concurrency, glue_client(concurrency, endpoint_url))
+        updating.add(sum(result.status == "updated" for result in results))
+    print(format_results(results))
+    return all(result.status != "failed" for result in results)
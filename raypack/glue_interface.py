@@ -0,0 +1,128 @@
+"""
+Point many Glue jobs at a new artifact.
+
+One client is shared by all updates (boto3 clients are thread safe) with a
+connection pool as big as the concurrency. Throttling is handled by botocore's
+adaptive retry mode, which backs off and rate limits the client as a whole
+rather than each thread retrying on its own.
+
+Jobs whose --s3-py-modules and script location already match are not updated.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+import boto3
+import botocore.config
+import botocore.exceptions
+
+logger = logging.getLogger(__name__)
+
+PY_MODULES_ARGUMENT = "--s3-py-modules"
+
+RETRY_ATTEMPTS = 10
+
+DEFAULT_CONCURRENCY = 8
+
+# get_job returns these, but update_job rejects them along with worker settings
+LEGACY_CAPACITY_FIELDS = ("AllocatedCapacity", "MaxCapacity")
+
+
+@dataclass
+class JobTarget:
+    """What a job should run."""
+
+    job_name: str
+    py_modules: list[str] = field(default_factory=list)
+    # "" keeps the job's script
+    script_location: str = ""
+
+    @property
+    def py_modules_argument(self) -> str:
+        """Comma separated, as Glue wants it."""
+        return ",".join(self.py_modules)
+
+
+@dataclass
+class UpdateResult:
+    """How updating one job went."""
+
+    job_name: str
+    # updated, unchanged or failed
+    status: str
+    error: str = ""
+
+
+def glue_client(concurrency: int = DEFAULT_CONCURRENCY, endpoint_url: Optional[str] = None, **kwargs: Any) -> Any:
+    """Glue client with adaptive retries and a connection per concurrent update."""
+    config = botocore.config.Config(
+        retries={"mode": "adaptive", "max_attempts": RETRY_ATTEMPTS},
+        max_pool_connections=max(concurrency, 1),
+    )
+    return boto3.client("glue", endpoint_url=endpoint_url, config=config, **kwargs)
+
+
+def job_update_from(job: dict[str, Any], client: Any) -> dict[str, Any]:
+    """The parts of a get_job response that update_job accepts, per the service model."""
+    allowed = client.meta.service_model.shape_for("JobUpdate").members
+    update = {key: value for key, value in job.items() if key in allowed}
+    if "WorkerType" in update or "NumberOfWorkers" in update:
+        for key in LEGACY_CAPACITY_FIELDS:
+            update.pop(key, None)
+    else:
+        # deprecated, MaxCapacity says the same
+        update.pop("AllocatedCapacity", None)
+    return update
+
+
+def needs_update(job: dict[str, Any], target: JobTarget) -> bool:
+    """Does the job run something other than the target?"""
+    current_modules = job.get("DefaultArguments", {}).get(PY_MODULES_ARGUMENT, "")
+    if current_modules != target.py_modules_argument:
+        return True
+    return bool(target.script_location) and job.get("Command", {}).get("ScriptLocation") != target.script_location
+
+
+def update_job(client: Any, target: JobTarget) -> UpdateResult:
+    """get_job, then update_job if anything differs."""
+    try:
+        job = client.get_job(JobName=target.job_name)["Job"]
+        if not needs_update(job, target):
+            return UpdateResult(target.job_name, "unchanged")
+        update = job_update_from(job, client)
+        update.setdefault("DefaultArguments", {})[PY_MODULES_ARGUMENT] = target.py_modules_argument
+        if target.script_location:
+            update["Command"]["ScriptLocation"] = target.script_location
+        client.update_job(JobName=target.job_name, JobUpdate=update)
+    except botocore.exceptions.ClientError as error:
+        return UpdateResult(target.job_name, "failed", str(error))
+    return UpdateResult(target.job_name, "updated")
+
+
+def update_jobs(
+    targets: list[JobTarget], concurrency: int = DEFAULT_CONCURRENCY, client: Any = None
+) -> list[UpdateResult]:
+    """Update jobs, at most concurrency at a time, with one shared client. Results are in target order."""
+    if not targets:
+        return []
+    client = client or glue_client(concurrency)
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(targets)))) as pool:
+        results = list(pool.map(lambda target: update_job(client, target), targets))
+    for result in results:
+        if result.status == "failed":
+            logger.warning(f"Failed to update job '{result.job_name}': {result.error}")
+    return results
+
+
+def format_results(results: list[UpdateResult]) -> str:
+    """One line per job and a count per status."""
+    lines = [
+        f"{result.job_name:<40} {result.status}{': ' + result.error if result.error else ''}" for result in results
+    ]
+    counts = {
+        status: sum(result.status == status for result in results) for status in ("updated", "unchanged", "failed")
+    }
+    lines.append(", ".join(f"{count} {status}" for status, count in counts.items()))
+    return "\n".join(lines)
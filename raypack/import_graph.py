@@ -0,0 +1,214 @@
+"""
+Static import graph of the dependencies, starting from our own code.
+
+Modules are parsed with ast only once something reachable imports them, so
+most of a large dependency is never read. Dynamic imports can't be seen, an
+allow-list marks modules (and everything below them) as used anyway.
+
+Reachability is only used to prune whole tests, docs, examples and benchmark
+folders that nothing imports. Anything else unreachable is reported, not
+removed.
+"""
+
+import ast
+import logging
+import os
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Optional
+
+from raypack.scanner import FileEntry, FileIndex
+
+logger = logging.getLogger(__name__)
+
+# Folders that are dropped when nothing imports from them.
+PRUNABLE_FOLDERS = frozenset(
+    ["tests", "test", "testing", "docs", "doc", "examples", "example", "benchmarks", "benchmark", "bench"]
+)
+
+TREE_SHAKING_MODES = ("off", "report", "prune")
+
+SOURCE_SUFFIX = ".py"
+EXTENSION_SUFFIXES = (".so", ".pyd")
+
+
+def module_name_for(relpath: str) -> Optional[str]:
+    """Dotted module name of a file in site-packages, None if it isn't a module."""
+    parts = relpath.replace(os.sep, "/").split("/")
+    filename = parts[-1]
+    if filename.endswith(SOURCE_SUFFIX):
+        stem = filename[: -len(SOURCE_SUFFIX)]
+    elif filename.endswith(EXTENSION_SUFFIXES):
+        # _speedups.cpython-311-aarch64-linux-gnu.so
+        stem = filename.split(".", 1)[0]
+    else:
+        return None
+    names = parts[:-1] if stem == "__init__" else [*parts[:-1], stem]
+    if not names or not all(name.isidentifier() for name in names):
+        return None
+    return ".".join(names)
+
+
+def resolve_relative(module: str, is_package: bool, level: int, target: Optional[str]) -> Optional[str]:
+    """Absolute name for `from ..target import x` inside module."""
+    package = module if is_package else module.rpartition(".")[0]
+    for _ in range(level - 1):
+        if not package:
+            return None
+        package = package.rpartition(".")[0]
+    if not package:
+        return target
+    return f"{package}.{target}" if target else package
+
+
+def imports_of(source: bytes, module: str, is_package: bool) -> set[str]:
+    """Module names a source file imports, including string literals given to importlib.import_module."""
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError) as error:
+        logger.debug(f"Can't parse {module}: {error}")
+        return set()
+    found: set[str] = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            found.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            base = resolve_relative(module, is_package, node.level, node.module) if node.level else node.module
+            if not base:
+                continue
+            found.add(base)
+            # from package import submodule
+            found.update(f"{base}.{alias.name}" for alias in node.names if alias.name != "*")
+        elif isinstance(node, ast.Call) and node.args and isinstance(node.args[0], ast.Constant):
+            func = node.func
+            name = func.attr if isinstance(func, ast.Attribute) else getattr(func, "id", "")
+            if name in ("import_module", "__import__") and isinstance(node.args[0].value, str):
+                found.add(node.args[0].value)
+    return found
+
+
+@dataclass
+class Reachability:
+    """How much of a top-level package is imported."""
+
+    package: str
+    modules: int = 0
+    size: int = 0
+    reachable_modules: int = 0
+    reachable_size: int = 0
+
+    @property
+    def fraction(self) -> float:
+        """Reachable share of the module bytes, or of the modules if they are all empty."""
+        if self.size:
+            return self.reachable_size / self.size
+        return self.reachable_modules / self.modules if self.modules else 1.0
+
+
+@dataclass
+class ImportGraph:
+    """Modules in site-packages and which of them can be reached from the roots."""
+
+    modules: dict[str, FileEntry] = field(default_factory=dict)
+    reachable: set[str] = field(default_factory=set)
+
+    @classmethod
+    def from_index(cls, index: FileIndex) -> "ImportGraph":
+        """Map module names to files. A .py wins over an extension module of the same name."""
+        modules: dict[str, FileEntry] = {}
+        for entry in index.files:
+            name = module_name_for(entry.relpath)
+            if name is not None and (name not in modules or entry.name.endswith(SOURCE_SUFFIX)):
+                modules[name] = entry
+        return cls(modules)
+
+    def _mark(self, name: str, queue: deque[str]) -> None:
+        """Importing a.b.c runs a/__init__.py and a/b/__init__.py first."""
+        parts = name.split(".")
+        for end in range(1, len(parts) + 1):
+            prefix = ".".join(parts[:end])
+            if prefix in self.modules and prefix not in self.reachable:
+                self.reachable.add(prefix)
+                queue.append(prefix)
+
+    def walk(self, roots: dict[str, bytes], allowlist: Optional[list[str]] = None) -> None:
+        """Follow imports from the roots and the allow-listed modules.
+
+        roots are sources by relative path, e.g. entry scripts and the modules of our own wheel.
+        """
+        queue: deque[str] = deque()
+        for allowed in allowlist or []:
+            prefix = f"{allowed}."
+            for name in self.modules:
+                if name == allowed or name.startswith(prefix):
+                    self._mark(name, queue)
+        for relpath, source in roots.items():
+            module = module_name_for(relpath) or "__main__"
+            for imported in imports_of(source, module, os.path.basename(relpath) == "__init__.py"):
+                self._mark(imported, queue)
+        while queue:
+            name = queue.popleft()
+            entry = self.modules[name]
+            if not entry.name.endswith(SOURCE_SUFFIX):
+                continue
+            with open(entry.path, "rb") as file:
+                source = file.read()
+            for imported in imports_of(source, name, entry.name == "__init__.py"):
+                self._mark(imported, queue)
+
+    def report(self) -> list[Reachability]:
+        """Per top-level package, biggest first."""
+        totals: dict[str, Reachability] = {}
+        for name, entry in self.modules.items():
+            top = name.split(".", 1)[0]
+            row = totals.setdefault(top, Reachability(top))
+            row.modules += 1
+            row.size += entry.size
+            if name in self.reachable:
+                row.reachable_modules += 1
+                row.reachable_size += entry.size
+        return sorted(totals.values(), key=lambda row: (-row.size, row.package))
+
+    def prunable_folders(self, index: FileIndex) -> list[str]:
+        """tests, docs, examples and benchmark folders with no reachable module in them."""
+        reachable_paths = [self.modules[name].path for name in self.reachable]
+        pruned: list[str] = []
+        for folder in index.folders:
+            if os.path.basename(folder) not in PRUNABLE_FOLDERS or folder == index.root:
+                continue
+            prefix = os.path.join(folder, "")
+            # inside a folder that is already pruned
+            if any(folder.startswith(os.path.join(done, "")) for done in pruned):
+                continue
+            if not any(path.startswith(prefix) for path in reachable_paths):
+                pruned.append(folder)
+        return pruned
+
+
+def format_reachability(rows: list[Reachability]) -> str:
+    """Plain text table of the reachability report."""
+    lines = [f"{'package':<30} {'modules':>8} {'MB':>8} {'reachable':>10}"]
+    for row in rows:
+        lines.append(f"{row.package:<30} {row.modules:>8} {row.size / 1024 / 1024:>8.2f} {row.fraction:>10.1%}")
+    return "\n".join(lines)
+
+
+def shake_tree(
+    index: FileIndex, roots: dict[str, bytes], allowlist: Optional[list[str]] = None, prune: bool = False
+) -> tuple[FileIndex, ImportGraph]:
+    """Report how much of each dependency is reachable, and optionally drop unreachable tests/docs/examples."""
+    graph = ImportGraph.from_index(index)
+    graph.walk(roots, allowlist)
+    print(format_reachability(graph.report()))
+    if not prune:
+        return index, graph
+    folders = graph.prunable_folders(index)
+    prefixes = tuple(os.path.join(folder, "") for folder in folders)
+    dropped = {entry.relpath for entry in index.files if entry.path.startswith(prefixes)} if prefixes else set()
+    saved = sum(entry.size for entry in index.files if entry.relpath in dropped)
+    print(
+        f"Pruned {len(folders)} unreachable test/doc/example folders, {len(dropped)} files, {saved / 1024 / 1024:.2f} MB"
+    )
+    for folder in folders:
+        logger.debug(f"Pruned {folder}")
+    return index.without(dropped), graph
@@ -0,0 +1,127 @@
+"""
+Summarize a built zip without extracting it.
+
+Sizes per top-level entry (package, module or .dist-info folder) and per
+compression method come from the central directory. Binaries are classified
+from their member headers, see binary_check. glibc symbol versions are only
+read from stored members, reading them from compressed ones would mean
+decompressing the whole member.
+"""
+
+import json
+import logging
+import os
+import zipfile
+from dataclasses import asdict
+from typing import Any, Optional
+
+from raypack.bench import outer_folder
+from raypack.binary_check import (
+    TARGET_GLIBC,
+    TARGET_MACHINE,
+    BinaryFile,
+    BinaryInfo,
+    classify,
+    compatibility_problem,
+    format_report,
+    is_candidate,
+)
+
+logger = logging.getLogger(__name__)
+
+COMPRESSION_NAMES = {
+    zipfile.ZIP_STORED: "stored",
+    zipfile.ZIP_DEFLATED: "deflate",
+    zipfile.ZIP_BZIP2: "bzip2",
+    zipfile.ZIP_LZMA: "lzma",
+}
+
+
+def zip_binaries(
+    zipf: zipfile.ZipFile, machine: str = TARGET_MACHINE, max_glibc: str = TARGET_GLIBC
+) -> list[BinaryFile]:
+    """Binaries among the members of an open zip."""
+    binaries = []
+    for info in zipf.infolist():
+        if info.is_dir() or not is_candidate(info.filename.rsplit("/", 1)[-1], info.external_attr >> 16):
+            continue
+        with zipf.open(info) as member:
+            binary = classify(member, symbol_versions=info.compress_type == zipfile.ZIP_STORED)
+        if binary is not None:
+            binaries.append(BinaryFile(info.filename, binary, compatibility_problem(binary, machine, max_glibc)))
+    return binaries
+
+
+def inspect_zip(zip_path: str, machine: str = TARGET_MACHINE, max_glibc: str = TARGET_GLIBC) -> dict[str, Any]:
+    """Sizes, compression methods and binaries of a zip."""
+    with zipfile.ZipFile(zip_path) as zipf:
+        infos = [info for info in zipf.infolist() if not info.is_dir()]
+        prefix = outer_folder([info.filename for info in infos])
+        top_level: dict[str, dict[str, int]] = {}
+        compression: dict[str, int] = {}
+        for info in infos:
+            relative = info.filename[len(prefix) + 1 :] if prefix else info.filename
+            entry = top_level.setdefault(relative.split("/", 1)[0], {"files": 0, "bytes": 0, "compressed_bytes": 0})
+            entry["files"] += 1
+            entry["bytes"] += info.file_size
+            entry["compressed_bytes"] += info.compress_size
+            method = COMPRESSION_NAMES.get(info.compress_type, str(info.compress_type))
+            compression[method] = compression.get(method, 0) + 1
+        binaries = zip_binaries(zipf, machine, max_glibc)
+    return {
+        "zip": zip_path,
+        "zip_bytes": os.path.getsize(zip_path),
+        "outer_folder": prefix,
+        "files": len(infos),
+        "bytes": sum(info.file_size for info in infos),
+        "compressed_bytes": sum(info.compress_size for info in infos),
+        "compression": compression,
+        "top_level": top_level,
+        "binaries": [{"path": binary.path, **asdict(binary.info), "problem": binary.problem} for binary in binaries],
+    }
+
+
+def format_inspection(report: dict[str, Any], top: int = 20) -> str:
+    """The biggest top-level entries, compression methods and binaries, as text."""
+    lines = [
+        f"{report['zip']}: {report['files']} files, {report['bytes'] / 1024 / 1024:.2f} MB,"
+        f" {report['zip_bytes'] / 1024 / 1024:.2f} MB zipped, outer folder {report['outer_folder'] or '(none)'}",
+        "compression: " + ", ".join(f"{method} {count}" for method, count in sorted(report["compression"].items())),
+        "",
+        f"{'top level':<40} {'files':>7} {'MB':>9} {'zipped MB':>10}",
+    ]
+    entries = sorted(report["top_level"].items(), key=lambda item: -item[1]["compressed_bytes"])
+    for name, entry in entries[:top]:
+        lines.append(
+            f"{name:<40} {entry['files']:>7} {entry['bytes'] / 1024 / 1024:>9.2f}"
+            f" {entry['compressed_bytes'] / 1024 / 1024:>10.2f}"
+        )
+    if len(entries) > top:
+        lines.append(f"... and {len(entries) - top} more")
+    if report["binaries"]:
+        lines.append("")
+        lines.append(format_report([binary_from_dict(binary) for binary in report["binaries"]]))
+    return "\n".join(lines)
+
+
+def binary_from_dict(data: dict[str, Any]) -> BinaryFile:
+    """Back from the JSON form in a report."""
+    info = {key: value for key, value in data.items() if key not in ("path", "problem")}
+    return BinaryFile(data["path"], BinaryInfo(**info), data["problem"])
+
+
+def run_inspect(
+    zip_path: str,
+    json_path: Optional[str] = None,
+    top: int = 20,
+    machine: str = TARGET_MACHINE,
+    max_glibc: str = TARGET_GLIBC,
+) -> int:
+    """raypack inspect: print the summary, optionally save it as JSON. 1 if a binary won't load."""
+    report = inspect_zip(zip_path, machine, max_glibc)
+    print(format_inspection(report, top))
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+        logger.info(f"Wrote {json_path}")
+    return 1 if any(binary["problem"] for binary in report["binaries"]) else 0
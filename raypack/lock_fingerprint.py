@@ -0,0 +1,125 @@
+"""
+Skip installing dependencies when the lock file didn't change.
+
+A fingerprint is a hash of each package's entry in poetry.lock (uv.lock for
+the uv tool), plus the platform and Python tags the install was for. It is
+saved next to the virtual environment after an install. On the next build the
+same fingerprint skips the install, and if only some locked entries changed,
+only those packages are installed again. No fingerprint, or one for another
+platform, Python or lock file, means a fresh install.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sys
+from dataclasses import asdict, dataclass, field
+from typing import Optional
+
+import toml
+
+from raypack.wheel_cache import normalize_name
+
+logger = logging.getLogger(__name__)
+
+LOCKFILES = {"poetry": "poetry.lock", "pip": "poetry.lock", "uv": "uv.lock"}
+
+
+@dataclass
+class LockFingerprint:
+    """What an install of the dependencies was made from."""
+
+    lockfile: str
+    platform: str
+    python: str
+    # normalized name to sha256 of its locked entry
+    packages: dict[str, str] = field(default_factory=dict)
+
+    def save(self, path: str) -> None:
+        """Write as JSON."""
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(asdict(self), file, indent=2, sort_keys=True)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["LockFingerprint"]:
+        """Read a saved fingerprint, None if missing or unreadable."""
+        try:
+            with open(path, encoding="utf-8") as file:
+                return cls(**json.load(file))
+        except (OSError, ValueError, TypeError) as error:
+            logger.debug(f"No usable fingerprint at {path}: {error}")
+            return None
+
+
+@dataclass
+class InstallPlan:
+    """What to install: nothing, some packages, or everything."""
+
+    action: str
+    reason: str
+    # new or changed, normalized names
+    changed: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+
+
+def python_tag() -> str:
+    """Tag of the interpreter installs are made for, e.g. cp311."""
+    prefix = {"cpython": "cp", "pypy": "pp"}.get(sys.implementation.name, "py")
+    return f"{prefix}{sys.version_info.major}{sys.version_info.minor}"
+
+
+def fingerprint_path(venv_path: str) -> str:
+    """Saved next to the virtual environment, not in it, so it doesn't end up in the zip."""
+    return os.path.normpath(venv_path) + ".fingerprint.json"
+
+
+def locked_packages(lockfile: str) -> dict[str, str]:
+    """sha256 of each [[package]] entry of a poetry.lock or uv.lock, by normalized name.
+
+    The project itself (an editable or virtual source in uv.lock) is left out,
+    it is built as a wheel and not installed.
+    """
+    data = toml.load(lockfile)
+    packages: dict[str, str] = {}
+    for package in data.get("package", []):
+        source = package.get("source", {})
+        if "editable" in source or "virtual" in source:
+            continue
+        entry = json.dumps(package, sort_keys=True, default=str).encode("utf-8")
+        name = normalize_name(package["name"])
+        # a package locked twice for different markers counts as one
+        packages[name] = hashlib.sha256(packages.get(name, "").encode("utf-8") + entry).hexdigest()
+    return packages
+
+
+def current_fingerprint(venv_tool: str, platform_tag: str) -> Optional[LockFingerprint]:
+    """Fingerprint of the lock file the tool installs from, None if there is none."""
+    lockfile = LOCKFILES.get(venv_tool, "poetry.lock")
+    if not os.path.exists(lockfile):
+        return None
+    return LockFingerprint(lockfile, platform_tag, python_tag(), locked_packages(lockfile))
+
+
+def plan_install(venv_path: str, current: Optional[LockFingerprint]) -> InstallPlan:
+    """Compare the lock file with what the virtual environment was installed from."""
+    if not os.path.exists(venv_path):
+        return InstallPlan("full", f"no virtual environment at {venv_path}")
+    if current is None:
+        return InstallPlan("skip", f"no lock file to compare with, using {venv_path} as it is")
+    previous = LockFingerprint.load(fingerprint_path(venv_path))
+    if previous is None:
+        return InstallPlan("full", f"{venv_path} has no fingerprint, can't tell what it was installed from")
+    if (previous.lockfile, previous.platform, previous.python) != (current.lockfile, current.platform, current.python):
+        return InstallPlan(
+            "full",
+            f"{venv_path} was installed from {previous.lockfile} for {previous.platform} {previous.python},"
+            f" now {current.lockfile} for {current.platform} {current.python}",
+        )
+    changed = sorted(name for name, digest in current.packages.items() if previous.packages.get(name) != digest)
+    removed = sorted(set(previous.packages) - set(current.packages))
+    if not changed and not removed:
+        return InstallPlan("skip", f"{current.lockfile} unchanged since {venv_path} was installed")
+    return InstallPlan(
+        "partial", f"{len(changed)} changed and {len(removed)} removed in {current.lockfile}", changed, removed
+    )
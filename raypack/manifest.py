@@ -0,0 +1,181 @@
+"""
+Build manifest for incremental rebuilds.
+
+The manifest records what went into the last archive. On the next build, files
+whose content hash is unchanged have their compressed bytes copied straight out
+of the previous archive instead of being read and compressed again.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import zipfile
+from collections.abc import Iterator
+from dataclasses import asdict, dataclass
+from typing import Optional, Union
+
+from raypack.zip_utils import READ_SIZE, compress_file, iter_raw_member, read_raw_member, write_file
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+
+
+@dataclass
+class ManifestEntry:
+    """One archive member and the source file it came from."""
+
+    path: str
+    size: int
+    mtime_ns: int
+    sha256: str
+    compress_type: int
+    compresslevel: Optional[int]
+    crc: int
+    compress_size: int
+
+
+def manifest_path_for(output_zip_name: str) -> str:
+    """Manifest lives next to the zip it describes."""
+    return f"{output_zip_name}.manifest.json"
+
+
+def hash_file(filepath: str) -> str:
+    """sha256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as file:
+        for chunk in iter(lambda: file.read(READ_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class BuildManifest:
+    """Previous build's entries plus the entries written by this build."""
+
+    def __init__(
+        self, previous: Optional[dict[str, ManifestEntry]] = None, previous_zip: Optional[zipfile.ZipFile] = None
+    ) -> None:
+        self.previous = previous or {}
+        self.previous_zip = previous_zip
+        self.entries: dict[str, ManifestEntry] = {}
+        self.reused = 0
+        self.compressed = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, manifest_path: str, previous_zip_path: str) -> "BuildManifest":
+        """Load the last manifest, if it and its archive are still around."""
+        if not os.path.exists(manifest_path) or not os.path.exists(previous_zip_path):
+            return cls()
+        try:
+            with open(manifest_path, encoding="utf-8") as file:
+                data = json.load(file)
+            if data.get("version") != MANIFEST_VERSION:
+                logger.info(f"Ignoring manifest {manifest_path} with unknown version")
+                return cls()
+            previous = {name: ManifestEntry(**entry) for name, entry in data["entries"].items()}
+            previous_zip = zipfile.ZipFile(previous_zip_path, "r")  # pylint: disable=consider-using-with
+        except (ValueError, KeyError, TypeError, zipfile.BadZipFile) as error:
+            logger.warning(f"Can't use previous build manifest {manifest_path}: {error}")
+            return cls()
+        return cls(previous, previous_zip)
+
+    def save(self, manifest_path: str) -> None:
+        """Write the entries of this build."""
+        data = {
+            "version": MANIFEST_VERSION,
+            "entries": {name: asdict(entry) for name, entry in sorted(self.entries.items())},
+        }
+        with open(manifest_path, "w", encoding="utf-8") as file:
+            json.dump(data, file, indent=1)
+
+    def close(self) -> None:
+        """Release the previous archive."""
+        if self.previous_zip is not None:
+            self.previous_zip.close()
+            self.previous_zip = None
+
+    def _reusable(
+        self, arcname: str, zinfo: zipfile.ZipInfo, filepath: str, stat: os.stat_result
+    ) -> Optional[tuple[ManifestEntry, zipfile.ZipInfo]]:
+        """Find the previous member with identical content and compression, if any."""
+        old = self.previous.get(arcname)
+        if old is None or self.previous_zip is None:
+            return None
+        same_compression = (
+            old.compress_type == zinfo.compress_type
+            and old.compresslevel == zinfo._compresslevel  # type: ignore[attr-defined] # pylint: disable=protected-access
+        )
+        if not same_compression or old.size != stat.st_size:
+            return None
+        stat_changed = old.path != filepath or old.mtime_ns != stat.st_mtime_ns
+        # stat changed, content might not have.
+        if stat_changed and hash_file(filepath) != old.sha256:
+            return None
+        try:
+            old_info = self.previous_zip.getinfo(arcname)
+        except KeyError:
+            return None
+        if old.crc != old_info.CRC or old.compress_size != old_info.compress_size:
+            return None
+        return old, old_info
+
+    def prepare(
+        self, filepath: str, zinfo: zipfile.ZipInfo, in_memory: bool = True
+    ) -> Union[bytes, Iterator[bytes], None]:
+        """Compressed bytes for a file, reused from the previous archive when possible.
+
+        Fills in CRC and sizes on zinfo. Safe to call from worker threads. The
+        result is what zipfile would have written for the same ZipInfo.
+
+        Without in_memory, a reused member comes back as chunks still to be
+        read from the previous archive, and a changed file as None, for the
+        caller to stream in with write().
+        """
+        arcname = zinfo.filename
+        stat = os.stat(filepath)
+
+        reusable = self._reusable(arcname, zinfo, filepath, stat)
+        if reusable and self.previous_zip is not None:
+            old, old_info = reusable
+            zinfo.CRC = old_info.CRC
+            zinfo.file_size = old_info.file_size
+            zinfo.compress_size = old_info.compress_size
+            if in_memory:
+                raw: Union[bytes, Iterator[bytes]] = read_raw_member(self.previous_zip, old_info)
+            else:
+                raw = iter_raw_member(self.previous_zip, old_info)
+            with self._lock:
+                self.reused += 1
+            self.record(filepath, stat, zinfo, old.sha256)
+            return raw
+        if not in_memory:
+            return None
+        raw, sha256 = compress_file(filepath, zinfo, True)
+        with self._lock:
+            self.compressed += 1
+        self.record(filepath, stat, zinfo, sha256)
+        return raw
+
+    def write(self, zipf: zipfile.ZipFile, filepath: str, zinfo: zipfile.ZipInfo) -> None:
+        """Stream a changed file into the zip, compressing as it goes, and record it."""
+        stat = os.stat(filepath)
+        sha256 = write_file(zipf, filepath, zinfo, with_digest=True)
+        with self._lock:
+            self.compressed += 1
+        self.record(filepath, stat, zinfo, sha256)
+
+    def record(self, filepath: str, stat: os.stat_result, zinfo: zipfile.ZipInfo, sha256: str) -> None:
+        """Remember a written member for the next build. zinfo must have its CRC and sizes."""
+        self.entries[zinfo.filename] = ManifestEntry(
+            path=filepath,
+            size=stat.st_size,
+            mtime_ns=stat.st_mtime_ns,
+            sha256=sha256,
+            compress_type=zinfo.compress_type,
+            compresslevel=zinfo._compresslevel,  # type: ignore[attr-defined] # pylint: disable=protected-access
+            crc=zinfo.CRC,
+            compress_size=zinfo.compress_size,
+        )
@@ -0,0 +1,138 @@
+"""
+Write files into the zip, compressing on several cores.
+
+Worker threads read and compress members (zlib, bz2 and lzma release the GIL),
+the calling thread is the only writer and appends finished members in the order
+they were given, so the archive is the same as a serial build.
+
+Compressed members wait in memory for their turn, at most max_memory bytes of
+them. Files too big to wait are streamed by the writer when their turn comes,
+a chunk at a time, so a multi-GB file costs no more memory than a small one.
+"""
+
+import collections
+import logging
+import os
+import zipfile
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional, TypeVar, Union
+
+from raypack.compression import CompressionPolicy
+from raypack.manifest import BuildManifest
+from raypack.zip_utils import READ_SIZE, compress_file, write_file, write_raw_member, zipinfo_for_file
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+DEFAULT_MAX_MEMORY = 256 * 1024 * 1024
+
+# file path, its ZipInfo and the compressed member, None if the writer streams it
+Prepared = tuple[str, zipfile.ZipInfo, Union[bytes, Iterator[bytes], None]]
+
+
+def resolve_jobs(jobs: int) -> int:
+    """0 or less means one job per CPU."""
+    if jobs > 0:
+        return jobs
+    return os.cpu_count() or 1
+
+
+def ordered_map(
+    pool: ThreadPoolExecutor,
+    func: Callable[[T], R],
+    items: Iterable[T],
+    window: int,
+    *,
+    weight: Optional[Callable[[T], int]] = None,
+    budget: int = 0,
+) -> Iterator[R]:
+    """Like pool.map, but only `window` results are in flight, so memory stays bounded.
+
+    With a weight per item, in flight items also have to fit in budget. An item
+    heavier than the budget waits until it is the only one.
+    """
+    pending: collections.deque[tuple[Future[R], int]] = collections.deque()
+    in_flight = 0
+    for item in items:
+        cost = weight(item) if weight is not None else 0
+        while pending and (len(pending) >= window or (budget and in_flight + cost > budget)):
+            future, done = pending.popleft()
+            in_flight -= done
+            yield future.result()
+        pending.append((pool.submit(func, item), cost))
+        in_flight += cost
+    while pending:
+        yield pending.popleft()[0].result()
+
+
+def pack_files(
+    zipf: zipfile.ZipFile,
+    files: list[tuple[str, str]],
+    *,
+    jobs: int = 1,
+    manifest: Optional[BuildManifest] = None,
+    policy: Optional[CompressionPolicy] = None,
+    date_time: Optional[tuple[int, int, int, int, int, int]] = None,
+    max_memory: int = DEFAULT_MAX_MEMORY,
+) -> int:
+    """Write (filepath, arcname) pairs to the zip. Returns count of files written.
+
+    A date_time makes the entries reproducible, see zip_utils.normalize_zipinfo.
+    max_memory caps the bytes of compressed members waiting to be written.
+    """
+
+    def zipinfo_for(filepath: str, arcname: str) -> zipfile.ZipInfo:
+        if policy is not None:
+            compress_type, compresslevel = policy.for_file(arcname)
+        else:
+            compress_type, compresslevel = zipf.compression, zipf.compresslevel
+        return zipinfo_for_file(filepath, arcname, compress_type, compresslevel, date_time)
+
+    jobs = resolve_jobs(jobs)
+    if jobs == 1 and manifest is None:
+        for filepath, arcname in files:
+            write_file(zipf, filepath, zipinfo_for(filepath, arcname))
+        return len(files)
+
+    # every worker can hold a member this big and still leave room for as many again
+    stream_over = max(READ_SIZE, max_memory // (2 * jobs))
+
+    def prepare(item: tuple[str, zipfile.ZipInfo]) -> Prepared:
+        filepath, zinfo = item
+        in_memory = zinfo.file_size <= stream_over
+        if manifest is not None:
+            return filepath, zinfo, manifest.prepare(filepath, zinfo, in_memory)
+        if not in_memory:
+            return filepath, zinfo, None
+        raw, _digest = compress_file(filepath, zinfo)
+        return filepath, zinfo, raw
+
+    def write(prepared: Prepared) -> None:
+        filepath, zinfo, raw = prepared
+        if raw is not None:
+            write_raw_member(zipf, zinfo, raw)
+        elif manifest is not None:
+            manifest.write(zipf, filepath, zinfo)
+        else:
+            write_file(zipf, filepath, zinfo)
+
+    items = ((filepath, zipinfo_for(filepath, arcname)) for filepath, arcname in files)
+    if jobs == 1:
+        for item in items:
+            write(prepare(item))
+        return len(files)
+
+    def weight(item: tuple[str, zipfile.ZipInfo]) -> int:
+        # streamed members are never held, compression rarely grows the rest
+        return item[1].file_size if item[1].file_size <= stream_over else 0
+
+    logger.debug(
+        f"Compressing {len(files)} files with {jobs} threads, holding at most {max_memory / 1024 / 1024:.0f} MB"
+    )
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        for prepared in ordered_map(pool, prepare, items, jobs * 4, weight=weight, budget=max_memory):
+            write(prepared)
+    return len(files)
@@ -3,19 +3,28 @@
 import logging
 import os
 import platform
+import re
 import shlex
 import subprocess
 import sys
-from typing import Any
+import sysconfig
+import tempfile
+from typing import Any, Optional
+
+from raypack.profiling import phase
+from raypack.runtime_baseline import find_distributions
+from raypack.scanner import scan_tree
+from raypack.task_graph import CommandFailed, Task, chain, report_failure, run_task_graph
+from raypack.wheel_cache import WheelCache, normalize_name
 
 logger = logging.getLogger(__name__)
 
-NATIVE_COMMANDS = [
-    "poetry config virtualenvs.create true --local",
-    "poetry config virtualenvs.in-project true --local",
-    "poetry install --only main",
-    "poetry build",
-]
+# pip's name for the platform Glue Ray runs on
+TARGET_PLATFORM = "manylinux2014_aarch64"
+
+PIP_INSTALL_VENDOR = (
+    f"pip install -r requirements-poetry.txt --target vendor --upgrade --platform={TARGET_PLATFORM} --only-binary=:all:"
+)
 
 
 def export_to_requirements_txt() -> Any:
@@ -26,62 +35,226 @@ def export_to_requirements_txt() -> Any:
         )
 
 
-NONNATIVE_COMMANDS = [
-    "poetry build",
+# Our own wheel is built while the dependencies are installed.
+NATIVE_TASKS = [
+    Task("poetry config create", "poetry config virtualenvs.create true --local"),
+    Task("poetry config in-project", "poetry config virtualenvs.in-project true --local", ["poetry config create"]),
+    Task("poetry install", "poetry install --only main", ["poetry config in-project"]),
+    Task("poetry build", "poetry build", ["poetry config in-project"]),
+]
+
+NONNATIVE_TASKS = [
+    Task("poetry build", "poetry build"),
     # this is your only option for non-arm64
     # "poetry export --without-hashes --format=requirements.txt > requirements-poetry.txt",
-    export_to_requirements_txt,
-    "pip install -r requirements-poetry.txt --target vendor --upgrade --platform=linux_arm64 --only-binary=:all:",
+    Task("poetry export", export_to_requirements_txt),
+    Task("pip install", PIP_INSTALL_VENDOR, ["poetry export"]),
 ]
 
 
-def create_native_arm64_venv() -> None:
+def building_on_aarch64() -> bool:
+    """Is this machine the target platform, Linux on aarch64? An arm64 Mac isn't, its binaries won't load on Glue."""
+    return sys.platform.startswith("linux") and platform.machine().lower() in ("aarch64", "arm64")
+
+
+def target_platform_args() -> list[str]:
+    """pip options to get aarch64 wheels when not building on aarch64."""
+    if building_on_aarch64():
+        return []
+    print(f"Will use aarch64 wheels, can't compile to arm64 on {platform.platform()}")
+    return ["--platform", TARGET_PLATFORM]
+
+
+def target_platform_tag() -> str:
+    """Platform of the wheels an install picks, this machine's if it is aarch64."""
+    if building_on_aarch64():
+        return sysconfig.get_platform().replace("-", "_").replace(".", "_")
+    return TARGET_PLATFORM
+
+
+def wheel_source_args(index: str) -> list[str]:
+    """pip options for where wheels come from. A folder or file:// URL works offline, "" is PyPI."""
+    if not index:
+        return []
+    if index.startswith("file://") or os.path.isdir(index):
+        return ["--no-index", "--find-links", index]
+    return ["--index-url", index]
+
+
+def fetch_wheels(
+    requirements: str,
+    wheel_dir: str,
+    environ: Any,
+    *,
+    cache: Optional[WheelCache] = None,
+    index: str = "",
+    timeout: Optional[float] = None,
+) -> None:
+    """pip download the requirements into wheel_dir, from the cache if it has all of them.
+
+    New wheels go into the cache, which is then pruned to its size limit.
+    """
+    command = ["pip", "download", "-r", requirements, "--dest", wheel_dir, "--no-deps", "--only-binary=:all:"]
+    command += target_platform_args()
+    sources = wheel_source_args(index)
+    found_offline = False
+    if cache is not None and cache.entries():
+        sources += ["--find-links", cache.root]
+        # a local index is offline already
+        if "--no-index" not in sources:
+            offline = [*command, "--no-index", "--find-links", cache.root]
+            logger.debug(f"Command: {shlex.join(offline)}")
+            with phase("command: pip download from the wheel cache"):
+                result = subprocess.run(
+                    offline, capture_output=True, text=True, check=False, shell=False, env=environ, timeout=timeout
+                )
+            if result.returncode == 0:
+                print(f"All wheels found in the cache at {cache.root}")
+                found_offline = True
+            else:
+                logger.debug(f"Not everything is in the cache, going to the index: {result.stderr}")
+    if not found_offline:
+        run_task_graph([Task("pip download", shlex.join(command + sources))], environ, timeout)
+    if cache is not None:
+        cache.add([os.path.join(wheel_dir, name) for name in os.listdir(wheel_dir) if name.endswith(".whl")])
+        cache.prune()
+
+
+def download_wheels(
+    wheel_dir: str, cache: Optional[WheelCache] = None, index: str = "", timeout: Optional[float] = None
+) -> None:
+    """Download wheels of the locked dependencies, without installing them. Our own wheel builds meanwhile."""
+    environ = os.environ.copy()
+    tasks = [
+        *NONNATIVE_TASKS[:2],
+        Task(
+            "fetch wheels",
+            lambda: fetch_wheels(
+                "requirements-poetry.txt", wheel_dir, environ, cache=cache, index=index, timeout=timeout
+            ),
+            ["poetry export"],
+        ),
+    ]
+    run_tasks(tasks, environ, timeout)
+
+
+def create_native_arm64_venv(
+    cache: Optional[WheelCache] = None, index: str = "", timeout: Optional[float] = None
+) -> None:
     """Create a virtual environment and install the dependencies."""
 
     environ = os.environ.copy()
-    if "arm64" not in platform.platform().lower():
+    if not building_on_aarch64():
         print("Switching to attempting to create zip on non-arm64 using pre-comipiled")
-        return create_venv()
-    return run_commands(NATIVE_COMMANDS, environ)
+        return create_venv(cache, index, timeout)
+    return run_tasks(NATIVE_TASKS, environ, timeout)
 
 
-def create_venv() -> None:
-    """Create a virtual environment and install the dependencies."""
+def create_venv(cache: Optional[WheelCache] = None, index: str = "", timeout: Optional[float] = None) -> None:
+    """Create a virtual environment and install the dependencies.
+
+    With a wheel cache, wheels are fetched through the cache and installed from
+    there without going to the index again.
+    """
 
     environ = os.environ.copy()
-    if platform.platform() != "arm64":
+    if not building_on_aarch64():
         print(f"Will attempt to install only wheels, can't compile to arm64 on {platform.platform()}")
         environ["PIP_ONLY_BINARY"] = ":all:"
-    # manylinux2014_aarch64 rumored to work on aws arm64
-    # example plat for mypy macosx_11_0_arm64.whl
-    environ["PIP_PLATFORM"] = "macosx_11_0_arm64"
+        environ["PIP_PLATFORM"] = TARGET_PLATFORM
+    if cache is None:
+        run_tasks(NONNATIVE_TASKS, environ, timeout)
+        return
+    with tempfile.TemporaryDirectory(prefix="raypack-wheels-") as wheel_dir:
+        install = "pip install -r requirements-poetry.txt --target vendor --upgrade --only-binary=:all:"
+        options = shlex.join(["--no-index", "--find-links", wheel_dir, *target_platform_args()])
+        tasks = [
+            *NONNATIVE_TASKS[:2],
+            Task(
+                "fetch wheels",
+                lambda: fetch_wheels(
+                    "requirements-poetry.txt", wheel_dir, environ, cache=cache, index=index, timeout=timeout
+                ),
+                ["poetry export"],
+            ),
+            Task("pip install", f"{install} {options}", ["fetch wheels"]),
+        ]
+        run_tasks(tasks, environ, timeout)
+
+
+def remove_distributions(site_packages: str, names: set[str]) -> list[str]:
+    """Delete the files RECORD lists for these distributions, and folders left empty. Returns the names removed."""
+    removed = []
+    for distribution in find_distributions(scan_tree(site_packages)):
+        if normalize_name(distribution.name) not in names:
+            continue
+        folders = set()
+        for relpath in distribution.files:
+            os.remove(os.path.join(site_packages, relpath))
+            folders.add(os.path.dirname(relpath))
+        # deepest first, so parents are empty by the time they come up
+        for folder in sorted(folders, key=len, reverse=True):
+            current = folder
+            path = os.path.join(site_packages, current)
+            while current and os.path.isdir(path) and not os.listdir(path):
+                os.rmdir(path)
+                current = os.path.dirname(current)
+                path = os.path.join(site_packages, current)
+        removed.append(distribution.name)
+    return removed
+
+
+def requirements_for(requirements: str, names: set[str], output: str) -> int:
+    """Copy the lines of a requirements file for these normalized names. Returns lines copied."""
+    count = 0
+    with open(requirements, encoding="utf-8") as source, open(output, "w", encoding="utf-8") as target:
+        for line in source:
+            name = re.match(r"\s*([A-Za-z0-9][A-Za-z0-9._-]*)", line)
+            if name and normalize_name(name.group(1)) in names:
+                target.write(line)
+                count += 1
+    return count
+
+
+def reinstall_packages(
+    venv_path: str, changed: list[str], removed: list[str], index: str = "", timeout: Optional[float] = None
+) -> None:
+    """Install again only the locked packages that changed, without their dependencies.
+
+    On aarch64 poetry install already only touches what changed. Elsewhere the
+    changed and removed distributions are deleted from the --target folder,
+    then the changed ones are installed at their locked versions.
+    """
+    environ = os.environ.copy()
+    if building_on_aarch64():
+        run_tasks(NATIVE_TASKS, environ, timeout)
+        return
+    gone = remove_distributions(venv_path, set(changed) | set(removed))
+    logger.info(f"Removed {', '.join(gone) or 'nothing'} from {venv_path}")
+
+    def install_changed() -> None:
+        if not requirements_for("requirements-poetry.txt", set(changed), "requirements-changed.txt"):
+            return
+        command = ["pip", "install", "-r", "requirements-changed.txt", "--target", venv_path, "--upgrade", "--no-deps"]
+        command += ["--only-binary=:all:", *target_platform_args(), *wheel_source_args(index)]
+        run_task_graph([Task("pip install changed", shlex.join(command))], environ, timeout)
+
+    tasks = [
+        *NONNATIVE_TASKS[:2],
+        Task("reinstall changed", install_changed, ["poetry export"]),
+    ]
+    run_tasks(tasks, environ, timeout)
+
+
+def run_tasks(tasks: list[Task], environ: Any, timeout: Optional[float] = None) -> None:
+    """Run a task graph, exit if a command fails."""
     try:
-        run_commands(NONNATIVE_COMMANDS, environ)
-    finally:
-        os.environ["PIP_PLATFORM"] = ""
-
-
-def run_commands(commands: list[Any], environ: Any) -> None:
-    """Just run commands"""
-    for cmd in commands:
-        if not isinstance(cmd, str):
-            result = cmd()
-        else:
-            logger.debug(f"Command: {cmd}")
-            result = subprocess.run(
-                shlex.split(cmd),
-                capture_output=True,
-                text=True,
-                # capture_output=True,
-                check=False,
-                shell=False,  # False is secure.
-                env=environ,
-            )
-        if result.returncode == 0:
-            print(f"Command '{cmd}' executed successfully!")
-            print(result.stdout)
-        else:
-            print(f"Command '{cmd}' failed!")
-            print(result.stdout)
-            print(result.stderr)
-            sys.exit(-1)
+        run_task_graph(tasks, environ, timeout)
+    except CommandFailed as error:
+        report_failure(error)
+        sys.exit(-1)
+
+
+def run_commands(commands: list[Any], environ: Any, timeout: Optional[float] = None) -> None:
+    """Just run commands, one after another"""
+    run_tasks(chain(commands), environ, timeout)
@@ -0,0 +1,206 @@
+"""
+Where a build spends its time.
+
+Build steps are wrapped in named phases that record wall time, CPU time of
+raypack and of its subprocesses (poetry, pip, strip), and how many files and
+bytes they processed. Phases nest. Outside of `profiling()` a phase only costs
+a couple of clock reads.
+
+The report is written as JSON, or as a Chrome trace for chrome://tracing or
+https://ui.perfetto.dev. cProfile can wrap the whole run as well.
+"""
+
+import contextlib
+import cProfile
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+PROFILE_FORMATS = ("json", "chrome")
+
+
+def cpu_times() -> tuple[float, float]:
+    """CPU seconds used by this process and by its finished subprocesses."""
+    times = os.times()
+    return times.user + times.system, times.children_user + times.children_system
+
+
+@dataclass
+class Phase:
+    """One timed step of the build."""
+
+    name: str
+    depth: int = 0
+    # seconds since the profiler started
+    start: float = 0.0
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    child_cpu_seconds: float = 0.0
+    files: int = 0
+    bytes: int = 0
+    thread_id: int = 0
+    details: dict[str, Any] = field(default_factory=dict)
+
+    def add(self, files: int = 0, size: int = 0) -> None:
+        """Count files and bytes processed in this phase."""
+        self.files += files
+        self.bytes += size
+
+    @property
+    def mb_per_second(self) -> Optional[float]:
+        """Throughput, None if the phase didn't process bytes."""
+        if not self.bytes or not self.wall_seconds:
+            return None
+        return self.bytes / 1024 / 1024 / self.wall_seconds
+
+    def to_dict(self) -> dict[str, Any]:
+        """JSON friendly."""
+        return {
+            "name": self.name,
+            "depth": self.depth,
+            "start_seconds": self.start,
+            "wall_seconds": self.wall_seconds,
+            "cpu_seconds": self.cpu_seconds,
+            "child_cpu_seconds": self.child_cpu_seconds,
+            "files": self.files,
+            "bytes": self.bytes,
+            "mb_per_second": self.mb_per_second,
+            **({"details": self.details} if self.details else {}),
+        }
+
+
+class Profiler:
+    """Collects phases, in the order they started."""
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.phases: list[Phase] = []
+        self._local = threading.local()
+
+    @contextlib.contextmanager
+    def phase(self, name: str, **details: Any) -> Iterator[Phase]:
+        """Time the body as a phase nested in the one currently open on this thread."""
+        stack: list[Phase] = self._local.__dict__.setdefault("stack", [])
+        current = Phase(name, depth=len(stack), thread_id=threading.get_ident(), details=details)
+        self.phases.append(current)
+        stack.append(current)
+        cpu_before, child_before = cpu_times()
+        started = time.perf_counter()
+        current.start = started - self.started
+        try:
+            yield current
+        finally:
+            current.wall_seconds = time.perf_counter() - started
+            cpu_after, child_after = cpu_times()
+            current.cpu_seconds = cpu_after - cpu_before
+            current.child_cpu_seconds = child_after - child_before
+            stack.pop()
+
+    def to_json(self) -> dict[str, Any]:
+        """Phases and the total wall time."""
+        return {
+            "wall_seconds": time.perf_counter() - self.started,
+            "phases": [step.to_dict() for step in self.phases],
+        }
+
+    def to_chrome_trace(self) -> dict[str, Any]:
+        """Chrome trace event format, one complete event per phase."""
+        pid = os.getpid()
+        events = [
+            {
+                "name": step.name,
+                "cat": "raypack",
+                "ph": "X",
+                "ts": step.start * 1_000_000,
+                "dur": step.wall_seconds * 1_000_000,
+                "pid": pid,
+                "tid": step.thread_id,
+                "args": {key: value for key, value in step.to_dict().items() if key not in ("name", "depth")},
+            }
+            for step in self.phases
+        ]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def summary(self) -> str:
+        """Plain text table, nested phases indented."""
+        lines = [f"{'phase':<45} {'wall s':>8} {'cpu s':>8} {'child s':>8} {'files':>8} {'MB':>9} {'MB/s':>8}"]
+        for step in self.phases:
+            name = f"{'  ' * step.depth}{step.name}"
+            if len(name) > 45:  # noqa: PLR2004
+                name = name[:42] + "..."
+            throughput = f"{step.mb_per_second:.1f}" if step.mb_per_second is not None else "-"
+            lines.append(
+                f"{name:<45} {step.wall_seconds:>8.2f} {step.cpu_seconds:>8.2f} {step.child_cpu_seconds:>8.2f} "
+                f"{step.files:>8} {step.bytes / 1024 / 1024:>9.2f} {throughput:>8}"
+            )
+        return "\n".join(lines)
+
+    def write(self, path: str, trace_format: str = "json") -> None:
+        """Save the report."""
+        report = self.to_chrome_trace() if trace_format == "chrome" else self.to_json()
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=1)
+
+
+@dataclass
+class ActiveProfiler:
+    """The profiler phase() reports to. Worker threads see it too, unlike a contextvar."""
+
+    profiler: Optional[Profiler] = None
+
+
+_ACTIVE = ActiveProfiler()
+
+
+@contextlib.contextmanager
+def phase(name: str, **details: Any) -> Iterator[Phase]:
+    """Time a build step if profiling is on. The Phase is thrown away otherwise."""
+    profiler = _ACTIVE.profiler
+    if profiler is None:
+        yield Phase(name)
+        return
+    with profiler.phase(name, **details) as current:
+        yield current
+
+
+@contextlib.contextmanager
+def profiling(
+    path: Optional[str], trace_format: str = "json", use_cprofile: bool = False
+) -> Iterator[Optional[Profiler]]:
+    """Profile the body and write the report to path. Does nothing without a path.
+
+    With use_cprofile, function level stats go to <path>.pstats, for pstats or snakeviz.
+    """
+    if not path:
+        yield None
+        return
+    if trace_format not in PROFILE_FORMATS:
+        raise ValueError(f"profile format must be one of {', '.join(PROFILE_FORMATS)}, got {trace_format!r}")
+    profiler = Profiler()
+    previous, _ACTIVE.profiler = _ACTIVE.profiler, profiler
+    function_profiler = cProfile.Profile() if use_cprofile else None
+    try:
+        if function_profiler is not None:
+            function_profiler.enable()
+        with profiler.phase("total"):
+            yield profiler
+    finally:
+        if function_profiler is not None:
+            function_profiler.disable()
+        _ACTIVE.profiler = previous
+        profiler.write(path, trace_format)
+        print(profiler.summary())
+        print(f"Profile written to {path}")
+        if function_profiler is not None:
+            stats_path = f"{path}.pstats"
+            function_profiler.dump_stats(stats_path)
+            pstats.Stats(stats_path).sort_stats("cumulative").print_stats(20)
+            print(f"cProfile stats written to {stats_path}")
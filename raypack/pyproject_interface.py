@@ -2,6 +2,7 @@
 
 import functools
 import logging
+import os
 from typing import Any, Optional, cast
 
 import toml
@@ -67,6 +68,20 @@ def own_package_includes(toml_file_path: str = "pyproject.toml") -> list[str]:
     return cast(list[str], [includes] if isinstance(includes, str) else includes)
 
 
+def own_package_dirs(toml_file_path: str = "pyproject.toml") -> list[str]:
+    """Folders of the project's own packages: [tool.poetry] packages, else the project name at the top or in src."""
+    data = current_pyproject_toml(toml_file_path) or {}
+    packages = data.get("tool", {}).get("poetry", {}).get("packages", [])
+    folders = [
+        os.path.join(package.get("from", ""), package["include"]) for package in packages if "include" in package
+    ]
+    if not folders:
+        name, _version = get_project_info_from_toml(toml_file_path)
+        module = name.replace("-", "_").replace(".", "_").lower()
+        folders = [module, os.path.join("src", module)] if module else []
+    return [folder for folder in folders if os.path.isdir(folder)]
+
+
 def toml_section_exists(toml_file_path: str = "pyproject.toml") -> bool:
     """Check we have a pyproject.toml file"""
     data = current_pyproject_toml(toml_file_path)
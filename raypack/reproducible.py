@@ -0,0 +1,71 @@
+"""
+Reproducible zips.
+
+With deterministic = true, entries are sorted, timestamps come from
+SOURCE_DATE_EPOCH (or 1980-01-01, the earliest date a zip can hold) and
+permissions are normalized, so the same inputs always give the same bytes.
+"""
+
+import logging
+import os
+import time
+import zipfile
+
+from raypack.manifest import hash_file
+
+logger = logging.getLogger(__name__)
+
+# Earliest timestamp the zip format can represent.
+ZIP_EPOCH = (1980, 1, 1, 0, 0, 0)
+
+
+def reproducible_date_time() -> tuple[int, int, int, int, int, int]:
+    """Timestamp for every entry, from SOURCE_DATE_EPOCH if set."""
+    epoch = os.environ.get("SOURCE_DATE_EPOCH")
+    if not epoch:
+        return ZIP_EPOCH
+    try:
+        date_time = time.gmtime(int(epoch))[:6]
+    except ValueError:
+        logger.warning(f"Ignoring SOURCE_DATE_EPOCH={epoch!r}, not a number")
+        return ZIP_EPOCH
+    return max(ZIP_EPOCH, date_time)  # type: ignore[return-value]
+
+
+def diff_archives(left: str, right: str) -> list[str]:
+    """Differences between two zips, empty if they are bit-identical."""
+    if hash_file(left) == hash_file(right):
+        return []
+    differences = []
+    with zipfile.ZipFile(left) as left_zip, zipfile.ZipFile(right) as right_zip:
+        left_infos = {info.filename: info for info in left_zip.infolist()}
+        right_infos = {info.filename: info for info in right_zip.infolist()}
+        for name in sorted(left_infos.keys() - right_infos.keys()):
+            differences.append(f"only in {left}: {name}")
+        for name in sorted(right_infos.keys() - left_infos.keys()):
+            differences.append(f"only in {right}: {name}")
+        if [name for name in left_zip.namelist() if name in right_infos] != [
+            name for name in right_zip.namelist() if name in left_infos
+        ]:
+            differences.append("entries are in a different order")
+        for name in sorted(left_infos.keys() & right_infos.keys()):
+            left_info, right_info = left_infos[name], right_infos[name]
+            for attribute in ("CRC", "file_size", "compress_size", "compress_type", "date_time", "external_attr"):
+                left_value, right_value = getattr(left_info, attribute), getattr(right_info, attribute)
+                if left_value != right_value:
+                    differences.append(f"{name}: {attribute} {left_value} != {right_value}")
+    if not differences:
+        differences.append("archives differ outside of entry contents (headers, extra fields or comments)")
+    return differences
+
+
+def verify_identical(left: str, right: str) -> bool:
+    """Print whether two builds are bit-identical."""
+    differences = diff_archives(left, right)
+    if not differences:
+        print(f"{left} and {right} are bit-identical (sha256 {hash_file(left)})")
+        return True
+    print(f"{left} and {right} differ:")
+    for difference in differences:
+        print(f"  {difference}")
+    return False
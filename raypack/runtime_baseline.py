@@ -0,0 +1,199 @@
+"""
+Leave out packages the Glue Ray runtime already provides.
+
+A baseline is a pip freeze style list of what is preinstalled on the runtime,
+either one shipped in raypack/baselines or any requirements file. An installed
+distribution is dropped from the zip only if the baseline has the same
+version, so a pinned patch or security release is kept. Other versions are
+kept with a warning, since they shadow the runtime's copy.
+"""
+
+import csv
+import logging
+import os
+import re
+import zipfile
+from dataclasses import dataclass, field
+from email.parser import HeaderParser
+
+from raypack.scanner import FileIndex
+from raypack.wheel_cache import normalize_name, parse_wheel_filename
+
+logger = logging.getLogger(__name__)
+
+BASELINES_DIR = os.path.join(os.path.dirname(__file__), "baselines")
+
+DEFAULT_BASELINE = "glue-ray-2023-11-07"
+
+
+def available_baselines() -> list[str]:
+    """Names of the baselines shipped with raypack."""
+    return sorted(name[: -len(".txt")] for name in os.listdir(BASELINES_DIR) if name.endswith(".txt"))
+
+
+def load_baseline(baseline: str = DEFAULT_BASELINE) -> dict[str, str]:
+    """Package versions from a shipped baseline name or a requirements file path, by normalized name."""
+    path = baseline if os.path.exists(baseline) else os.path.join(BASELINES_DIR, f"{baseline}.txt")
+    if not os.path.exists(path):
+        raise ValueError(f"Unknown runtime baseline {baseline!r}, expected a file or one of {available_baselines()}")
+    versions = {}
+    with open(path, encoding="utf-8") as file:
+        for raw_line in file:
+            line = raw_line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            name, separator, version = line.partition("==")
+            if not separator:
+                logger.warning(f"Ignoring unpinned baseline requirement {line!r} in {path}")
+                continue
+            versions[normalize_name(name)] = version.split(";", 1)[0].strip()
+    return versions
+
+
+def normalize_version(version: str) -> str:
+    """Lower case, without trailing .0 release segments, so 1.0 and 1.0.0 are the same."""
+    version = version.strip().lower().removeprefix("v")
+    match = re.match(r"(\d+(?:\.\d+)*)(.*)", version)
+    if not match:
+        return version
+    return re.sub(r"(\.0+)+$", "", match.group(1)) + match.group(2)
+
+
+def is_compatible(installed: str, provided: str) -> bool:
+    """Same version. Any other, even a newer patch release, isn't what the runtime has."""
+    return normalize_version(installed) == normalize_version(provided)
+
+
+@dataclass
+class Distribution:
+    """An installed distribution, or a wheel, and the files that belong to it."""
+
+    name: str
+    version: str
+    # relative to site-packages, using os.sep
+    files: list[str] = field(default_factory=list)
+    size: int = 0
+    # normalized names of the distributions it requires, extras left out
+    requires: list[str] = field(default_factory=list)
+
+
+@dataclass
+class BaselineReport:
+    """What the baseline took out of the zip."""
+
+    excluded: list[Distribution] = field(default_factory=list)
+    # (name, installed version, runtime version)
+    conflicts: list[tuple[str, str, str]] = field(default_factory=list)
+
+    @property
+    def bytes_saved(self) -> int:
+        """Bytes of files left out."""
+        return sum(distribution.size for distribution in self.excluded)
+
+    def log(self) -> None:
+        """Warn about conflicts and say how much was saved."""
+        for name, installed, provided in self.conflicts:
+            logger.warning(
+                f"{name} {installed} is packaged, but the runtime provides {provided}. "
+                "The packaged version will shadow it."
+            )
+        for distribution in self.excluded:
+            print(f"Left out {distribution.name}=={distribution.version}, the runtime provides it")
+        if self.excluded:
+            print(f"Runtime baseline saved {self.bytes_saved / 1024 / 1024:.2f} MB, {len(self.excluded)} packages")
+
+
+def read_metadata(path: str) -> tuple[str, str]:
+    """Name and version from a METADATA file."""
+    with open(path, encoding="utf-8", errors="replace") as file:
+        headers = HeaderParser().parse(file, headersonly=True)
+    return headers.get("Name", ""), headers.get("Version", "")
+
+
+def read_requires(path: str) -> list[str]:
+    """Normalized names from the Requires-Dist lines of a METADATA file, without the ones only an extra needs."""
+    with open(path, encoding="utf-8", errors="replace") as file:
+        headers = HeaderParser().parse(file, headersonly=True)
+    requires = []
+    for requirement in headers.get_all("Requires-Dist") or []:
+        _, _, marker = requirement.partition(";")
+        if "extra" in marker:
+            continue
+        name = re.match(r"\s*([A-Za-z0-9][A-Za-z0-9._-]*)", requirement)
+        if name:
+            requires.append(normalize_name(name.group(1)))
+    return requires
+
+
+def find_distributions(index: FileIndex) -> list[Distribution]:
+    """Distributions installed in site-packages, with their files from RECORD."""
+    sizes = {entry.relpath: entry.size for entry in index.files}
+    distributions = []
+    for entry in index.files:
+        if entry.name != "METADATA" or not entry.folder.endswith(".dist-info"):
+            continue
+        if os.path.dirname(entry.folder) != index.root:
+            continue
+        name, version = read_metadata(entry.path)
+        record = os.path.join(entry.folder, "RECORD")
+        if not name or not os.path.exists(record):
+            logger.debug(f"Can't tell which files belong to {entry.folder}, keeping them")
+            continue
+        distribution = Distribution(name, version, requires=read_requires(entry.path))
+        with open(record, encoding="utf-8", newline="") as file:
+            for row in csv.reader(file):
+                if not row:
+                    continue
+                path = os.path.normpath(row[0])
+                # scripts and such live outside site-packages
+                if path in sizes and not path.startswith(".."):
+                    distribution.files.append(path)
+                    distribution.size += sizes[path]
+        distributions.append(distribution)
+    return distributions
+
+
+def wheel_distribution(wheel_path: str) -> Distribution:
+    """Name, version and uncompressed size of a wheel."""
+    name, version, _python_tag, _platform_tag = parse_wheel_filename(os.path.basename(wheel_path))
+    with zipfile.ZipFile(wheel_path) as whl:
+        size = sum(info.file_size for info in whl.infolist())
+    return Distribution(name, version, [wheel_path], size)
+
+
+def plan_exclusions(distributions: list[Distribution], baseline: dict[str, str]) -> BaselineReport:
+    """Pick the distributions the runtime already has a compatible version of."""
+    report = BaselineReport()
+    for distribution in distributions:
+        provided = baseline.get(normalize_name(distribution.name))
+        if provided is None:
+            continue
+        if is_compatible(distribution.version, provided):
+            report.excluded.append(distribution)
+        else:
+            report.conflicts.append((distribution.name, distribution.version, provided))
+    return report
+
+
+def exclude_runtime_provided(index: FileIndex, baseline: str = DEFAULT_BASELINE) -> tuple[FileIndex, BaselineReport]:
+    """The index without the files of distributions the runtime provides."""
+    report = plan_exclusions(find_distributions(index), load_baseline(baseline))
+    report.log()
+    excluded = {path for distribution in report.excluded for path in distribution.files}
+    return index.without(excluded), report
+
+
+def exclude_runtime_provided_wheels(
+    wheel_paths: list[str], baseline: str = DEFAULT_BASELINE
+) -> tuple[list[str], BaselineReport]:
+    """The wheels, without those the runtime provides."""
+    distributions = []
+    for wheel_path in wheel_paths:
+        try:
+            distributions.append(wheel_distribution(wheel_path))
+        except ValueError as error:
+            logger.warning(f"Keeping {wheel_path}: {error}")
+    report = plan_exclusions(distributions, load_baseline(baseline))
+    report.log()
+    excluded = {path for distribution in report.excluded for path in distribution.files}
+    return [path for path in wheel_paths if path not in excluded], report
@@ -0,0 +1,131 @@
+"""
+Walk a virtual environment once and keep the result in memory.
+
+The binary check, the file filters and the packing all read from the same
+FileIndex instead of walking the tree again.
+"""
+
+import logging
+import os
+import re
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class FileEntry:
+    """A file found by the scanner."""
+
+    path: str
+    # relative to the index root, using os.sep
+    relpath: str
+    # file name and containing folder, as they would come out of os.walk
+    name: str
+    folder: str
+    size: int
+    mtime_ns: int
+    mode: int
+
+
+@dataclass
+class FileIndex:
+    """Files and folders under root, in os.walk(topdown=True) order."""
+
+    root: str
+    files: list[FileEntry] = field(default_factory=list)
+    # every folder visited, root included
+    folders: list[str] = field(default_factory=list)
+
+    def find_folder(self, name: str) -> Optional[str]:
+        """First folder with this name, in walk order."""
+        return next((folder for folder in self.folders if os.path.basename(folder) == name), None)
+
+    def subindex(self, folder: str) -> "FileIndex":
+        """The part of the index below folder, re-rooted at folder."""
+        prefix = os.path.join(folder, "")
+        files = [
+            FileEntry(
+                entry.path, entry.path[len(prefix) :], entry.name, entry.folder, entry.size, entry.mtime_ns, entry.mode
+            )
+            for entry in self.files
+            if entry.path.startswith(prefix)
+        ]
+        folders = [path for path in self.folders if path == folder or path.startswith(prefix)]
+        return FileIndex(folder, files, folders)
+
+    def without(self, relpaths: set[str]) -> "FileIndex":
+        """The index minus some files, given relative to root."""
+        if not relpaths:
+            return self
+        return FileIndex(self.root, [entry for entry in self.files if entry.relpath not in relpaths], self.folders)
+
+    @property
+    def total_size(self) -> int:
+        """Bytes in all files."""
+        return sum(entry.size for entry in self.files)
+
+
+class SuffixMatcher:
+    """Does a string end with any of the suffixes? One compiled regex instead of a loop of endswith."""
+
+    def __init__(self, suffixes: Iterable[str], ignore_case: bool = False) -> None:
+        self.suffixes = sorted(set(suffixes), key=len, reverse=True)
+        if self.suffixes:
+            pattern = "(?:" + "|".join(re.escape(suffix) for suffix in self.suffixes) + r")\Z"
+            self._regex: Optional[re.Pattern[str]] = re.compile(pattern, re.IGNORECASE if ignore_case else 0)
+        else:
+            self._regex = None
+
+    def __call__(self, value: str) -> bool:
+        return self._regex is not None and self._regex.search(value) is not None
+
+
+def scan_tree(root: str, descend: Optional[Callable[[str], bool]] = None) -> FileIndex:
+    """Index every file under root with os.scandir.
+
+    Files of a folder come before its sub-folders, same order as os.walk. If
+    descend returns False for a folder, its files are indexed but its
+    sub-folders are not visited.
+    """
+    index = FileIndex(root)
+    # cheaper than os.path.relpath for every file
+    prefix_length = len(os.path.join(root, ""))
+    stack = [root]
+    while stack:
+        folder = stack.pop()
+        index.folders.append(folder)
+        subfolders = []
+        try:
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir():
+                            # like os.walk, symlinked folders are not followed
+                            if not entry.is_symlink():
+                                subfolders.append(entry.path)
+                            continue
+                        stat = entry.stat()
+                    except OSError as error:
+                        logger.warning(f"Can't read {entry.path}: {error}")
+                        continue
+                    index.files.append(
+                        FileEntry(
+                            entry.path,
+                            entry.path[prefix_length:],
+                            entry.name,
+                            folder,
+                            stat.st_size,
+                            stat.st_mtime_ns,
+                            stat.st_mode,
+                        )
+                    )
+        except OSError as error:
+            logger.warning(f"Can't list {folder}: {error}")
+            continue
+        if descend is None or descend(folder):
+            # stack is last in, first out
+            stack.extend(reversed(subfolders))
+    return index
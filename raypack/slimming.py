@@ -0,0 +1,158 @@
+"""
+Leave files Glue never needs out of the zip: type stubs, C sources, docs, tests.
+
+Rules are named lists of globs, matched against the path inside site-packages
+with "/" as separator. "*" also matches "/", so "*.pyi" matches at any depth.
+The first rule that matches a file wins and is credited with the bytes saved.
+
+Optionally, debug sections are stripped from shared libraries. The venv isn't
+touched, stripped copies are staged in a separate folder and packed instead.
+"""
+
+import fnmatch
+import logging
+import os
+import re
+import shutil
+import subprocess  # nosec
+from dataclasses import dataclass, field, replace
+from typing import Optional
+
+from raypack.scanner import FileIndex
+
+logger = logging.getLogger(__name__)
+
+SAFE_RULES = {
+    "type stubs": ["*.pyi", "*/py.typed", "py.typed"],
+    "c sources": ["*.c", "*.cc", "*.cpp", "*.h", "*.hpp", "*.pyx", "*.pxd", "*.pxi"],
+    "markdown and rst": ["*.md", "*.rst"],
+}
+
+AGGRESSIVE_RULES = {
+    **SAFE_RULES,
+    "tests": ["tests/*", "test/*", "*/tests/*", "*/test/*"],
+    "docs": ["docs/*", "doc/*", "*/docs/*", "*/doc/*"],
+    "examples and benchmarks": ["*/examples/*", "*/example/*", "*/benchmarks/*", "*/benchmark/*"],
+    "static libraries": ["*.a", "*.lib"],
+}
+
+RULE_SETS = {"off": {}, "safe": SAFE_RULES, "aggressive": AGGRESSIVE_RULES}
+
+# Cross compiling toolchains first, the host strip can't read aarch64 binaries on x86.
+STRIP_TOOLS = ["aarch64-linux-gnu-strip", "llvm-strip", "strip"]
+
+STRIP_DIR = os.path.join(".raypack", "stripped")
+
+SHARED_LIBRARY = re.compile(r"\.so(\.\d+)*$")
+
+
+def rules_for(rule_set: str, custom: Optional[dict[str, list[str]]] = None) -> dict[str, list[str]]:
+    """Named rule set plus custom rules from [tool.raypack]."""
+    if rule_set not in RULE_SETS:
+        raise ValueError(f"slimming must be one of {', '.join(RULE_SETS)}, got {rule_set!r}")
+    return {**RULE_SETS[rule_set], **(custom or {})}
+
+
+@dataclass
+class RuleSavings:
+    """Files and bytes one rule left out."""
+
+    files: int = 0
+    size: int = 0
+
+
+@dataclass
+class Slimmer:
+    """Decides which files to leave out and keeps score per rule."""
+
+    rules: dict[str, list[str]]
+    savings: dict[str, RuleSavings] = field(default_factory=dict)
+
+    def __post_init__(self) -> None:
+        self._patterns = [
+            (name, re.compile("|".join(fnmatch.translate(glob) for glob in globs)))
+            for name, globs in self.rules.items()
+            if globs
+        ]
+
+    def rule_for(self, path: str) -> Optional[str]:
+        """Name of the first rule matching a path in site-packages, None to keep the file."""
+        posix_path = path.replace(os.sep, "/")
+        for name, pattern in self._patterns:
+            if pattern.match(posix_path):
+                return name
+        return None
+
+    def drop(self, path: str, size: int) -> bool:
+        """True if the file should be left out. Counts it towards its rule."""
+        name = self.rule_for(path)
+        if name is None:
+            return False
+        saved = self.savings.setdefault(name, RuleSavings())
+        saved.files += 1
+        saved.size += size
+        return True
+
+    def record_strip(self, before: int, after: int) -> None:
+        """Count bytes saved by stripping a shared library."""
+        saved = self.savings.setdefault("strip debug symbols", RuleSavings())
+        saved.files += 1
+        saved.size += before - after
+
+    def slim(self, index: FileIndex) -> FileIndex:
+        """The index without the files the rules leave out."""
+        dropped = {entry.relpath for entry in index.files if self.drop(entry.relpath, entry.size)}
+        return index.without(dropped)
+
+    def report(self) -> str:
+        """Plain text table of bytes saved per rule."""
+        lines = [f"{'rule':<25} {'files':>8} {'MB saved':>10}"]
+        for name, saved in sorted(self.savings.items(), key=lambda item: -item[1].size):
+            lines.append(f"{name:<25} {saved.files:>8} {saved.size / 1024 / 1024:>10.2f}")
+        total = sum(saved.size for saved in self.savings.values())
+        lines.append(
+            f"{'total':<25} {sum(saved.files for saved in self.savings.values()):>8} {total / 1024 / 1024:>10.2f}"
+        )
+        return "\n".join(lines)
+
+
+def find_strip_tool() -> Optional[str]:
+    """First strip from binutils (or llvm) found on PATH."""
+    for tool in STRIP_TOOLS:
+        path = shutil.which(tool)
+        if path:
+            return path
+    return None
+
+
+def strip_shared_libraries(index: FileIndex, slimmer: Slimmer, stage_dir: str = STRIP_DIR) -> FileIndex:
+    """Point .so entries at copies with the debug sections stripped.
+
+    Copies are kept between builds and only stripped again when the original
+    changes. Libraries strip can't handle are packed as they are.
+    """
+    tool = find_strip_tool()
+    if tool is None:
+        logger.warning(f"None of {', '.join(STRIP_TOOLS)} found, shared libraries are not stripped")
+        return index
+    files = []
+    for entry in index.files:
+        if not SHARED_LIBRARY.search(entry.name):
+            files.append(entry)
+            continue
+        staged = os.path.abspath(os.path.join(stage_dir, entry.relpath))
+        if not os.path.exists(staged) or os.stat(staged).st_mtime_ns < entry.mtime_ns:
+            os.makedirs(os.path.dirname(staged), exist_ok=True)
+            shutil.copyfile(entry.path, staged)
+            result = subprocess.run(  # nosec
+                [tool, "--strip-debug", staged], capture_output=True, text=True, check=False, shell=False
+            )
+            if result.returncode != 0:
+                logger.debug(f"Can't strip {entry.path}: {result.stderr.strip()}")
+                os.remove(staged)
+                files.append(entry)
+                continue
+        stat = os.stat(staged)
+        slimmer.record_strip(entry.size, stat.st_size)
+        files.append(replace(entry, path=staged, size=stat.st_size, mtime_ns=stat.st_mtime_ns))
+    return FileIndex(index.root, files, index.folders)
@@ -0,0 +1,293 @@
+"""
+Run build commands as a graph of tasks.
+
+A task starts once the tasks it needs have succeeded, so independent steps
+(building our own wheel, installing the dependencies) overlap. Output of each
+command is printed line by line as it arrives, prefixed with the task name.
+
+When a task fails or times out, nothing new is started and running commands
+are terminated, with their child processes, then killed if they don't exit.
+A graph run from inside a callable task is stopped the same way.
+"""
+
+import collections
+import logging
+import os
+import shlex
+import signal
+import subprocess  # nosec
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional, Union
+
+from raypack.profiling import phase
+
+logger = logging.getLogger(__name__)
+
+# Lines of output kept per task, for the error message.
+OUTPUT_TAIL = 50
+
+# Seconds between checks for cancellation and timeouts.
+POLL_INTERVAL = 0.1
+
+# Seconds a terminated command gets to exit before it is killed.
+TERMINATE_GRACE = 5.0
+
+
+@dataclass
+class Task:
+    """A shell-free command line, or a callable returning something with a returncode."""
+
+    name: str
+    command: Union[str, Callable[[], Any]]
+    needs: list[str] = field(default_factory=list)
+    # seconds, None for the graph's default
+    timeout: Optional[float] = None
+
+
+@dataclass
+class TaskResult:
+    """How a task ended."""
+
+    name: str
+    returncode: int
+    seconds: float = 0.0
+    output: str = ""
+    timed_out: bool = False
+    cancelled: bool = False
+
+
+class CommandFailed(Exception):
+    """A task failed, timed out or couldn't start."""
+
+    def __init__(self, result: TaskResult) -> None:
+        if result.timed_out:
+            reason = "timed out"
+        elif result.cancelled:
+            reason = "was cancelled"
+        else:
+            reason = f"exited with {result.returncode}"
+        super().__init__(f"{result.name} {reason}")
+        self.result = result
+
+
+def chain(commands: list[Any]) -> list[Task]:
+    """Tasks that run one after another, named by their command."""
+    tasks: list[Task] = []
+    for command in commands:
+        name = command if isinstance(command, str) else getattr(command, "__name__", repr(command))
+        tasks.append(Task(name, command, needs=[tasks[-1].name] if tasks else []))
+    return tasks
+
+
+def check_graph(tasks: list[Task]) -> None:
+    """Names are unique, needs exist and there are no cycles."""
+    names = [task.name for task in tasks]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate task names: {', '.join(duplicates)}")
+    known = set(names)
+    for task in tasks:
+        missing = [need for need in task.needs if need not in known]
+        if missing:
+            raise ValueError(f"Task {task.name} needs unknown tasks: {', '.join(missing)}")
+    remaining = {task.name: set(task.needs) for task in tasks}
+    while remaining:
+        ready = [name for name, needs in remaining.items() if not needs]
+        if not ready:
+            raise ValueError(f"Tasks depend on each other in a cycle: {', '.join(sorted(remaining))}")
+        for name in ready:
+            del remaining[name]
+        for needs in remaining.values():
+            needs.difference_update(ready)
+
+
+def stop_process(process: "subprocess.Popen[str]") -> None:
+    """Terminate the command and whatever it started, kill it if it doesn't exit."""
+    if process.poll() is not None:
+        return
+    if os.name == "posix":
+        os.killpg(process.pid, signal.SIGTERM)
+    else:
+        process.terminate()
+    try:
+        process.wait(TERMINATE_GRACE)
+    except subprocess.TimeoutExpired:
+        if os.name == "posix":
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+        process.wait()
+
+
+class RunningCallable(threading.local):
+    """The runner whose callable task this thread is in, so graphs it runs can be cancelled with it."""
+
+    runner: Optional["TaskRunner"] = None
+
+
+_RUNNING = RunningCallable()
+
+
+class TaskRunner:
+    """Runs one graph. Shared state between the worker threads lives here."""
+
+    def __init__(
+        self, environ: Any, timeout: Optional[float] = None, stream: bool = True, parent: Optional["TaskRunner"] = None
+    ) -> None:
+        self.environ = environ
+        self.timeout = timeout
+        self.stream = stream
+        self.parent = parent
+        self.cancelled = threading.Event()
+        self._print_lock = threading.Lock()
+
+    def is_cancelled(self) -> bool:
+        """This graph or the one running it has stopped."""
+        return self.cancelled.is_set() or (self.parent is not None and self.parent.is_cancelled())
+
+    def emit(self, name: str, line: str) -> None:
+        """Print a line of output as it arrives."""
+        if self.stream:
+            with self._print_lock:
+                print(f"[{name}] {line}", flush=True)
+
+    def run_callable(self, task: Task) -> TaskResult:
+        """Callables can't be interrupted, only the graphs they run are stopped between or during their tasks."""
+        outer = _RUNNING.runner
+        _RUNNING.runner = self
+        try:
+            result = task.command()  # type: ignore[operator]
+        except Exception as error:  # pylint: disable=broad-except
+            return TaskResult(task.name, -1, output=f"{type(error).__name__}: {error}", cancelled=self.is_cancelled())
+        finally:
+            _RUNNING.runner = outer
+        output = getattr(result, "stdout", "") or ""
+        for line in output.splitlines():
+            self.emit(task.name, line)
+        return TaskResult(task.name, getattr(result, "returncode", 0), output=output)
+
+    def run_command(self, task: Task) -> TaskResult:
+        """Start the command, stream its output, enforce the timeout and watch for cancellation."""
+        command: str = task.command  # type: ignore[assignment]
+        logger.debug(f"Command: {command}")
+        try:
+            process = subprocess.Popen(  # nosec # pylint: disable=consider-using-with
+                shlex.split(command),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                bufsize=1,
+                shell=False,  # False is secure.
+                env=self.environ,
+                start_new_session=os.name == "posix",
+            )
+        except OSError as error:
+            return TaskResult(task.name, -1, output=str(error))
+
+        tail: collections.deque[str] = collections.deque(maxlen=OUTPUT_TAIL)
+
+        def read_output() -> None:
+            assert process.stdout is not None  # nosec
+            for raw_line in process.stdout:
+                line = raw_line.rstrip("\n")
+                tail.append(line)
+                self.emit(task.name, line)
+
+        reader = threading.Thread(target=read_output, daemon=True)
+        reader.start()
+        timeout = task.timeout if task.timeout is not None else self.timeout
+        deadline = time.monotonic() + timeout if timeout else None
+        timed_out = cancelled = False
+        while process.poll() is None:
+            if self.is_cancelled():
+                cancelled = True
+            elif deadline is not None and time.monotonic() > deadline:
+                timed_out = True
+            if cancelled or timed_out:
+                stop_process(process)
+                break
+            try:
+                process.wait(POLL_INTERVAL)
+            except subprocess.TimeoutExpired:
+                continue
+        reader.join()
+        return TaskResult(
+            task.name, process.returncode, output="\n".join(tail), timed_out=timed_out, cancelled=cancelled
+        )
+
+    def run_task(self, task: Task) -> TaskResult:
+        """Run one task, timed as a profiling phase."""
+        started = time.perf_counter()
+        with phase(f"command: {task.name}"):
+            result = self.run_command(task) if isinstance(task.command, str) else self.run_callable(task)
+        result.seconds = time.perf_counter() - started
+        return result
+
+    def run(self, tasks: list[Task], max_workers: int = 0) -> dict[str, TaskResult]:
+        """Run the graph. Raises CommandFailed for the first task that fails."""
+        check_graph(tasks)
+        pending = {task.name: task for task in tasks}
+        succeeded: set[str] = set()
+        results: dict[str, TaskResult] = {}
+        failure: Optional[TaskResult] = None
+        running: dict[Future[TaskResult], Task] = {}
+        with ThreadPoolExecutor(max_workers=max_workers or len(tasks) or 1) as pool:
+            try:
+                while pending or running:
+                    if failure is None and not self.is_cancelled():
+                        for task in [task for task in pending.values() if set(task.needs) <= succeeded]:
+                            del pending[task.name]
+                            running[pool.submit(self.run_task, task)] = task
+                    if not running:
+                        break
+                    finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        task = running.pop(future)
+                        result = future.result()
+                        results[task.name] = result
+                        if result.returncode == 0 and not result.timed_out:
+                            succeeded.add(task.name)
+                            print(f"Command '{task.name}' executed successfully!")
+                        elif failure is None and not result.cancelled:
+                            failure = result
+                            self.cancelled.set()
+            except BaseException:
+                # Ctrl+C doesn't reach commands in their own session, stop them before the pool waits on them
+                self.cancelled.set()
+                raise
+        for name in pending:
+            results[name] = TaskResult(name, -1, cancelled=True)
+        if failure is not None:
+            raise CommandFailed(failure)
+        # stopped by the graph running this one, the callable calling it must not carry on
+        stopped = [result for result in results.values() if result.cancelled]
+        if stopped:
+            raise CommandFailed(stopped[0])
+        return results
+
+
+def run_task_graph(
+    tasks: list[Task],
+    environ: Any,
+    timeout: Optional[float] = None,
+    max_workers: int = 0,
+    stream: bool = True,
+) -> dict[str, TaskResult]:
+    """Run tasks as their dependencies allow, as many at once as max_workers (0 is all of them).
+
+    Called from a callable task of another graph, it stops when that graph does.
+    """
+    return TaskRunner(environ, timeout, stream, _RUNNING.runner).run(tasks, max_workers)
+
+
+def report_failure(error: CommandFailed) -> None:
+    """Print what a failed task said last."""
+    print(f"Command '{error.result.name}' failed!", file=sys.stderr)
+    if error.result.timed_out:
+        print("Timed out and was stopped", file=sys.stderr)
+    if error.result.output:
+        print(error.result.output, file=sys.stderr)
@@ -0,0 +1,129 @@
+"""
+Interface to uv.
+
+Dependencies are exported from uv.lock and installed with `uv pip install
+--target`, which resolves nothing, downloads and installs in parallel and
+reuses uv's own cache (UV_CACHE_DIR, ~/.cache/uv by default). When not
+building on Linux aarch64, --python-platform picks manylinux2014 aarch64 wheels.
+--python-version is the configured target_python's, so the wheels match the
+job's interpreter even when raypack runs on another one.
+"""
+
+import contextlib
+import logging
+import os
+import shlex
+from typing import Any, Optional
+
+from raypack.bytecode import target_python_version
+from raypack.poetry_interface import (
+    building_on_aarch64,
+    fetch_wheels,
+    remove_distributions,
+    requirements_for,
+    run_tasks,
+    wheel_source_args,
+)
+from raypack.task_graph import Task, run_task_graph
+from raypack.wheel_cache import WheelCache
+
+logger = logging.getLogger(__name__)
+
+REQUIREMENTS = "requirements-uv.txt"
+
+# uv's name for the platform Glue Ray runs on
+TARGET_PLATFORM = "aarch64-manylinux2014"
+
+EXPORT = shlex.join(
+    [
+        "uv",
+        "export",
+        "--frozen",
+        "--no-dev",
+        "--no-hashes",
+        "--no-emit-project",
+        "--format",
+        "requirements-txt",
+        "--output-file",
+        REQUIREMENTS,
+    ]
+)
+
+# Our own wheel is built while the dependencies are exported and installed.
+BUILD = Task("uv build", "uv build --wheel --out-dir dist")
+
+
+def install_command(
+    requirements: str, target: str, index: str = "", no_deps: bool = False, target_python: str = ""
+) -> list[str]:
+    """uv pip install of a requirements file into a --target folder, for the Glue platform and target_python."""
+    command = ["uv", "pip", "install", "-r", requirements, "--target", target]
+    command += ["--python-version", target_python_version(target_python)]
+    # unlike pip, uv can target Linux from an arm64 Mac
+    if not building_on_aarch64():
+        command += ["--python-platform", TARGET_PLATFORM, "--only-binary", ":all:"]
+    if no_deps:
+        command.append("--no-deps")
+    return command + wheel_source_args(index)
+
+
+def create_venv(venv_path: str, index: str = "", timeout: Optional[float] = None, *, target_python: str = "") -> None:
+    """Install the dependencies locked in uv.lock into venv_path."""
+    environ = os.environ.copy()
+    command = install_command(REQUIREMENTS, venv_path, index, target_python=target_python)
+    tasks = [BUILD, Task("uv export", EXPORT), Task("uv pip install", shlex.join(command), ["uv export"])]
+    run_tasks(tasks, environ, timeout)
+    remove_target_lock(venv_path)
+
+
+def remove_target_lock(venv_path: str) -> None:
+    """uv leaves the file it locks --target with behind, it doesn't belong in the zip."""
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(os.path.join(venv_path, ".lock"))
+
+
+def reinstall_packages(
+    venv_path: str,
+    changed: list[str],
+    removed: list[str],
+    index: str = "",
+    timeout: Optional[float] = None,
+    *,
+    target_python: str = "",
+) -> None:
+    """Install again only the locked packages that changed, without their dependencies."""
+    environ = os.environ.copy()
+    gone = remove_distributions(venv_path, set(changed) | set(removed))
+    logger.info(f"Removed {', '.join(gone) or 'nothing'} from {venv_path}")
+
+    def install_changed() -> None:
+        if not requirements_for(REQUIREMENTS, set(changed), "requirements-changed.txt"):
+            return
+        command = install_command(
+            "requirements-changed.txt", venv_path, index, no_deps=True, target_python=target_python
+        )
+        run_task_graph([Task("uv pip install changed", shlex.join(command))], environ, timeout)
+
+    tasks = [BUILD, Task("uv export", EXPORT), Task("reinstall changed", install_changed, ["uv export"])]
+    run_tasks(tasks, environ, timeout)
+    remove_target_lock(venv_path)
+
+
+def download_wheels(
+    wheel_dir: str, cache: Optional[WheelCache] = None, index: str = "", timeout: Optional[float] = None
+) -> None:
+    """Download wheels of the dependencies locked in uv.lock, without installing them.
+
+    uv has no download command, pip fetches them through the wheel cache.
+    """
+    environ: Any = os.environ.copy()
+    tasks = [
+        BUILD,
+        Task("uv export", EXPORT),
+        Task(
+            "fetch wheels",
+            lambda: fetch_wheels(REQUIREMENTS, wheel_dir, environ, cache=cache, index=index, timeout=timeout),
+            ["uv export"],
+        ),
+    ]
+    run_tasks(tasks, environ, timeout)
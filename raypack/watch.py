@@ -0,0 +1,433 @@
+"""
+Rebuild the zip while files change, for fast edit and run cycles.
+
+The virtual environment and our own package folders are scanned once and the
+file lists kept in memory. The zip stays open between rebuilds. On a change,
+members are rewritten from the first one that changed on; members after it
+that didn't change are copied back without recompressing. Our own package is
+packed last, straight from its source folders, so an edit to it only
+rewrites a handful of members and the central directory.
+
+Changes are noticed with inotify on Linux. Elsewhere, or if inotify can't be
+used, the folders are polled. Our own folders are watched recursively, the
+virtual environment only at the top of site-packages, where installing or
+removing a distribution always shows up (its .dist-info folder). Dependencies
+are installed before the first build, and again only when the lock file changed.
+"""
+
+import contextlib
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import time
+import zipfile
+from typing import Optional, Protocol
+
+from raypack.binary_check import BinaryCache, cache_path_for
+from raypack.build import (
+    DEFAULT_EXCLUSIONS,
+    check_for_binary_files,
+    collect_virtualenv_files,
+    compression_policy,
+    current_lock_fingerprint,
+    default_output_zip_name,
+    prepare_venv_index,
+    report_binaries,
+)
+from raypack.bytecode import precompile
+from raypack.compression import CompressionPolicy
+from raypack.config_loading import Config
+from raypack.lock_fingerprint import LockFingerprint
+from raypack.packing import pack_files
+from raypack.pyproject_interface import own_package_dirs
+from raypack.reproducible import reproducible_date_time
+from raypack.scanner import FileEntry, FileIndex, scan_tree
+from raypack.slimming import Slimmer, rules_for
+from raypack.zip_utils import drop_members_from, read_raw_member, write_central_directory, write_raw_member
+
+logger = logging.getLogger(__name__)
+
+# changes arriving within this many seconds of each other make one rebuild
+DEBOUNCE_SECONDS = 0.1
+
+POLL_INTERVAL = 0.5
+
+# inotify(7)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct("iIII")
+
+# (size, mtime_ns, path) of the source of each member, by member name
+Snapshot = dict[str, tuple[int, int, str]]
+
+
+class Watcher(Protocol):
+    """Waits for changes under some folders."""
+
+    def wait(self, timeout: Optional[float] = None) -> set[str]:
+        """Changed paths, empty if nothing changed before the timeout."""
+
+    def close(self) -> None:
+        """Stop watching."""
+
+
+class InotifyWatcher:
+    """Linux inotify through ctypes, no dependencies."""
+
+    def __init__(self, recursive: list[str], shallow: Optional[list[str]] = None) -> None:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError("inotify is not available")
+        self._libc = libc
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.folders: dict[int, str] = {}
+        self.recursive = [os.path.abspath(folder) for folder in recursive]
+        try:
+            for folder in self.recursive:
+                self.add_tree(folder)
+            for folder in shallow or []:
+                self.add(os.path.abspath(folder))
+        except OSError:
+            self.close()
+            raise
+
+    def add(self, folder: str) -> None:
+        """Watch one folder. OSError if out of watches (fs.inotify.max_user_watches)."""
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(folder), WATCH_MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f"Can't watch {folder}: {os.strerror(errno)}")
+        self.folders[wd] = folder
+
+    def add_tree(self, root: str) -> None:
+        """Watch a folder and every folder below it."""
+        for folder, _folders, _files in os.walk(root):
+            self.add(folder)
+
+    def wait(self, timeout: Optional[float] = None) -> set[str]:
+        """Changed paths. A new folder under a recursive root is watched too, and counts as changed."""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+        changed: set[str] = set()
+        with contextlib.suppress(BlockingIOError):
+            while True:
+                data = os.read(self.fd, 64 * 1024)
+                changed |= self._parse(data)
+        return changed
+
+    def _parse(self, data: bytes) -> set[str]:
+        changed: set[str] = set()
+        position = 0
+        while position + EVENT_HEADER.size <= len(data):
+            wd, mask, _cookie, length = EVENT_HEADER.unpack_from(data, position)
+            position += EVENT_HEADER.size
+            name = os.fsdecode(data[position : position + length].rstrip(b"\0"))
+            position += length
+            if mask & IN_Q_OVERFLOW:
+                # events were lost, everything counts as changed
+                changed.update(self.recursive)
+                continue
+            folder = self.folders.get(wd)
+            if folder is None:
+                continue
+            path = os.path.join(folder, name) if name else folder
+            changed.add(path)
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO) and self._is_recursive(path):
+                with contextlib.suppress(OSError):
+                    self.add_tree(path)
+        return changed
+
+    def _is_recursive(self, path: str) -> bool:
+        return any(path.startswith(os.path.join(root, "")) for root in self.recursive)
+
+    def close(self) -> None:
+        """Release the inotify file descriptor, which drops all watches."""
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class PollingWatcher:
+    """Compares size and mtime of every file every interval seconds."""
+
+    def __init__(self, recursive: list[str], shallow: Optional[list[str]] = None, interval: float = POLL_INTERVAL):
+        self.recursive = recursive
+        self.shallow = shallow or []
+        self.interval = interval
+        self.snapshot = self.take_snapshot()
+
+    def take_snapshot(self) -> dict[str, tuple[int, int]]:
+        """Size and mtime of the files below the recursive folders and the entries of the shallow ones."""
+        snapshot = {}
+        for root in self.recursive:
+            for entry in scan_tree(root).files:
+                snapshot[entry.path] = (entry.size, entry.mtime_ns)
+        for folder in self.shallow:
+            with contextlib.suppress(OSError), os.scandir(folder) as entries:
+                for item in entries:
+                    with contextlib.suppress(OSError):
+                        stat = item.stat(follow_symlinks=False)
+                        snapshot[item.path] = (stat.st_size, stat.st_mtime_ns)
+        return snapshot
+
+    def wait(self, timeout: Optional[float] = None) -> set[str]:
+        """Poll until something changed or the timeout passed."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            current = self.take_snapshot()
+            changed = {
+                path for path in current.keys() | self.snapshot.keys() if current.get(path) != self.snapshot.get(path)
+            }
+            self.snapshot = current
+            if changed:
+                return changed
+            if deadline is not None and time.monotonic() >= deadline:
+                return set()
+            time.sleep(self.interval if deadline is None else max(0.0, min(self.interval, deadline - time.monotonic())))
+
+    def close(self) -> None:
+        """Nothing to release."""
+
+
+def make_watcher(
+    recursive: list[str], shallow: Optional[list[str]] = None, poll: bool = False, interval: float = POLL_INTERVAL
+) -> Watcher:
+    """inotify on Linux unless poll is asked for, polling if inotify can't be set up."""
+    if not poll and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(recursive, shallow)
+        except OSError as error:
+            logger.warning(f"Can't use inotify ({error}), polling every {interval} seconds")
+    return PollingWatcher(recursive, shallow, interval)
+
+
+class LiveZip:
+    """A zip kept open and in step with a list of files.
+
+    update() rewrites members from the first one that changed, moved or is
+    new. The unchanged ones after it are read back into memory before being
+    overwritten, so if they add up to more than max_memory, the zip is
+    written again from scratch instead.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        policy: CompressionPolicy,
+        date_time: Optional[tuple[int, int, int, int, int, int]] = None,
+        jobs: int = 0,
+        max_memory: int = 256 * 1024 * 1024,
+    ) -> None:
+        self.path = path
+        self.policy = policy
+        self.date_time = date_time
+        self.jobs = jobs
+        self.max_memory = max_memory
+        self.zipf: Optional[zipfile.ZipFile] = None
+
+    def build(self, files: list[tuple[str, str]]) -> int:
+        """Write every file, in parallel. Returns the member count."""
+        self.close()
+        self.zipf = zipfile.ZipFile(  # pylint: disable=consider-using-with
+            self.path, "w", self.policy.compress_type, compresslevel=self.policy.compresslevel  # type: ignore[arg-type]
+        )
+        count = pack_files(
+            self.zipf, files, jobs=self.jobs, policy=self.policy, date_time=self.date_time, max_memory=self.max_memory
+        )
+        write_central_directory(self.zipf)
+        return count
+
+    def update(self, files: list[tuple[str, str]], changed: set[str]) -> int:
+        """Bring the zip in line with files, given the member names whose content changed. Returns members written."""
+        if self.zipf is None:
+            return self.build(files)
+        old = self.zipf.filelist
+        start = 0
+        while (
+            start < len(old)
+            and start < len(files)
+            and old[start].filename == files[start][1]
+            and files[start][1] not in changed
+        ):
+            start += 1
+        if start == len(old) == len(files):
+            return 0
+
+        reused = [zinfo for zinfo in old[start:] if zinfo.filename not in changed]
+        if sum(zinfo.compress_size for zinfo in reused) > self.max_memory:
+            logger.info("Too much to keep in memory, writing the whole zip again")
+            return self.build(files)
+        kept = {zinfo.filename: (zinfo, read_raw_member(self.zipf, zinfo)) for zinfo in reused}
+        drop_members_from(self.zipf, start)
+        for filepath, arcname in files[start:]:
+            if arcname in kept:
+                zinfo, raw = kept.pop(arcname)
+                write_raw_member(self.zipf, zinfo, raw)
+            else:
+                pack_files(self.zipf, [(filepath, arcname)], policy=self.policy, date_time=self.date_time)
+        write_central_directory(self.zipf)
+        return len(files) - start
+
+    def close(self) -> None:
+        """Close the zip. It was already complete on disk after each update."""
+        if self.zipf is not None:
+            self.zipf.close()
+            self.zipf = None
+
+
+def snapshot_of(files: list[tuple[str, str]], entries: dict[str, FileEntry]) -> Snapshot:
+    """Size, mtime and source path of each member, from the scanned entries."""
+    return {
+        arcname: (entries[path].size, entries[path].mtime_ns, path) if path in entries else (-1, -1, path)
+        for path, arcname in files
+    }
+
+
+class WatchSession:
+    """The in-memory file lists and the open zip of a `raypack watch`."""
+
+    def __init__(self, config: Config, output_zip_name: Optional[str] = None) -> None:
+        self.config = config
+        self.output_zip_name = output_zip_name or default_output_zip_name()
+        rules = rules_for(config.slimming, config.slimming_rules)
+        self.slimmer = Slimmer(rules) if rules or config.strip_binaries else None
+        self.package_dirs = [os.path.abspath(folder) for folder in own_package_dirs()]
+        if not self.package_dirs:
+            logger.warning("No package folder found for the project, only the virtual environment is watched")
+        date_time = reproducible_date_time() if config.deterministic else None
+        self.live = LiveZip(
+            self.output_zip_name,
+            compression_policy(config),
+            date_time,
+            config.pack_jobs,
+            config.max_memory_mb * 1024 * 1024,
+        )
+        self.venv_index = FileIndex("")
+        self.venv_files: list[tuple[str, str]] = []
+        self.own_files: list[tuple[str, str]] = []
+        self.snapshot: Snapshot = {}
+        self.lock: Optional[LockFingerprint] = None
+
+    def scan_venv(self, install: bool = False) -> Snapshot:
+        """Walk site-packages again, with the same filters as a build. Installs first only if asked to."""
+        index = prepare_venv_index(self.config, DEFAULT_EXCLUSIONS, self.slimmer, install=install)
+        index = precompile(index, self.config.compile_bytecode, self.config.target_python, self.config.pack_jobs)
+        self.venv_index = index
+        self.venv_files = collect_virtualenv_files(
+            self.config, DEFAULT_EXCLUSIONS, self.config.outer_folder_name, index.root, index
+        )
+        return snapshot_of(self.venv_files, {entry.path: entry for entry in index.files})
+
+    def scan_own(self) -> Snapshot:
+        """Our own packages, straight from their folders, sorted so a new file lands in a predictable place."""
+        files = []
+        entries = {}
+        for folder in self.package_dirs:
+            prefix = f"{self.config.outer_folder_name}/{os.path.basename(folder)}/"
+            for entry in scan_tree(folder).files:
+                if os.path.basename(entry.folder) == "__pycache__" or entry.name.endswith(".pyc"):
+                    continue
+                files.append((entry.path, prefix + entry.relpath.replace(os.sep, "/")))
+                entries[entry.path] = entry
+        self.own_files = sorted(files, key=lambda item: item[1])
+        return snapshot_of(self.own_files, entries)
+
+    def files(self) -> list[tuple[str, str]]:
+        """Members in zip order, dependencies first."""
+        return self.venv_files + self.own_files
+
+    def initial_build(self) -> int:
+        """Install what is locked, scan everything and write the whole zip."""
+        self.lock = current_lock_fingerprint(self.config)
+        self.snapshot = {**self.scan_venv(install=True), **self.scan_own()}
+        if self.config.binary_check != "off":
+            cache = BinaryCache(cache_path_for(self.config.source_venv))
+            report_binaries(self.config, check_for_binary_files(self.config, self.venv_root, self.venv_index, cache))
+        return self.live.build(self.files())
+
+    def rebuild(self, paths: set[str]) -> tuple[int, int]:
+        """Rescan what the changed paths touch and update the zip. Returns (changed, written) member counts."""
+        venv_changed = any(self.in_venv(path) for path in paths)
+        if venv_changed:
+            # the files changing are usually an install, only a new lock file calls for one
+            lock = current_lock_fingerprint(self.config)
+            venv_snapshot = self.scan_venv(install=lock != self.lock)
+            self.lock = lock
+        else:
+            venv_snapshot = {arcname: self.snapshot[arcname] for _, arcname in self.venv_files}
+        snapshot = {**venv_snapshot, **self.scan_own()}
+        changed = {arcname for arcname, source in snapshot.items() if self.snapshot.get(arcname) != source}
+        self.snapshot = snapshot
+        return len(changed), self.live.update(self.files(), changed)
+
+    @property
+    def venv_root(self) -> str:
+        """site-packages, as scanned."""
+        return self.venv_index.root
+
+    def in_venv(self, path: str) -> bool:
+        """Is the path in site-packages, or site-packages itself?"""
+        return path == self.venv_root or path.startswith(os.path.join(self.venv_root, ""))
+
+    def watcher(self, poll: bool = False, interval: float = POLL_INTERVAL) -> Watcher:
+        """Our folders recursively, site-packages at the top only."""
+        return make_watcher(self.package_dirs, [self.venv_root], poll, interval)
+
+    def close(self) -> None:
+        """Close the zip."""
+        self.live.close()
+
+
+def run_watch(
+    config: Config,
+    output_zip_name: Optional[str] = None,
+    poll: bool = False,
+    interval: float = POLL_INTERVAL,
+    max_rebuilds: Optional[int] = None,
+) -> int:
+    """raypack watch: build once, then update the zip on every change until interrupted."""
+    session = WatchSession(config, output_zip_name)
+    started = time.perf_counter()
+    count = session.initial_build()
+    print(f"{session.output_zip_name}: {count} files in {time.perf_counter() - started:.2f}s, watching for changes")
+    watcher = session.watcher(poll, interval)
+    rebuilds = 0
+    try:
+        while max_rebuilds is None or rebuilds < max_rebuilds:
+            paths = watcher.wait()
+            # editors write in several steps, wait for the burst to end
+            while True:
+                more = watcher.wait(DEBOUNCE_SECONDS)
+                if not more:
+                    break
+                paths |= more
+            started = time.perf_counter()
+            changed, written = session.rebuild(paths)
+            rebuilds += 1
+            if changed or written:
+                print(
+                    f"{session.output_zip_name}: {changed} changed, {written} members written"
+                    f" in {(time.perf_counter() - started) * 1000:.0f} ms"
+                )
+    except KeyboardInterrupt:
+        print("Stopped watching")
+    finally:
+        watcher.close()
+        session.close()
+    return 0
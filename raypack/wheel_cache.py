@@ -0,0 +1,183 @@
+"""
+Wheel cache shared by every project and build on the machine.
+
+A flat folder of .whl files plus index.json, which records when each wheel
+was last used. Wheels are found by (name, version, python tag, platform tag),
+which is all in the file name. When the folder grows past its size limit, the
+least recently used wheels are removed first.
+"""
+
+import contextlib
+import json
+import logging
+import os
+import re
+import shutil
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR_ENV = "RAYPACK_CACHE_DIR"
+
+INDEX_FILE = "index.json"
+
+
+def default_cache_dir() -> str:
+    """RAYPACK_CACHE_DIR, else ~/.cache/raypack/wheels (or XDG_CACHE_HOME)."""
+    if os.environ.get(CACHE_DIR_ENV):
+        return os.environ[CACHE_DIR_ENV]
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "raypack", "wheels")
+
+
+def normalize_name(name: str) -> str:
+    """PEP 503 name, with underscores like wheel file names use."""
+    return re.sub(r"[-_.]+", "_", name).lower()
+
+
+def parse_wheel_filename(filename: str) -> tuple[str, str, str, str]:
+    """(name, version, python tag, platform tag) from a wheel file name."""
+    if not filename.endswith(".whl"):
+        raise ValueError(f"Not a wheel: {filename}")
+    parts = filename[: -len(".whl")].split("-")
+    # name-version[-build]-python-abi-platform
+    if len(parts) not in (5, 6):
+        raise ValueError(f"Not a valid wheel file name: {filename}")
+    return normalize_name(parts[0]), parts[1], parts[-3], parts[-1]
+
+
+@dataclass
+class CachedWheel:
+    """A wheel in the cache."""
+
+    filename: str
+    size: int
+    last_used: float
+
+
+class WheelCache:
+    """Size-bounded, least recently used wheel cache."""
+
+    def __init__(self, root: Optional[str] = None, max_size_mb: int = 0) -> None:
+        self.root = root or default_cache_dir()
+        # 0 means no limit
+        self.max_size = max_size_mb * 1024 * 1024
+
+    @property
+    def index_path(self) -> str:
+        """index.json in the cache folder."""
+        return os.path.join(self.root, INDEX_FILE)
+
+    def _load_index(self) -> dict[str, float]:
+        """Last use of each wheel, by file name."""
+        try:
+            with open(self.index_path, encoding="utf-8") as file:
+                data = json.load(file)
+            return {name: float(last_used) for name, last_used in data.get("last_used", {}).items()}
+        except FileNotFoundError:
+            return {}
+        except (ValueError, TypeError, AttributeError) as error:
+            logger.warning(f"Ignoring broken wheel cache index {self.index_path}: {error}")
+            return {}
+
+    def _save_index(self, last_used: dict[str, float]) -> None:
+        """Replace the index in one step, another build might be reading it."""
+        os.makedirs(self.root, exist_ok=True)
+        temp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump({"last_used": dict(sorted(last_used.items()))}, file, indent=1)
+        os.replace(temp_path, self.index_path)
+
+    def entries(self) -> list[CachedWheel]:
+        """Wheels in the cache, most recently used first."""
+        if not os.path.isdir(self.root):
+            return []
+        last_used = self._load_index()
+        entries = []
+        for name in os.listdir(self.root):
+            if not name.endswith(".whl"):
+                continue
+            stat = os.stat(os.path.join(self.root, name))
+            # wheels copied in by hand count as used when they were copied
+            entries.append(CachedWheel(name, stat.st_size, last_used.get(name, stat.st_mtime)))
+        return sorted(entries, key=lambda entry: (-entry.last_used, entry.filename))
+
+    @property
+    def total_size(self) -> int:
+        """Bytes in all cached wheels."""
+        return sum(entry.size for entry in self.entries())
+
+    def touch(self, filenames: list[str]) -> None:
+        """Mark wheels as just used."""
+        last_used = self._load_index()
+        now = time.time()
+        for filename in filenames:
+            last_used[os.path.basename(filename)] = now
+        self._save_index(last_used)
+
+    def add(self, paths: list[str]) -> list[str]:
+        """Put wheels in the cache, hard linked when possible, and mark them used. Returns the newly added."""
+        os.makedirs(self.root, exist_ok=True)
+        added = []
+        for path in paths:
+            filename = os.path.basename(path)
+            target = os.path.join(self.root, filename)
+            if os.path.exists(target):
+                continue
+            temp_path = f"{target}.{os.getpid()}.tmp"
+            try:
+                os.link(path, temp_path)
+            except OSError:
+                shutil.copyfile(path, temp_path)
+            os.replace(temp_path, target)
+            added.append(filename)
+        self.touch(paths)
+        if added:
+            logger.info(f"Added {len(added)} wheels to the cache at {self.root}")
+        return added
+
+    def prune(self, max_size: Optional[int] = None) -> list[CachedWheel]:
+        """Remove least recently used wheels until the cache fits in max_size bytes. Returns what was removed."""
+        limit = self.max_size if max_size is None else max_size
+        if limit <= 0:
+            return []
+        entries = self.entries()
+        total = sum(entry.size for entry in entries)
+        removed = []
+        # oldest last
+        while entries and total > limit:
+            entry = entries.pop()
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(os.path.join(self.root, entry.filename))
+            total -= entry.size
+            removed.append(entry)
+        if removed:
+            last_used = self._load_index()
+            for entry in removed:
+                last_used.pop(entry.filename, None)
+            self._save_index(last_used)
+            logger.info(f"Removed {len(removed)} wheels from the cache, {total / 1024 / 1024:.1f} MB left")
+        return removed
+
+    def clear(self) -> int:
+        """Remove every wheel. Returns how many were removed."""
+        entries = self.entries()
+        for entry in entries:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(os.path.join(self.root, entry.filename))
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self.index_path)
+        return len(entries)
+
+
+def format_entries(entries: list[CachedWheel]) -> str:
+    """Plain text table of cached wheels."""
+    lines = [f"{'wheel':<60} {'MB':>8} {'last used':>20}"]
+    for entry in entries:
+        last_used = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry.last_used))
+        lines.append(f"{entry.filename:<60} {entry.size / 1024 / 1024:>8.2f} {last_used:>20}")
+    total = sum(entry.size for entry in entries)
+    lines.append(f"{len(entries)} wheels, {total / 1024 / 1024:.2f} MB")
+    return "\n".join(lines)
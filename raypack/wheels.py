@@ -0,0 +1,97 @@
+"""
+Read dependencies straight out of wheel files, without installing them.
+
+A wheel is already a zip of what pip would unpack into site-packages, so its
+members can go into the output zip as they are, skipping the unpack to disk
+and the walk over the result.
+"""
+
+import logging
+import os
+import shutil
+import zipfile
+from collections.abc import Iterator
+from pathlib import PurePosixPath
+from typing import Optional
+
+from raypack.compression import CompressionPolicy
+from raypack.zip_utils import CHUNK_SIZE, can_copy_raw, copy_raw_member, normalize_zipinfo
+
+logger = logging.getLogger(__name__)
+
+# .data sub-folders that pip installs into site-packages. scripts, headers and data go elsewhere.
+SITE_PACKAGES_SCHEMES = ("purelib", "platlib")
+
+
+def find_wheels(wheel_dir: str) -> list[str]:
+    """Wheel files in a folder, sorted by file name."""
+    if not os.path.isdir(wheel_dir):
+        return []
+    return sorted(os.path.join(wheel_dir, name) for name in os.listdir(wheel_dir) if name.endswith(".whl"))
+
+
+def site_packages_path(member: str) -> Optional[str]:
+    """Where pip would install a wheel member, relative to site-packages. None if not in site-packages.
+
+    .dist-info is dropped, AWS asks to remove it. .data/purelib and .data/platlib
+    are moved to the top, like pip does.
+    """
+    parts = PurePosixPath(member).parts
+    if not parts or any(part.endswith(".dist-info") for part in parts):
+        return None
+    if parts[0].endswith(".data"):
+        # name.data/purelib/<path>
+        if len(parts) < 3 or parts[1] not in SITE_PACKAGES_SCHEMES:  # noqa: PLR2004
+            return None
+        parts = parts[2:]
+    path = "/".join(parts)
+    return path + "/" if member.endswith("/") else path
+
+
+def iter_wheel_members(whl: zipfile.ZipFile, sort: bool = False) -> Iterator[tuple[zipfile.ZipInfo, str]]:
+    """Members of an open wheel that belong in site-packages, with their path there."""
+    infos = whl.infolist()
+    if sort:
+        infos = sorted(infos, key=lambda info: info.filename)
+    for file_info in infos:
+        path = site_packages_path(file_info.filename)
+        if path:
+            yield file_info, path
+
+
+def copy_wheel_member(
+    whl: zipfile.ZipFile,
+    file_info: zipfile.ZipInfo,
+    arcname: str,
+    new_zip: zipfile.ZipFile,
+    *,
+    policy: Optional[CompressionPolicy] = None,
+    date_time: Optional[tuple[int, int, int, int, int, int]] = None,
+) -> bool:
+    """Copy one wheel member into the zip under a new name. True if it was copied without recompressing.
+
+    Members already compressed the way the policy wants are copied as they are,
+    only the headers are rewritten. The rest are streamed through zipfile in
+    chunks. With a date_time, the member gets reproducible headers.
+    """
+    if policy is not None:
+        compress_type, compresslevel = policy.for_file(arcname)
+    else:
+        compress_type, compresslevel = new_zip.compression, new_zip.compresslevel
+    target = zipfile.ZipInfo(arcname, date_time or file_info.date_time)
+    target.external_attr = file_info.external_attr
+    if date_time is not None:
+        normalize_zipinfo(target, date_time)
+    if can_copy_raw(file_info, compress_type) and not file_info.is_dir():
+        copy_raw_member(whl, file_info, new_zip, target)
+        return True
+    target.compress_type = compress_type
+    # zipfile decides on ZIP64 headers from the size it is told up front
+    target.file_size = file_info.file_size
+    target._compresslevel = compresslevel  # type: ignore[attr-defined] # pylint: disable=protected-access
+    if target.is_dir():
+        new_zip.writestr(target, b"")
+    else:
+        with whl.open(file_info) as source_file, new_zip.open(target, "w") as dest:
+            shutil.copyfileobj(source_file, dest, CHUNK_SIZE)
+    return False
@@ -0,0 +1,292 @@
+"""
+Low level zip helpers.
+
+zipfile has no public API for copying an already-compressed member, so the
+raw reads and writes live here, next to each other, and nowhere else.
+"""
+
+# pylint: disable=protected-access
+import hashlib
+import stat
+import struct
+import zipfile
+import zlib
+from collections.abc import Iterable, Iterator
+from typing import Any, Callable, Optional, Union
+
+# Same chunk size zipfile.ZipFile.write uses.
+CHUNK_SIZE = 1024 * 8
+
+# Bigger reads when compressing in memory, fewer trips through the GIL.
+READ_SIZE = 1024 * 1024
+
+# General purpose flag zipfile sets on LZMA members, it only names it from Python 3.11 on.
+LZMA_EOS_FLAG = 0x02
+
+
+def needs_zip64(zinfo: zipfile.ZipInfo) -> bool:
+    """Same rule zipfile uses when it opens a member for writing."""
+    return zinfo.file_size * 1.05 > zipfile.ZIP64_LIMIT
+
+
+def _raw_data_offset(archive: Any, zinfo: zipfile.ZipInfo) -> int:
+    """Where the compressed bytes of a member start. Caller holds the archive lock."""
+    archive.fp.seek(zinfo.header_offset)
+    header = archive.fp.read(zipfile.sizeFileHeader)  # type: ignore[attr-defined]
+    if len(header) != zipfile.sizeFileHeader:  # type: ignore[attr-defined]
+        raise zipfile.BadZipFile("Truncated file header")
+    fields = struct.unpack(zipfile.structFileHeader, header)  # type: ignore[attr-defined]
+    if fields[0] != zipfile.stringFileHeader:  # type: ignore[attr-defined]
+        raise zipfile.BadZipFile("Bad magic number for file header")
+    # file name length and extra field length are the last two fields
+    return int(zinfo.header_offset + zipfile.sizeFileHeader + fields[-2] + fields[-1])  # type: ignore[attr-defined]
+
+
+def read_raw_member(source: zipfile.ZipFile, zinfo: zipfile.ZipInfo) -> bytes:
+    """Read the compressed bytes of a member without decompressing them."""
+    return b"".join(iter_raw_member(source, zinfo, max(zinfo.compress_size, 1)))
+
+
+def iter_raw_member(source: zipfile.ZipFile, zinfo: zipfile.ZipInfo, chunk_size: int = READ_SIZE) -> Iterator[bytes]:
+    """Compressed bytes of a member, in chunks, without decompressing them."""
+    archive: Any = source  # zipfile internals
+    if archive.fp is None:
+        raise ValueError("Attempt to read ZIP archive that was already closed")
+    with archive._lock:
+        position = _raw_data_offset(archive, zinfo)
+        remaining = zinfo.compress_size
+        while remaining > 0:
+            # someone else may have moved the shared file position in between
+            archive.fp.seek(position)
+            chunk = archive.fp.read(min(chunk_size, remaining))
+            if not chunk:
+                raise zipfile.BadZipFile(f"Truncated data for {zinfo.filename}")
+            position += len(chunk)
+            remaining -= len(chunk)
+            yield chunk
+
+
+def write_raw_member(target: zipfile.ZipFile, zinfo: zipfile.ZipInfo, raw: Union[bytes, Iterable[bytes]]) -> None:
+    """Append an already-compressed member, given as bytes or an iterable of chunks.
+
+    zinfo must carry CRC, file_size, compress_size and compress_type. The bytes
+    written are the same as if zipfile had compressed the data itself.
+    """
+    archive: Any = target  # zipfile internals
+    if archive.fp is None:
+        raise ValueError("Attempt to write to ZIP archive that was already closed")
+    if archive._writing:
+        raise ValueError("Can't write to ZIP archive while an open writing handle exists")
+
+    zinfo.flag_bits = 0x00
+    if zinfo.compress_type == zipfile.ZIP_LZMA:
+        zinfo.flag_bits |= LZMA_EOS_FLAG
+    if not zinfo.external_attr:
+        zinfo.external_attr = 0o600 << 16
+
+    with archive._lock:
+        if archive._seekable:
+            archive.fp.seek(archive.start_dir)
+        zinfo.header_offset = archive.fp.tell()
+        archive._writecheck(zinfo)
+        archive._didModify = True
+        archive.fp.write(zinfo.FileHeader(needs_zip64(zinfo)))
+        for chunk in [raw] if isinstance(raw, bytes) else raw:
+            archive.fp.write(chunk)
+        archive.start_dir = archive.fp.tell()
+        archive.filelist.append(zinfo)
+        archive.NameToInfo[zinfo.filename] = zinfo
+
+
+def drop_members_from(target: zipfile.ZipFile, position: int) -> list[zipfile.ZipInfo]:
+    """Forget the members from position on. The next member is written where the first of them started.
+
+    Their bytes stay in the file until overwritten, so they can still be read
+    with read_raw_member until then. Returns the dropped members.
+    """
+    archive: Any = target  # zipfile internals
+    with archive._lock:
+        dropped = archive.filelist[position:]
+        if not dropped:
+            return []
+        del archive.filelist[position:]
+        for zinfo in dropped:
+            archive.NameToInfo.pop(zinfo.filename, None)
+        archive.start_dir = dropped[0].header_offset
+        archive._didModify = True
+    return dropped
+
+
+def write_central_directory(target: zipfile.ZipFile) -> None:
+    """Make the zip on disk complete without closing it. Members written later go over the central directory."""
+    archive: Any = target  # zipfile internals
+    with archive._lock:
+        archive.fp.seek(archive.start_dir)
+        archive._write_end_record()
+        archive.fp.truncate()
+        archive.fp.flush()
+
+
+def copy_raw_member(
+    source: zipfile.ZipFile, source_info: zipfile.ZipInfo, target: zipfile.ZipFile, zinfo: zipfile.ZipInfo
+) -> None:
+    """Copy a member between zips without decompressing it. Only the headers are rewritten.
+
+    zinfo supplies the new name, timestamp and attributes; compression, CRC and
+    sizes come from source_info.
+    """
+    zinfo.compress_type = source_info.compress_type
+    zinfo.CRC = source_info.CRC
+    zinfo.file_size = source_info.file_size
+    zinfo.compress_size = source_info.compress_size
+    write_raw_member(target, zinfo, iter_raw_member(source, source_info))
+
+
+def can_copy_raw(source_info: zipfile.ZipInfo, compress_type: int) -> bool:
+    """Raw copy works if the compression method stays the same and the member isn't encrypted."""
+    return source_info.compress_type == compress_type and not source_info.flag_bits & 0x1
+
+
+def zipinfo_for_file(
+    filepath: str,
+    arcname: str,
+    compress_type: int,
+    compresslevel: Optional[int],
+    date_time: Optional[tuple[int, int, int, int, int, int]] = None,
+) -> zipfile.ZipInfo:
+    """ZipInfo the way zipfile.ZipFile.write makes it, normalized if a fixed date_time is given."""
+    zinfo = zipfile.ZipInfo.from_file(filepath, arcname)
+    zinfo.compress_type = compress_type
+    zinfo._compresslevel = compresslevel  # type: ignore[attr-defined]
+    if date_time is not None:
+        normalize_zipinfo(zinfo, date_time)
+    return zinfo
+
+
+def normalize_zipinfo(zinfo: zipfile.ZipInfo, date_time: tuple[int, int, int, int, int, int]) -> None:
+    """Fixed timestamp, unix host, 0o644 or 0o755 permissions. Nothing left that depends on the build machine."""
+    executable = (zinfo.external_attr >> 16) & 0o111
+    zinfo.date_time = date_time
+    zinfo.create_system = 3
+    if zinfo.is_dir():
+        zinfo.external_attr = ((stat.S_IFDIR | 0o755) << 16) | 0x10
+    else:
+        zinfo.external_attr = (stat.S_IFREG | (0o755 if executable else 0o644)) << 16
+
+
+def write_file(zipf: zipfile.ZipFile, filepath: str, zinfo: zipfile.ZipInfo, with_digest: bool = False) -> str:
+    """Stream a file into the zip under a prepared ZipInfo, like zipfile.ZipFile.write.
+
+    Only a chunk is in memory at a time, zipfile switches to ZIP64 by itself.
+    Returns the sha256 of the content if asked for.
+    """
+    digest = hashlib.sha256() if with_digest else None
+    with open(filepath, "rb") as src, zipf.open(zinfo, "w") as dest:
+        for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+            if digest is not None:
+                digest.update(chunk)
+            dest.write(chunk)
+    return digest.hexdigest() if digest is not None else ""
+
+
+def iter_compressed(filepath: str, zinfo: zipfile.ZipInfo, digest: Optional[Any] = None) -> Iterator[bytes]:
+    """Compressed chunks of a file, the way zipfile.ZipFile.write would compress it.
+
+    Fills in CRC and sizes on zinfo once exhausted, and feeds the uncompressed
+    content to digest if one is given.
+    """
+    compressor = zipfile._get_compressor(zinfo.compress_type, zinfo._compresslevel)  # type: ignore[attr-defined]
+    crc = 0
+    file_size = 0
+    compress_size = 0
+    with open(filepath, "rb") as src:
+        for chunk in iter(lambda: src.read(READ_SIZE), b""):
+            crc = zlib.crc32(chunk, crc)
+            file_size += len(chunk)
+            if digest is not None:
+                digest.update(chunk)
+            part = compressor.compress(chunk) if compressor else chunk
+            compress_size += len(part)
+            yield part
+    if compressor:
+        part = compressor.flush()
+        compress_size += len(part)
+        yield part
+
+    zinfo.CRC = crc
+    zinfo.file_size = file_size
+    zinfo.compress_size = compress_size
+
+
+def compress_file(filepath: str, zinfo: zipfile.ZipInfo, with_digest: bool = False) -> tuple[bytes, str]:
+    """Compress a file in memory the way zipfile.ZipFile.write would.
+
+    Fills in CRC and sizes on zinfo. Returns the compressed bytes and, if asked
+    for, the sha256 of the uncompressed content.
+    """
+    digest = hashlib.sha256() if with_digest else None
+    raw = b"".join(iter_compressed(filepath, zinfo, digest))
+    return raw, digest.hexdigest() if digest is not None else ""
+
+
+def compressed_size(filepath: str, zinfo: zipfile.ZipInfo) -> int:
+    """Size a file compresses to, without keeping the compressed bytes."""
+    return sum(len(part) for part in iter_compressed(filepath, zinfo))
+
+
+class StableOffsetFile:
+    """File wrapper that reports how much of a zip being written is final.
+
+    zipfile always seeks to the end of the archive once a member is complete
+    (and before it starts the next one). Everything before that point will not
+    be rewritten, so it can be read by someone else, e.g. an uploader.
+    """
+
+    def __init__(self, path: str, on_stable: Callable[[str, int], None]) -> None:
+        self.path = path
+        self.on_stable = on_stable
+        self.stable = 0
+        self._file = open(path, "w+b")  # noqa: SIM115 # pylint: disable=consider-using-with
+        self._end = 0
+
+    def write(self, data: bytes) -> int:
+        """Write and keep track of the end of file."""
+        written = self._file.write(data)
+        self._end = max(self._end, self._file.tell())
+        return written
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        """Seeking to the end of the file means everything before it is done."""
+        position = self._file.seek(offset, whence)
+        if position == self._end and position > self.stable:
+            self.mark_stable(position)
+        return position
+
+    def mark_stable(self, position: int) -> None:
+        """Flush and tell the listener."""
+        self._file.flush()
+        self.stable = position
+        self.on_stable(self.path, position)
+
+    def tell(self) -> int:
+        """Current position."""
+        return self._file.tell()
+
+    def flush(self) -> None:
+        """Flush the underlying file."""
+        self._file.flush()
+
+    def seekable(self) -> bool:
+        """zipfile only rewrites headers in place if this is True."""
+        return True
+
+    def close(self) -> None:
+        """Close the file. The whole file is final now."""
+        if self._file.closed:
+            return
+        self._file.flush()
+        self._end = max(self._end, self._file.seek(0, 2))
+        self._file.close()
+        if self._end > self.stable:
+            self.stable = self._end
+            self.on_stable(self.path, self._end)
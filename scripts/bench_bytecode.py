@@ -0,0 +1,78 @@
+"""
+Cold import time of a packed artifact through zipimport, with and without bytecode.
+
+    python scripts/bench_bytecode.py --site-packages .venv/lib/python3.11/site-packages --modules requests yaml
+
+Packs the site-packages three times (none, alongside, sourceless) and imports
+the modules from each zip in fresh interpreters. Under zipimport only the
+sourceless zip can use its bytecode, "alongside" helps once the zip is extracted.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess  # nosec
+import sys
+import tempfile
+import zipfile
+
+from raypack.build import DEFAULT_EXCLUSIONS, collect_virtualenv_files
+from raypack.bytecode import BYTECODE_MODES, precompile
+from raypack.config_loading import Config
+from raypack.packing import pack_files
+from raypack.scanner import scan_tree
+
+IMPORT_SCRIPT = """
+import sys, time
+sys.path.insert(0, sys.argv[1])
+started = time.perf_counter()
+for module in sys.argv[2:]:
+    __import__(module)
+print(time.perf_counter() - started)
+"""
+
+
+def pack(site_packages: str, mode: str, work_dir: str) -> str:
+    """Zip site-packages with the given bytecode mode."""
+    index = precompile(scan_tree(site_packages), mode, stage_dir=os.path.join(work_dir, "stage"))
+    files = collect_virtualenv_files(Config(), DEFAULT_EXCLUSIONS, "venv", site_packages, index)
+    output = os.path.join(work_dir, f"{mode}.zip")
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as zipf:
+        pack_files(zipf, files, jobs=0)
+    return output
+
+
+def cold_import(zip_path: str, modules: list[str], repeat: int) -> list[float]:
+    """Seconds to import the modules from the zip, each time in a new interpreter."""
+    timings = []
+    for _ in range(repeat):
+        result = subprocess.run(  # nosec
+            [sys.executable, "-I", "-S", "-c", IMPORT_SCRIPT, os.path.join(zip_path, "venv"), *modules],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        timings.append(float(result.stdout))
+    return timings
+
+
+def main() -> int:
+    """Pack once per mode, then time the imports."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--site-packages", required=True, help="site-packages to pack.")
+    parser.add_argument("--modules", nargs="+", required=True, help="Modules to import.")
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per mode.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="raypack-bench-") as work_dir:
+        print(f"{'bytecode':<12} {'zip MB':>8} {'median s':>10} {'min s':>8}")
+        for mode in BYTECODE_MODES:
+            output = pack(args.site_packages, mode, work_dir)
+            timings = cold_import(output, args.modules, args.repeat)
+            size = os.path.getsize(output) / 1024 / 1024
+            print(f"{mode:<12} {size:>8.2f} {statistics.median(timings):>10.3f} {min(timings):>8.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
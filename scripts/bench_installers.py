@@ -0,0 +1,84 @@
+"""
+Install time of the locked dependencies with each venv_tool, against a local index.
+
+    pip download -r requirements.txt -d wheels --only-binary=:all: --platform manylinux2014_aarch64
+    python scripts/bench_installers.py --index wheels
+
+Run from a project with poetry.lock and uv.lock. Each backend installs into a
+fresh --target folder twice, first with an empty cache, then with the cache
+the first run filled. "poetry" is what raypack runs for venv_tool poetry:
+poetry export, then pip install. "pip" is the pip install alone, from the
+requirements poetry exported. "uv" is uv export, then uv pip install.
+Backends whose tool isn't on PATH are skipped.
+"""
+
+import argparse
+import os
+import shutil
+import subprocess  # nosec
+import sys
+import tempfile
+import time
+
+from raypack.poetry_interface import target_platform_args, wheel_source_args
+from raypack.uv_interface import install_command
+
+BACKENDS = ("poetry", "pip", "uv")
+
+
+def commands(backend: str, work_dir: str, target: str, index: str) -> list[list[str]]:
+    """Export and install commands of a backend."""
+    poetry_requirements = os.path.join(work_dir, "requirements-poetry.txt")
+    if backend == "uv":
+        requirements = os.path.join(work_dir, "requirements-uv.txt")
+        export = ["uv", "export", "--frozen", "--no-dev", "--no-hashes", "--no-emit-project"]
+        export += ["--format", "requirements-txt", "--output-file", requirements]
+        return [export, install_command(requirements, target, index)]
+    install = ["pip", "install", "-r", poetry_requirements, "--target", target, "--only-binary=:all:"]
+    install += target_platform_args() + wheel_source_args(index)
+    if backend == "pip":
+        return [install]
+    export = ["poetry", "export", "--without-hashes", "--format=requirements.txt", "--output", poetry_requirements]
+    return [export, install]
+
+
+def timed_install(backend: str, work_dir: str, index: str, cache_dir: str) -> tuple[float, int]:
+    """Seconds to export and install into a new folder, and files installed."""
+    target = tempfile.mkdtemp(prefix=f"{backend}-", dir=work_dir)
+    environ = {**os.environ, "PIP_CACHE_DIR": cache_dir, "UV_CACHE_DIR": cache_dir}
+    started = time.perf_counter()
+    for command in commands(backend, work_dir, target, index):
+        subprocess.run(command, check=True, env=environ, capture_output=True)  # nosec
+    seconds = time.perf_counter() - started
+    files = sum(len(names) for _, _, names in os.walk(target))
+    shutil.rmtree(target)
+    return seconds, files
+
+
+def main() -> int:
+    """Cold and warm install per backend."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--index", required=True, help="Folder of wheels, or file:// URL, to install from.")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    args = parser.parse_args()
+    index = os.path.abspath(args.index) if os.path.isdir(args.index) else args.index
+
+    with tempfile.TemporaryDirectory(prefix="raypack-bench-") as work_dir:
+        if "pip" in args.backends and shutil.which("poetry"):
+            # pip installs what poetry exported
+            subprocess.run(commands("poetry", work_dir, "", index)[0], check=True)  # nosec
+        print(f"{'backend':<8} {'cold s':>8} {'warm s':>8} {'files':>7}")
+        for backend in args.backends:
+            tool = "poetry" if backend == "pip" else backend
+            if not shutil.which(tool):
+                print(f"{backend:<8} skipped, {tool} not found")
+                continue
+            cache_dir = os.path.join(work_dir, f"cache-{backend}")
+            cold, files = timed_install(backend, work_dir, index, cache_dir)
+            warm, _files = timed_install(backend, work_dir, index, cache_dir)
+            print(f"{backend:<8} {cold:>8.2f} {warm:>8.2f} {files:>7}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""
+Measure slimming rule sets against a benchmark venv.
+
+    python scripts/bench_slimming.py --site-packages .venv/lib/python3.11/site-packages
+    python scripts/bench_slimming.py --requirements "pandas pyarrow requests"
+
+The second form pip installs the requirements into a temporary folder first.
+Prints files, bytes and zip size for each rule set, with and without strip.
+"""
+
+import argparse
+import os
+import subprocess  # nosec
+import sys
+import tempfile
+import time
+import zipfile
+
+from raypack.build import DEFAULT_EXCLUSIONS, collect_virtualenv_files
+from raypack.config_loading import Config
+from raypack.packing import pack_files
+from raypack.scanner import scan_tree
+from raypack.slimming import RULE_SETS, Slimmer, strip_shared_libraries
+
+
+def measure(site_packages: str, rule_set: str, strip: bool, work_dir: str) -> dict[str, float]:
+    """Slim, then zip, and report sizes and time."""
+    started = time.perf_counter()
+    index = scan_tree(site_packages)
+    slimmer = Slimmer(dict(RULE_SETS[rule_set]))
+    index = slimmer.slim(index)
+    if strip:
+        index = strip_shared_libraries(index, slimmer, os.path.join(work_dir, f"stripped-{rule_set}"))
+    files = collect_virtualenv_files(Config(), DEFAULT_EXCLUSIONS, "venv", site_packages, index)
+    output = os.path.join(work_dir, f"{rule_set}-{strip}.zip")
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as zipf:
+        pack_files(zipf, files, jobs=0)
+    return {
+        "files": len(files),
+        "input_mb": sum(entry.size for entry in index.files) / 1024 / 1024,
+        "zip_mb": os.path.getsize(output) / 1024 / 1024,
+        "seconds": time.perf_counter() - started,
+    }
+
+
+def main() -> int:
+    """Run every rule set, with and without strip."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--site-packages", help="Existing site-packages to measure.")
+    parser.add_argument("--requirements", help="Space separated requirements to install into a temporary folder.")
+    args = parser.parse_args()
+    if not args.site_packages and not args.requirements:
+        parser.error("give --site-packages or --requirements")
+
+    with tempfile.TemporaryDirectory(prefix="raypack-bench-") as work_dir:
+        site_packages = args.site_packages
+        if not site_packages:
+            site_packages = os.path.join(work_dir, "site-packages")
+            subprocess.run(  # nosec
+                [
+                    sys.executable,
+                    "-m",
+                    "pip",
+                    "install",
+                    "--quiet",
+                    "--target",
+                    site_packages,
+                    *args.requirements.split(),
+                ],
+                check=True,
+            )
+        print(f"{'rule set':<12} {'strip':<6} {'files':>8} {'input MB':>10} {'zip MB':>8} {'seconds':>8}")
+        for rule_set in RULE_SETS:
+            for strip in (False, True):
+                row = measure(site_packages, rule_set, strip, work_dir)
+                print(
+                    f"{rule_set:<12} {str(strip):<6} {row['files']:>8} {row['input_mb']:>10.2f} "
+                    f"{row['zip_mb']:>8.2f} {row['seconds']:>8.2f}"
+                )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
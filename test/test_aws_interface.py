@@ -1,7 +1,9 @@
+import os
+
 import boto3
 import moto
 
-from raypack.aws_interface import upload_to_s3
+from raypack.aws_interface import StreamingUploader, remote_artifact_matches, upload_to_s3
 
 
 @moto.mock_s3
@@ -10,3 +12,92 @@ def test_s3_bucket():
     bucket_name = "test-bucket"
     conn.create_bucket(Bucket=bucket_name)
     upload_to_s3(output_zip_path=__file__, bucket=bucket_name)
+
+
+PART = 5 * 1024 * 1024
+
+
+def make_file(path, size):
+    data = os.urandom(size)
+    path.write_bytes(data)
+    return data
+
+
+@moto.mock_s3
+def test_streaming_upload_while_file_grows(tmp_path):
+    s3 = boto3.client("s3", region_name="us-east-1")
+    s3.create_bucket(Bucket="test-bucket")
+    data = os.urandom(2 * PART + 1234)
+    path = tmp_path / "out.zip"
+
+    uploader = StreamingUploader("test-bucket", "out.zip", part_size=PART, concurrency=2, s3_client=s3)
+    uploader.start()
+    with open(path, "wb") as file:
+        for start in range(0, len(data), 1024 * 1024):
+            file.write(data[start : start + 1024 * 1024])
+            file.flush()
+            uploader.feed(str(path), file.tell())
+    uploader.complete(str(path))
+
+    assert uploader.uploaded == 3
+    assert s3.get_object(Bucket="test-bucket", Key="out.zip")["Body"].read() == data
+
+
+@moto.mock_s3
+def test_streaming_upload_resumes(tmp_path):
+    s3 = boto3.client("s3", region_name="us-east-1")
+    s3.create_bucket(Bucket="test-bucket")
+    path = tmp_path / "out.zip"
+    data = make_file(path, 2 * PART + 10)
+    state_file = str(tmp_path / "state.json")
+
+    # first attempt dies after the first part
+    first = StreamingUploader("test-bucket", "out.zip", part_size=PART, state_file=state_file, s3_client=s3)
+    first.start()
+    first.feed(str(path), PART)
+    first._pool.shutdown(wait=True)
+    assert first.uploaded == 1
+
+    second = StreamingUploader("test-bucket", "out.zip", part_size=PART, state_file=state_file, s3_client=s3)
+    second.start()
+    assert second.upload_id == first.upload_id
+    second.complete(str(path))
+
+    assert second.skipped == 1
+    assert second.uploaded == 2
+    assert not os.path.exists(state_file)
+    assert s3.get_object(Bucket="test-bucket", Key="out.zip")["Body"].read() == data
+
+
+@moto.mock_s3
+def test_upload_skipped_when_unchanged(tmp_path):
+    s3 = boto3.client("s3", region_name="us-east-1")
+    s3.create_bucket(Bucket="test-bucket")
+    path = tmp_path / "out.zip"
+    path.write_bytes(b"zip bytes")
+
+    assert upload_to_s3(str(path), "test-bucket", skip_unchanged=True, s3_client=s3)
+    assert not upload_to_s3(str(path), "test-bucket", skip_unchanged=True, s3_client=s3)
+    path.write_bytes(b"zip bytes, changed")
+    assert upload_to_s3(str(path), "test-bucket", skip_unchanged=True, s3_client=s3)
+
+
+@moto.mock_s3
+def test_remote_artifact_matches_by_etag(tmp_path):
+    s3 = boto3.client("s3", region_name="us-east-1")
+    s3.create_bucket(Bucket="test-bucket")
+    path = tmp_path / "out.zip"
+    data = make_file(path, PART + 10)
+    assert not remote_artifact_matches(s3, "test-bucket", "out.zip", str(path))
+
+    # no raypack metadata, single part
+    s3.put_object(Bucket="test-bucket", Key="out.zip", Body=data)
+    assert remote_artifact_matches(s3, "test-bucket", "out.zip", str(path))
+
+    # no raypack metadata, multipart
+    uploader = StreamingUploader("test-bucket", "out.zip", part_size=PART, s3_client=s3)
+    uploader.start()
+    uploader.complete(str(path))
+    assert remote_artifact_matches(s3, "test-bucket", "out.zip", str(path), part_size=PART)
+    make_file(path, PART + 10)
+    assert not remote_artifact_matches(s3, "test-bucket", "out.zip", str(path), part_size=PART)
@@ -0,0 +1,104 @@
+import os
+import struct
+import zipfile
+
+import pytest
+
+from raypack.batch import JobSpec, build_batch, load_jobs, plan_layers
+from raypack.config_loading import Config
+from raypack.pyproject_interface import current_pyproject_toml
+from raypack.runtime_baseline import Distribution
+
+
+def install(site_packages, name, files, requires=()):
+    dist_info = f"{name}-1.0.dist-info"
+    os.makedirs(site_packages / dist_info, exist_ok=True)
+    metadata = [f"Name: {name}", "Version: 1.0", *(f"Requires-Dist: {requirement}" for requirement in requires)]
+    (site_packages / dist_info / "METADATA").write_text("\n".join(metadata) + "\n")
+    record = [*files, f"{dist_info}/METADATA", f"{dist_info}/RECORD"]
+    for path in files:
+        os.makedirs((site_packages / path).parent, exist_ok=True)
+        (site_packages / path).write_text(f"# {path}\n")
+    (site_packages / dist_info / "RECORD").write_text("".join(f"{path},,\n" for path in record))
+
+
+def test_plan_layers_shares_what_every_job_needs():
+    distributions = [
+        Distribution("pandas", "2.0", requires=["numpy"]),
+        Distribution("numpy", "1.26"),
+        Distribution("requests", "2.31", requires=["urllib3", "security_only"]),
+        Distribution("urllib3", "2.0"),
+    ]
+    jobs = [JobSpec("ingest", dependencies=["requests", "pandas"]), JobSpec("report", dependencies=["Pandas"])]
+    common, per_job = plan_layers(jobs, distributions)
+    assert common == {"pandas", "numpy"}
+    assert per_job == {"ingest": {"requests", "urllib3"}, "report": set()}
+
+
+def test_load_jobs_rejects_unknown_keys_and_reserved_name():
+    with pytest.raises(ValueError, match="dependancies"):
+        load_jobs({"ingest": {"dependancies": ["pandas"]}})
+    with pytest.raises(ValueError, match="common"):
+        load_jobs({"common": {}})
+    assert load_jobs({"b": {}, "a": {"glue_job_name": "a-prod"}})[0].job_name == "a-prod"
+
+
+def make_project(tmp_path):
+    (tmp_path / "pyproject.toml").write_text('[tool.poetry]\nname = "proj"\nversion = "0.1.0"\n')
+    os.makedirs("dist")
+    with zipfile.ZipFile("dist/proj-0.1.0-py3-none-any.whl", "w") as whl:
+        whl.writestr("proj/__init__.py", "")
+        whl.writestr("proj-0.1.0.dist-info/METADATA", "Name: proj\n")
+    os.makedirs("jobs/ingest")
+    (tmp_path / "jobs" / "ingest" / "main.py").write_text("import shared\n")
+    vendor = tmp_path / "vendor"
+    install(vendor, "shared", ["shared/__init__.py"])
+    install(vendor, "extra", ["extra/__init__.py", "extra/data.txt"], requires=["shared", "docs-only; extra == 'docs'"])
+
+
+def test_build_batch_writes_common_and_job_zips(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    # cached per path, and the path is relative
+    current_pyproject_toml.cache_clear()
+    make_project(tmp_path)
+    config = Config(
+        source_venv="vendor",
+        jobs={
+            "ingest": {"dependencies": ["extra"], "include": ["jobs/ingest/*.py"]},
+            "report": {"dependencies": ["shared"]},
+        },
+    )
+    result = build_batch(config)
+
+    with zipfile.ZipFile(result.common_zip) as zipf:
+        assert sorted(zipf.namelist()) == ["venv/proj/__init__.py", "venv/shared/__init__.py"]
+    with zipfile.ZipFile(result.job_zips["ingest"]) as zipf:
+        assert sorted(zipf.namelist()) == [
+            "venv_ingest/extra/__init__.py",
+            "venv_ingest/extra/data.txt",
+            "venv_ingest/jobs/ingest/main.py",
+        ]
+    with zipfile.ZipFile(result.job_zips["report"]) as zipf:
+        assert zipf.namelist() == []
+    assert result.py_modules("report")[0] == result.common_zip
+    assert os.path.basename(result.job_zips["ingest"]).startswith("proj-ingest-0.1.0-")
+    current_pyproject_toml.cache_clear()
+
+
+def test_build_batch_checks_binaries_and_rejects_unsupported_options(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    current_pyproject_toml.cache_clear()
+    make_project(tmp_path)
+    # a Windows extension module, it won't load on Glue
+    windows = b"MZ" + b"\0" * 58 + struct.pack("<I", 64) + b"PE\0\0" + struct.pack("<H", 0x8664) + b"\0" * 20
+    (tmp_path / "vendor" / "shared" / "_speedups.pyd").write_bytes(windows)
+    jobs = {"report": {"dependencies": ["shared"]}}
+
+    with pytest.raises(SystemExit):
+        build_batch(Config(source_venv="vendor", jobs=jobs))
+    assert not any(name.endswith(".zip") for name in os.listdir(tmp_path))
+
+    for option in ("from_wheels", "incremental"):
+        with pytest.raises(ValueError, match=option):
+            build_batch(Config(source_venv="vendor", jobs=jobs, **{option: True}))
+    current_pyproject_toml.cache_clear()
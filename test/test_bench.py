@@ -0,0 +1,67 @@
+import os
+import zipfile
+
+from raypack.bench import bench_artifact, compare, parse_importtime, regressions, top_level_packages
+
+
+def make_artifact(path: str, slow: bool = False) -> str:
+    with zipfile.ZipFile(path, "w") as zipf:
+        zipf.writestr("venv/fast/__init__.py", "from fast import helper\n")
+        zipf.writestr("venv/fast/helper.py", "import time; time.sleep(0.05)\n" if slow else "VALUE = 1\n")
+        zipf.writestr("venv/single.py", "VALUE = 2\n")
+        zipf.writestr("venv/broken/__init__.py", "import not_installed_anywhere\n")
+        zipf.writestr("venv/fast-1.0.dist-info/METADATA", "Name: fast\n")
+    return path
+
+
+def test_top_level_packages():
+    names = [
+        "venv/fast/__init__.py",
+        "venv/fast/helper.py",
+        "venv/single.py",
+        "venv/fast-1.0.dist-info/METADATA",
+        "venv/bin/tool",
+    ]
+    assert top_level_packages(names) == ["fast", "single"]
+    assert top_level_packages(["mod.py", "pkg/__init__.py"]) == ["mod", "pkg"]
+
+
+def test_parse_importtime_takes_top_level_line():
+    stderr = "\n".join(
+        [
+            "import time: self [us] | cumulative | imported package",
+            "import time:        20 |         20 |     fast.helper",
+            "import time:       100 |        120 |   fast.other",
+            "import time:        30 |        150 | fast",
+        ]
+    )
+    assert parse_importtime(stderr, "fast") == {"self_us": 30, "cumulative_us": 150, "modules_imported": 3}
+
+
+def test_bench_artifact_reports_imports_and_errors(tmp_path):
+    zip_path = make_artifact(str(tmp_path / "deps.zip"))
+    report = bench_artifact(zip_path)
+    assert report["files"] == 5
+    assert report["zip_bytes"] == os.path.getsize(zip_path)
+    assert set(report["packages"]) == {"broken", "fast", "single"}
+    assert report["errors"] == ["broken"]
+    assert "not_installed_anywhere" in report["packages"]["broken"]["error"]
+    assert report["packages"]["fast"]["cumulative_us"] > 0
+    assert report["packages"]["fast"]["modules_imported"] >= 2
+    assert report["max_peak_rss_kb"] > 0
+
+
+def test_bench_artifact_with_zipimport(tmp_path):
+    zip_path = make_artifact(str(tmp_path / "deps.zip"))
+    report = bench_artifact(zip_path, modules=["fast"], mode="zipimport")
+    assert report["errors"] == []
+    assert report["packages"]["fast"]["cumulative_us"] > 0
+
+
+def test_compare_flags_regressions(tmp_path):
+    before = bench_artifact(make_artifact(str(tmp_path / "before.zip")), modules=["fast"])
+    after = bench_artifact(make_artifact(str(tmp_path / "after.zip"), slow=True), modules=["fast"])
+    comparison = compare(before, after)
+    assert comparison["packages"]["fast"]["ratio"] > 1
+    assert "total_import_us" in regressions(comparison, 0.1)
+    assert regressions(compare(after, before), 0.1) == []
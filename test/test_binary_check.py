@@ -0,0 +1,110 @@
+import io
+import os
+import struct
+import zipfile
+
+from raypack import binary_check
+from raypack.binary_check import BinaryCache, cache_path_for, check_index, check_wheels, classify, format_report
+from raypack.scanner import scan_tree
+
+AARCH64 = 183
+X86_64 = 62
+
+
+def make_elf(machine=AARCH64, versions=("GLIBC_2.17",)):
+    """64-bit little endian ELF with just a string table and a version needs table."""
+    names = [b"libc.so.6", *(version.encode() for version in versions)]
+    strings = b"\0" + b"".join(name + b"\0" for name in names)
+    offsets = [strings.index(b"\0" + name + b"\0") + 1 for name in names]
+    verneed = struct.pack("<HHIII", 1, len(versions), offsets[0], 16, 0)
+    for number, offset in enumerate(offsets[1:]):
+        last = number == len(versions) - 1
+        verneed += struct.pack("<IHHII", 0, 0, number + 2, offset, 0 if last else 16)
+    strings_at = 64
+    verneed_at = strings_at + len(strings)
+    sections_at = verneed_at + len(verneed)
+    sections = b"\0" * 64
+    sections += struct.pack("<IIQQQQIIQQ", 0, 3, 0, 0, strings_at, len(strings), 0, 0, 1, 0)
+    sections += struct.pack("<IIQQQQIIQQ", 0, 0x6FFFFFFE, 0, 0, verneed_at, len(verneed), 1, 1, 8, 0)
+    header = b"\x7fELF" + bytes([2, 1, 1]) + b"\0" * 9
+    header += struct.pack("<HHIQQQIHHHHHH", 3, machine, 1, 0, 0, sections_at, 0, 64, 56, 0, 64, 3, 0)
+    return header + strings + verneed + sections
+
+
+def make_pe(machine=0x8664):
+    return b"MZ" + b"\0" * 58 + struct.pack("<I", 64) + b"PE\0\0" + struct.pack("<H", machine) + b"\0" * 20
+
+
+def test_classify_elf_reads_machine_and_newest_glibc():
+    info = classify(io.BytesIO(make_elf(AARCH64, ("GLIBC_2.17", "GLIBC_2.28", "GLIBC_2.4"))))
+    assert (info.format, info.machine, info.bits, info.glibc) == ("elf", "aarch64", 64, "2.28")
+    assert classify(io.BytesIO(make_elf(X86_64, ()))).glibc == ""
+
+
+def test_classify_other_formats():
+    assert classify(io.BytesIO(b"\xcf\xfa\xed\xfe" + struct.pack("<I", 0x0100000C) + b"\0" * 56)).machine == "arm64"
+    assert classify(io.BytesIO(make_pe())).machine == "x86_64"
+    # a Java class file shares the universal binary magic
+    assert classify(io.BytesIO(b"\xca\xfe\xba\xbe\x00\x00\x00\x34" + b"\0" * 56)) is None
+    assert classify(io.BytesIO(b"MZ is a fine way to start a text file" * 3)) is None
+    assert classify(io.BytesIO(b"#!/usr/bin/env python\n")) is None
+
+
+def test_check_index_reports_per_file(tmp_path):
+    (tmp_path / "good.so").write_bytes(make_elf(AARCH64, ("GLIBC_2.17",)))
+    (tmp_path / "x86.so").write_bytes(make_elf(X86_64))
+    (tmp_path / "new_glibc.so.1").write_bytes(make_elf(AARCH64, ("GLIBC_2.34",)))
+    (tmp_path / "tool").write_bytes(make_pe())
+    os.chmod(tmp_path / "tool", 0o700)
+    (tmp_path / "module.py").write_text("x = 1\n")
+    # not a candidate, so never read
+    (tmp_path / "data.bin").write_bytes(make_elf(X86_64))
+
+    binaries = {os.path.basename(binary.path): binary.problem for binary in check_index(scan_tree(str(tmp_path)), 4)}
+    assert binaries == {
+        "good.so": "",
+        "x86.so": "built for x86_64, not aarch64",
+        "new_glibc.so.1": "needs glibc 2.34, newer than 2.26",
+        "tool": "Windows binary (x86_64)",
+    }
+
+
+def test_cache_skips_unchanged_files(tmp_path, monkeypatch):
+    venv = tmp_path / "venv"
+    venv.mkdir()
+    (venv / "a.so").write_bytes(make_elf())
+    (venv / "b.so").write_bytes(make_elf())
+    (venv / "script").write_text("#!/bin/sh\n")
+    os.chmod(venv / "script", 0o700)
+    cache_path = cache_path_for(str(venv))
+    assert cache_path == str(tmp_path / "venv.binary-check.json")
+    hashed = []
+    monkeypatch.setattr(binary_check, "hash_file", lambda path: hashed.append(os.path.basename(path)) or "same")
+
+    cache = BinaryCache(cache_path)
+    check_index(scan_tree(str(venv)), 1, cache)
+    # same content, one lookup hits. The script has no binary magic, it isn't hashed
+    assert cache.hits == 1
+    assert sorted(hashed) == ["a.so", "b.so"]
+
+    cache = BinaryCache(cache_path)
+    binaries = check_index(scan_tree(str(venv)), 1, cache)
+    assert cache.hits == 3
+    assert len(hashed) == 2
+    assert [binary.info.machine for binary in binaries] == ["aarch64", "aarch64"]
+
+
+def test_check_wheels_uses_manylinux_tag(tmp_path):
+    wheel = tmp_path / "pkg-1.0-cp311-cp311-manylinux_2_28_aarch64.manylinux2014_aarch64.whl"
+    with zipfile.ZipFile(wheel, "w") as whl:
+        whl.writestr("pkg/_speedups.cpython-311-aarch64-linux-gnu.so", make_elf())
+        whl.writestr("pkg/__init__.py", "")
+        whl.writestr("pkg/_mac.dylib", b"\xcf\xfa\xed\xfe" + struct.pack("<I", 0x01000007) + b"\0" * 56)
+    binaries = check_wheels([str(wheel)], 2)
+    assert [(binary.info.glibc, binary.problem) for binary in binaries] == [
+        ("2.17", ""),
+        ("", "macOS binary (x86_64)"),
+    ]
+    report = format_report(binaries)
+    assert report.splitlines()[1].startswith("FAIL")
+    assert report.endswith("2 binaries, 1 won't load")
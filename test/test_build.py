@@ -0,0 +1,146 @@
+import os
+import zipfile
+
+from raypack.build import DEFAULT_EXCLUSIONS, zipup_own_module_from_wheel, zipup_virtualenv, zipup_wheels
+from raypack.compression import CompressionPolicy
+from raypack.config_loading import Config
+from raypack.manifest import BuildManifest, manifest_path_for
+from raypack.zip_utils import StableOffsetFile
+
+
+def make_venv(root):
+    package = root / "site-packages" / "example"
+    package.mkdir(parents=True)
+    (package / "__init__.py").write_text("VALUE = 1\n" * 100)
+    (package / "data.txt").write_text("some data\n" * 500)
+    (root / "site-packages" / "example-1.0.dist-info" / "licenses").mkdir(parents=True)
+    (root / "site-packages" / "example-1.0.dist-info" / "METADATA").write_text("Name: example")
+    (root / "site-packages" / "example-1.0.dist-info" / "licenses" / "LICENSE").write_text("MIT")
+    return str(root / "site-packages")
+
+
+def build(venv_path, output, manifest=None):
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as zipf:
+        count = zipup_virtualenv(Config(), [], "venv", venv_path, zipf, manifest=manifest)
+    return count
+
+
+def test_zipup_virtualenv_skips_dist_info(tmp_path):
+    venv_path = make_venv(tmp_path / "vendor")
+    output = str(tmp_path / "out.zip")
+    assert build(venv_path, output) == 2
+    with zipfile.ZipFile(output) as zipf:
+        assert sorted(zipf.namelist()) == ["venv/example/__init__.py", "venv/example/data.txt"]
+
+
+def test_incremental_build_is_byte_identical(tmp_path):
+    venv_path = make_venv(tmp_path / "vendor")
+    incremental = str(tmp_path / "incremental.zip")
+    full = str(tmp_path / "full.zip")
+
+    manifest = BuildManifest.load(manifest_path_for(incremental), incremental)
+    build(venv_path, incremental, manifest)
+    manifest.save(manifest_path_for(incremental))
+    assert manifest.compressed == 2
+
+    # change one file, touch the other without changing it
+    changed = os.path.join(venv_path, "example", "__init__.py")
+    with open(changed, "a", encoding="utf-8") as file:
+        file.write("VALUE = 2\n")
+    untouched = os.path.join(venv_path, "example", "data.txt")
+    stat = os.stat(untouched)
+    os.utime(untouched, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    manifest = BuildManifest.load(manifest_path_for(incremental), incremental)
+    build(venv_path, incremental + ".partial", manifest)
+    manifest.close()
+    assert manifest.reused == 1
+    assert manifest.compressed == 1
+
+    build(venv_path, full)
+    with open(incremental + ".partial", "rb") as left, open(full, "rb") as right:
+        assert left.read() == right.read()
+
+
+def test_stable_offset_file_reports_finished_members(tmp_path):
+    venv_path = make_venv(tmp_path / "vendor")
+    reported = []
+    sink = StableOffsetFile(str(tmp_path / "out.zip"), lambda path, size: reported.append(size))
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED) as zipf:
+        zipup_virtualenv(Config(pack_jobs=1), [], "venv", venv_path, zipf)
+        offsets = [info.header_offset for info in zipf.infolist()]
+    sink.close()
+
+    assert reported == sorted(reported)
+    # second member starts where the first one became final
+    assert offsets[1] in reported
+    assert reported[-1] == os.path.getsize(tmp_path / "out.zip")
+
+
+def make_wheel(path):
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as whl:
+        whl.writestr("example/__init__.py", "VALUE = 1\n" * 1000)
+        whl.writestr("example/lib.so", b"\x7fELF" + bytes(5000), zipfile.ZIP_STORED)
+        whl.writestr("example-1.0.dist-info/METADATA", "Name: example")
+    return str(path)
+
+
+def test_wheel_members_copied_without_recompressing(tmp_path):
+    wheel = make_wheel(tmp_path / "example-1.0-py3-none-any.whl")
+    output = str(tmp_path / "out.zip")
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as new_zip:
+        policy = CompressionPolicy.from_config("deflate", None, {})
+        assert zipup_own_module_from_wheel(wheel, "venv", new_zip, policy) == 2
+
+    with zipfile.ZipFile(wheel) as whl, zipfile.ZipFile(output) as zipf:
+        assert zipf.namelist() == ["venv/example/__init__.py", "venv/example/lib.so"]
+        assert zipf.testzip() is None
+        for name in ["example/__init__.py", "example/lib.so"]:
+            source, copied = whl.getinfo(name), zipf.getinfo(f"venv/{name}")
+            assert (copied.CRC, copied.compress_type, copied.compress_size) == (
+                source.CRC,
+                source.compress_type,
+                source.compress_size,
+            )
+            assert zipf.read(f"venv/{name}") == whl.read(name)
+
+
+def test_wheel_members_recompressed_when_policy_differs(tmp_path):
+    wheel = make_wheel(tmp_path / "example-1.0-py3-none-any.whl")
+    output = str(tmp_path / "out.zip")
+    policy = CompressionPolicy(zipfile.ZIP_STORED, overrides={".so": (zipfile.ZIP_DEFLATED, 9)})
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_STORED) as new_zip:
+        zipup_own_module_from_wheel(wheel, "venv", new_zip, policy)
+
+    with zipfile.ZipFile(wheel) as whl, zipfile.ZipFile(output) as zipf:
+        assert zipf.testzip() is None
+        assert zipf.getinfo("venv/example/__init__.py").compress_type == zipfile.ZIP_STORED
+        assert zipf.getinfo("venv/example/lib.so").compress_type == zipfile.ZIP_DEFLATED
+        assert zipf.read("venv/example/lib.so") == whl.read("example/lib.so")
+
+
+def test_zipup_wheels_matches_installed_layout(tmp_path):
+    wheel = make_wheel(tmp_path / "example-1.0-py3-none-any.whl")
+    with zipfile.ZipFile(wheel, "a") as whl:
+        whl.writestr("example-1.0.data/purelib/example_extra.py", "EXTRA = 1")
+        whl.writestr("example-1.0.data/scripts/example", "#!/bin/sh")
+        whl.writestr("pip/__init__.py", "")
+        whl.writestr("example.pth", "")
+    other = tmp_path / "other-1.0-py3-none-any.whl"
+    with zipfile.ZipFile(other, "w") as whl:
+        whl.writestr("example/__init__.py", "duplicate")
+        whl.writestr("other.py", "")
+
+    output = str(tmp_path / "out.zip")
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as zipf:
+        count = zipup_wheels(Config(), DEFAULT_EXCLUSIONS, "venv", [wheel, str(other)], zipf)
+
+    with zipfile.ZipFile(output) as zipf:
+        assert sorted(zipf.namelist()) == [
+            "venv/example/__init__.py",
+            "venv/example/lib.so",
+            "venv/example_extra.py",
+            "venv/other.py",
+        ]
+        assert count == 4
+        assert zipf.read("venv/example/__init__.py") == b"VALUE = 1\n" * 1000
@@ -0,0 +1,74 @@
+import os
+import subprocess
+import sys
+import zipfile
+
+import pytest
+
+from raypack.build import collect_virtualenv_files
+from raypack.bytecode import cache_tag, find_target_python, precompile
+from raypack.config_loading import Config
+from raypack.packing import pack_files
+from raypack.scanner import scan_tree
+
+TAG = sys.implementation.cache_tag
+
+
+def make_site_packages(root):
+    (root / "pkg").mkdir(parents=True)
+    (root / "pkg" / "__init__.py").write_text("from pkg.core import VALUE\n")
+    (root / "pkg" / "core.py").write_text("VALUE = 42\n")
+    (root / "pkg" / "py2_only.py").write_text("print 'hello'\n")
+    return str(root)
+
+
+def build(site_packages, mode, tmp_path):
+    index = precompile(scan_tree(site_packages), mode, stage_dir=str(tmp_path / "stage"))
+    files = collect_virtualenv_files(Config(deterministic=True), ["__pycache__"], "venv", site_packages, index)
+    output = str(tmp_path / f"{mode}.zip")
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as zipf:
+        pack_files(zipf, files)
+    return output
+
+
+def test_find_target_python():
+    assert find_target_python("") == sys.executable
+    assert cache_tag(sys.executable) == TAG
+    with pytest.raises(ValueError, match="does not exist"):
+        find_target_python("/no/such/python")
+
+
+def test_sourceless_imports_with_zipimport(tmp_path):
+    output = build(make_site_packages(tmp_path / "site-packages"), "sourceless", tmp_path)
+    with zipfile.ZipFile(output) as zipf:
+        assert zipf.namelist() == ["venv/pkg/__init__.pyc", "venv/pkg/core.pyc", "venv/pkg/py2_only.py"]
+    result = subprocess.run(
+        [sys.executable, "-c", f"import sys; sys.path.insert(0, {output + '/venv'!r}); import pkg; print(pkg.VALUE)"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert result.stdout.strip() == "42"
+
+
+def test_alongside_adds_pycache(tmp_path):
+    output = build(make_site_packages(tmp_path / "site-packages"), "alongside", tmp_path)
+    with zipfile.ZipFile(output) as zipf:
+        assert zipf.namelist() == [
+            "venv/pkg/__init__.py",
+            f"venv/pkg/__pycache__/__init__.{TAG}.pyc",
+            f"venv/pkg/__pycache__/core.{TAG}.pyc",
+            "venv/pkg/core.py",
+            "venv/pkg/py2_only.py",
+        ]
+
+
+def test_compiled_files_are_reused(tmp_path):
+    site_packages = make_site_packages(tmp_path / "site-packages")
+    stage = str(tmp_path / "stage")
+    first = precompile(scan_tree(site_packages), "sourceless", stage_dir=stage)
+    pyc = os.path.join(stage, TAG, "pkg", "core.pyc")
+    mtime = os.stat(pyc).st_mtime_ns
+    second = precompile(scan_tree(site_packages), "sourceless", stage_dir=stage)
+    assert os.stat(pyc).st_mtime_ns == mtime
+    assert [entry.relpath for entry in first.files] == [entry.relpath for entry in second.files]
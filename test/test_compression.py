@@ -0,0 +1,42 @@
+import zipfile
+
+import pytest
+
+from raypack.compression import CompressionPolicy, compression_report, parse_policy
+from raypack.packing import pack_files
+
+
+def test_parse_policy():
+    assert parse_policy("deflate:9") == (zipfile.ZIP_DEFLATED, 9)
+    assert parse_policy("stored") == (zipfile.ZIP_STORED, None)
+    with pytest.raises(ValueError, match="Unknown compression"):
+        parse_policy("zstd")
+
+
+def test_overrides_pick_longest_extension():
+    policy = CompressionPolicy.from_config("deflate", 6, {".py": "deflate:9", ".tar.gz": "lzma"})
+    assert policy.for_file("venv/a/module.py") == (zipfile.ZIP_DEFLATED, 9)
+    assert policy.for_file("venv/a/_speedups.SO") == (zipfile.ZIP_STORED, None)
+    assert policy.for_file("venv/a/data.tar.gz") == (zipfile.ZIP_LZMA, None)
+    assert policy.for_file("venv/a/README") == (zipfile.ZIP_DEFLATED, 6)
+
+
+def test_policy_applied_per_file(tmp_path):
+    (tmp_path / "module.py").write_text("x = 1\n" * 1000)
+    (tmp_path / "lib.so").write_bytes(b"\0" * 1000)
+    files = [(str(tmp_path / "module.py"), "venv/module.py"), (str(tmp_path / "lib.so"), "venv/lib.so")]
+    policy = CompressionPolicy.from_config("deflate:9", None, {})
+    output = tmp_path / "out.zip"
+    with zipfile.ZipFile(output, "w") as zipf:
+        pack_files(zipf, files, jobs=2, policy=policy)
+    with zipfile.ZipFile(output) as zipf:
+        assert zipf.getinfo("venv/module.py").compress_type == zipfile.ZIP_DEFLATED
+        assert zipf.getinfo("venv/lib.so").compress_type == zipfile.ZIP_STORED
+
+
+def test_compression_report(tmp_path):
+    (tmp_path / "module.py").write_text("x = 1\n" * 1000)
+    results = compression_report([(str(tmp_path / "module.py"), "venv/module.py")], ["stored", "deflate:9"])
+    assert [row["policy"] for row in results] == ["stored", "deflate:9"]
+    assert results[0]["compressed_bytes"] == 6000
+    assert results[1]["compressed_bytes"] < 6000
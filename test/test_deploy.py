@@ -0,0 +1,111 @@
+import os
+import time
+import zipfile
+
+import boto3
+import moto
+
+from raypack import deploy
+from raypack.aws_interface import StreamingUploader
+from raypack.batch import BatchResult
+from raypack.config_loading import Config
+from raypack.deploy import build_and_deploy, build_and_deploy_batch
+from raypack.pyproject_interface import current_pyproject_toml
+
+PART = 5 * 1024 * 1024
+
+
+def make_project(root):
+    (root / "pyproject.toml").write_text('[tool.poetry]\nname = "proj"\nversion = "0.1.0"\n')
+    os.makedirs(root / "dist")
+    with zipfile.ZipFile(root / "dist" / "proj-0.1.0-py3-none-any.whl", "w") as whl:
+        whl.writestr("proj/__init__.py", "")
+    os.makedirs(root / "vendor" / "big")
+    # incompressible, so the zip spans several parts
+    for name in ("a.bin", "b.bin", "c.bin"):
+        (root / "vendor" / "big" / name).write_bytes(os.urandom(PART // 2 + 1))
+
+
+@moto.mock_s3
+def test_streaming_incremental_build_uploads_before_rename(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    current_pyproject_toml.cache_clear()
+    make_project(tmp_path)
+    boto3.client("s3").create_bucket(Bucket="test-bucket")
+    upload_part = StreamingUploader._upload_part
+
+    def slow_upload_part(self, *args):
+        # still queued when the build finishes
+        time.sleep(0.5)
+        upload_part(self, *args)
+
+    monkeypatch.setattr(StreamingUploader, "_upload_part", slow_upload_part)
+    config = Config(
+        source_venv="vendor",
+        s3_bucket_name="test-bucket",
+        binary_check="off",
+        incremental=True,
+        streaming_upload=True,
+        upload_part_size_mb=5,
+        upload_state_file="",
+        skip_unchanged_upload=False,
+    )
+    output_zip_name = build_and_deploy(config)
+
+    body = boto3.client("s3").get_object(Bucket="test-bucket", Key=os.path.basename(output_zip_name))["Body"].read()
+    with open(output_zip_name, "rb") as file:
+        assert body == file.read()
+    assert not os.path.exists(f"{output_zip_name}.partial")
+    current_pyproject_toml.cache_clear()
+
+
+@moto.mock_s3
+def test_streaming_skips_unchanged_without_sending_parts(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    current_pyproject_toml.cache_clear()
+    make_project(tmp_path)
+    s3 = boto3.client("s3")
+    s3.create_bucket(Bucket="test-bucket")
+    config = Config(
+        source_venv="vendor",
+        s3_bucket_name="test-bucket",
+        binary_check="off",
+        deterministic=True,
+        streaming_upload=True,
+        upload_part_size_mb=5,
+        upload_state_file="",
+    )
+    started = []
+    start = StreamingUploader.start
+    monkeypatch.setattr(StreamingUploader, "start", lambda self: started.append(self.key) or start(self))
+    key = os.path.basename(build_and_deploy(config))
+    assert started == [key]
+    uploaded = s3.head_object(Bucket="test-bucket", Key=key)["LastModified"]
+
+    # the bucket has it now, the second build is compared before anything is sent
+    build_and_deploy(config)
+    assert started == [key]
+    assert s3.head_object(Bucket="test-bucket", Key=key)["LastModified"] == uploaded
+    current_pyproject_toml.cache_clear()
+
+
+def test_batch_uploads_share_one_client(tmp_path, monkeypatch):
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    for name in ("common", "a", "b"):
+        (tmp_path / f"{name}.zip").write_bytes(b"zip")
+    result = BatchResult(str(tmp_path / "common.zip"), {"a": str(tmp_path / "a.zip"), "b": str(tmp_path / "b.zip")})
+    monkeypatch.setattr(deploy, "build_batch", lambda _config: result)
+    clients = []
+
+    def upload(*_args, s3_client, **_kwargs):
+        clients.append(s3_client)
+        return True
+
+    monkeypatch.setattr(deploy, "upload_to_s3", upload)
+    config = Config(s3_bucket_name="test-bucket", upload_to_s3=True, upload_concurrency=3, jobs={"a": {}, "b": {}})
+    monkeypatch.setattr(deploy, "deploy_to_jobs", lambda *_args: True)
+    assert build_and_deploy_batch(config) is result
+    assert len(clients) == 3
+    assert len({id(client) for client in clients}) == 1
@@ -0,0 +1,130 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from raypack.glue_interface import JobTarget, glue_client, job_update_from, update_jobs
+
+
+class FakeGlue(BaseHTTPRequestHandler):
+    """Just enough of the Glue JSON API: GetJob and UpdateJob, with optional throttling."""
+
+    jobs: dict = {}
+    updates: list = []
+    throttle = 0
+    in_flight = 0
+    max_in_flight = 0
+    lock = threading.Lock()
+
+    def do_POST(self):  # noqa: N802
+        operation = self.headers["X-Amz-Target"].split(".")[-1]
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])) or b"{}")
+        cls = type(self)
+        with cls.lock:
+            throttled = cls.throttle > 0
+            cls.throttle -= throttled
+            cls.in_flight += 1
+            cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+        try:
+            time.sleep(0.05)
+            if throttled:
+                return self.reply(400, {"__type": "ThrottlingException", "message": "Rate exceeded"})
+            job = cls.jobs.get(body["JobName"])
+            if job is None:
+                return self.reply(400, {"__type": "EntityNotFoundException", "message": "no such job"})
+            if operation == "GetJob":
+                return self.reply(200, {"Job": job})
+            with cls.lock:
+                cls.updates.append((body["JobName"], body["JobUpdate"]))
+                job.update(body["JobUpdate"])
+            return self.reply(200, {"JobName": body["JobName"]})
+        finally:
+            with cls.lock:
+                cls.in_flight -= 1
+
+    def reply(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/x-amz-json-1.1")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def make_job(name, modules="s3://bucket/old.zip"):
+    return {
+        "Name": name,
+        "Role": "arn:aws:iam::123456789012:role/glue",
+        "CreatedOn": 1700000000,
+        "Command": {"Name": "glueray", "ScriptLocation": "s3://bucket/main.py", "Runtime": "Ray2.4"},
+        "DefaultArguments": {"--s3-py-modules": modules},
+        "WorkerType": "Z.2X",
+        "NumberOfWorkers": 5,
+        "AllocatedCapacity": 10,
+        "MaxCapacity": 10.0,
+        "GlueVersion": "4.0",
+    }
+
+
+@pytest.fixture
+def glue():
+    FakeGlue.jobs = {}
+    FakeGlue.updates = []
+    FakeGlue.throttle = 0
+    FakeGlue.max_in_flight = 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeGlue)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+def client_for(endpoint, concurrency=8):
+    # the fake server checks no credentials, these only keep botocore from looking for real ones
+    return glue_client(
+        concurrency,
+        endpoint,
+        region_name="us-east-1",
+        aws_access_key_id="test",
+        aws_secret_access_key="test",  # noqa: S106
+    )
+
+
+def test_job_update_drops_read_only_and_conflicting_fields(glue):
+    update = job_update_from(make_job("a"), client_for(glue))
+    assert "Name" not in update and "CreatedOn" not in update
+    assert "AllocatedCapacity" not in update and "MaxCapacity" not in update
+    assert update["WorkerType"] == "Z.2X"
+
+
+def test_updates_changed_jobs_and_skips_matching_ones(glue):
+    new = "s3://bucket/common.zip,s3://bucket/job.zip"
+    FakeGlue.jobs = {"stale": make_job("stale"), "current": make_job("current", new)}
+    targets = [JobTarget("stale", new.split(",")), JobTarget("current", new.split(",")), JobTarget("missing", ["x"])]
+    results = update_jobs(targets, client=client_for(glue))
+    assert [result.status for result in results] == ["updated", "unchanged", "failed"]
+    assert "EntityNotFoundException" in results[2].error
+    assert [name for name, _update in FakeGlue.updates] == ["stale"]
+    assert FakeGlue.jobs["stale"]["DefaultArguments"]["--s3-py-modules"] == new
+
+
+def test_concurrency_is_bounded(glue):
+    FakeGlue.jobs = {f"job{number}": make_job(f"job{number}") for number in range(20)}
+    results = update_jobs([JobTarget(name, ["s3://bucket/new.zip"]) for name in FakeGlue.jobs], 4, client_for(glue, 4))
+    assert {result.status for result in results} == {"updated"}
+    assert 1 < FakeGlue.max_in_flight <= 4
+
+
+def test_throttling_is_retried(glue):
+    FakeGlue.jobs = {"a": make_job("a"), "b": make_job("b")}
+    FakeGlue.throttle = 2
+    results = update_jobs(
+        [JobTarget("a", ["s3://bucket/new.zip"]), JobTarget("b", ["s3://bucket/new.zip"])], 2, client_for(glue, 2)
+    )
+    assert [result.status for result in results] == ["updated", "updated"]
+    assert FakeGlue.throttle == 0
@@ -0,0 +1,83 @@
+import os
+
+from raypack.import_graph import ImportGraph, imports_of, module_name_for, resolve_relative, shake_tree
+from raypack.scanner import scan_tree
+
+
+def write(root, files):
+    for path, content in files.items():
+        (root / path).parent.mkdir(parents=True, exist_ok=True)
+        (root / path).write_text(content)
+
+
+def test_module_name_for():
+    assert module_name_for("pkg/__init__.py") == "pkg"
+    assert module_name_for(os.path.join("pkg", "sub", "mod.py")) == "pkg.sub.mod"
+    assert module_name_for("pkg/_speedups.cpython-311-aarch64-linux-gnu.so") == "pkg._speedups"
+    assert module_name_for("pkg/data.json") is None
+    assert module_name_for("pkg-1.0.dist-info/entry.py") is None
+
+
+def test_imports_of_resolves_relative_and_dynamic_imports():
+    source = b"""
+import json, pkg.a
+from . import sibling
+from ..up import thing
+from pkg.b import helper
+importlib.import_module("pkg.plugins.x")
+"""
+    assert imports_of(source, "pkg.sub.mod", False) == {
+        "json",
+        "pkg.a",
+        "pkg.sub",
+        "pkg.sub.sibling",
+        "pkg.up",
+        "pkg.up.thing",
+        "pkg.b",
+        "pkg.b.helper",
+        "pkg.plugins.x",
+    }
+    assert resolve_relative("pkg", True, 1, "core") == "pkg.core"
+    assert resolve_relative("pkg", True, 3, "core") is None
+
+
+def test_reachability_and_pruning(tmp_path):
+    write(
+        tmp_path,
+        {
+            "pkg/__init__.py": "from .core import run\n",
+            "pkg/core.py": "import pkg.util\n",
+            "pkg/util.py": "x = 1\n",
+            "pkg/unused.py": "y = 2\n",
+            "pkg/tests/__init__.py": "",
+            "pkg/tests/test_core.py": "import pytest\n" * 100,
+            "pkg/docs/index.rst": "docs",
+            "pkg/testing/__init__.py": "helpers = 1\n",
+            "pkg/examples/demo.py": "import pkg\n",
+            "plugin/__init__.py": "",
+            "plugin/tests/test_plugin.py": "",
+            "other/__init__.py": "",
+        },
+    )
+    index = scan_tree(str(tmp_path))
+    roots = {"job.py": b"import pkg\nfrom pkg import testing\n"}
+
+    graph = ImportGraph.from_index(index)
+    graph.walk(roots, ["plugin"])
+    assert graph.reachable == {"pkg", "pkg.core", "pkg.util", "pkg.testing", "plugin", "plugin.tests.test_plugin"}
+    rows = {row.package: row for row in graph.report()}
+    assert rows["pkg"].reachable_modules == 4
+    assert rows["other"].fraction == 0.0
+
+    pruned, _graph = shake_tree(index, roots, ["plugin"], prune=True)
+    kept = sorted(entry.relpath.replace(os.sep, "/") for entry in pruned.files)
+    assert kept == [
+        "other/__init__.py",
+        "pkg/__init__.py",
+        "pkg/core.py",
+        "pkg/testing/__init__.py",
+        "pkg/unused.py",
+        "pkg/util.py",
+        "plugin/__init__.py",
+        "plugin/tests/test_plugin.py",
+    ]
@@ -0,0 +1,37 @@
+import json
+import struct
+import zipfile
+
+from raypack.inspect_zip import format_inspection, inspect_zip, run_inspect
+
+
+def make_elf_header(machine):
+    header = b"\x7fELF" + bytes([2, 1, 1]) + b"\0" * 9
+    return header + struct.pack("<HHIQQQIHHHHHH", 3, machine, 1, 0, 0, 0, 0, 64, 56, 0, 64, 0, 0)
+
+
+def test_inspect_zip_sizes_and_binaries(tmp_path):
+    zip_path = tmp_path / "deps.zip"
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zipf:
+        zipf.writestr("venv/pkg/__init__.py", "x = 1\n" * 100)
+        zipf.writestr("venv/pkg/_speedups.so", make_elf_header(183), zipfile.ZIP_STORED)
+        zipf.writestr("venv/single.py", "y = 2\n")
+        zipf.writestr("venv/other/_x86.so", make_elf_header(62))
+
+    report = inspect_zip(str(zip_path))
+    assert report["outer_folder"] == "venv"
+    assert report["files"] == 4
+    assert report["compression"] == {"deflate": 3, "stored": 1}
+    assert report["top_level"]["pkg"]["files"] == 2
+    assert report["top_level"]["pkg"]["bytes"] == 600 + 64
+    assert [(binary["path"], binary["problem"]) for binary in report["binaries"]] == [
+        ("venv/pkg/_speedups.so", ""),
+        ("venv/other/_x86.so", "built for x86_64, not aarch64"),
+    ]
+    text = format_inspection(report, top=1)
+    assert "... and 2 more" in text
+    assert "FAIL" in text
+
+    json_path = tmp_path / "report.json"
+    assert run_inspect(str(zip_path), str(json_path)) == 1
+    assert json.loads(json_path.read_text())["files"] == 4
@@ -0,0 +1,126 @@
+import os
+
+from raypack import build, poetry_interface
+from raypack.config_loading import Config
+from raypack.lock_fingerprint import (
+    LockFingerprint,
+    current_fingerprint,
+    fingerprint_path,
+    locked_packages,
+    plan_install,
+)
+
+POETRY_LOCK = """
+[[package]]
+name = "Requests"
+version = "2.31.0"
+files = [{file = "requests-2.31.0-py3-none-any.whl", hash = "sha256:aa"}]
+
+[[package]]
+name = "urllib3"
+version = "2.0.7"
+files = [{file = "urllib3-2.0.7-py3-none-any.whl", hash = "sha256:bb"}]
+
+[metadata]
+lock-version = "2.0"
+content-hash = "cc"
+"""
+
+UV_LOCK = """
+version = 1
+
+[[package]]
+name = "my-project"
+version = "0.1.0"
+source = { editable = "." }
+
+[[package]]
+name = "attrs"
+version = "23.1.0"
+source = { registry = "https://pypi.org/simple" }
+"""
+
+
+def test_locked_packages_hashes_each_entry(tmp_path):
+    lockfile = tmp_path / "poetry.lock"
+    lockfile.write_text(POETRY_LOCK)
+    before = locked_packages(str(lockfile))
+    assert set(before) == {"requests", "urllib3"}
+
+    # the content hash changes with any edit, the other entries don't
+    lockfile.write_text(POETRY_LOCK.replace("2.0.7", "2.1.0").replace('"cc"', '"dd"'))
+    after = locked_packages(str(lockfile))
+    assert after["requests"] == before["requests"]
+    assert after["urllib3"] != before["urllib3"]
+
+    (tmp_path / "uv.lock").write_text(UV_LOCK)
+    assert list(locked_packages(str(tmp_path / "uv.lock"))) == ["attrs"]
+
+
+def test_plan_install(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "poetry.lock").write_text(POETRY_LOCK)
+    current = current_fingerprint("poetry", "manylinux2014_aarch64")
+    assert current is not None
+    assert current_fingerprint("uv", "manylinux2014_aarch64") is None
+
+    assert plan_install("vendor", current).action == "full"
+    os.makedirs("vendor")
+    assert plan_install("vendor", None).action == "skip"
+    # a vendor folder nobody fingerprinted may be stale
+    assert plan_install("vendor", current).action == "full"
+
+    current.save(fingerprint_path("vendor"))
+    assert plan_install("vendor", current).action == "skip"
+
+    (tmp_path / "poetry.lock").write_text(POETRY_LOCK.replace("2.0.7", "2.1.0").replace("Requests", "httpx"))
+    plan = plan_install("vendor", current_fingerprint("poetry", "manylinux2014_aarch64"))
+    assert (plan.action, plan.changed, plan.removed) == ("partial", ["httpx", "urllib3"], ["requests"])
+
+    other_platform = LockFingerprint(current.lockfile, "linux_x86_64", current.python, current.packages)
+    assert plan_install("vendor", other_platform).action == "full"
+
+
+def test_install_dependencies_follows_the_plan(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "poetry.lock").write_text(POETRY_LOCK)
+    calls = []
+
+    def create(*_args):
+        os.makedirs("vendor/installed", exist_ok=True)
+        calls.append("full")
+
+    monkeypatch.setattr(poetry_interface, "create_native_arm64_venv", create)
+    monkeypatch.setattr(poetry_interface, "reinstall_packages", lambda _venv, changed, *_: calls.append(changed))
+    config = Config(source_venv="vendor")
+
+    build.install_dependencies(config, "vendor")
+    build.install_dependencies(config, "vendor")
+    assert calls == ["full"]
+
+    (tmp_path / "poetry.lock").write_text(POETRY_LOCK.replace("2.0.7", "2.1.0"))
+    build.install_dependencies(config, "vendor")
+    build.install_dependencies(config, "vendor")
+    assert calls == ["full", ["urllib3"]]
+
+    # without a fingerprint the folder is installed into again, but not removed
+    os.remove(fingerprint_path("vendor"))
+    os.makedirs("vendor/leftover")
+    build.install_dependencies(config, "vendor")
+    assert calls == ["full", ["urllib3"], "full"]
+    assert os.path.exists("vendor/leftover")
+    assert os.path.exists(fingerprint_path("vendor"))
+
+    # one raypack fingerprinted for another platform is installed from scratch
+    other_platform = LockFingerprint.load(fingerprint_path("vendor"))
+    assert other_platform is not None
+    LockFingerprint(other_platform.lockfile, "linux_x86_64", other_platform.python, other_platform.packages).save(
+        fingerprint_path("vendor")
+    )
+    build.install_dependencies(config, "vendor")
+    assert calls == ["full", ["urllib3"], "full", "full"]
+    assert not os.path.exists("vendor/leftover")
+
+    os.remove(fingerprint_path("vendor"))
+    build.install_dependencies(Config(source_venv="vendor", skip_unchanged_install=False), "vendor")
+    assert len(calls) == 4
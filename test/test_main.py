@@ -1,9 +1,14 @@
+import os
 import platform
+import subprocess
 import sys
 
 # A namedtuple to simulate sys.version_info
 from collections import namedtuple
 
+import pytest
+
+from raypack.__main__ import make_parser
 from raypack.build import create_filename
 
 VersionInfo = namedtuple("VersionInfo", ["major", "minor"])
@@ -38,4 +43,49 @@ def test_create_filename_linux(monkeypatch):
     assert filename == expected_filename
 
 
+def test_build_options_work_with_and_without_the_command():
+    parser = make_parser()
+    assert parser.parse_args(["--jobs", "4"]).pack_jobs == 4
+    assert parser.parse_args(["build", "--jobs", "4"]).pack_jobs == 4
+    # the build subcommand's defaults don't undo options given before it
+    args = parser.parse_args(["--jobs", "4", "--incremental", "build"])
+    assert (args.command, args.pack_jobs, args.incremental, args.source_venv) == ("build", 4, True, "vendor")
+    assert parser.parse_args(["inspect", "deps.zip"]).zip == "deps.zip"
+
+
+# modules a bare `raypack --help` must not pull in
+HEAVY_MODULES = {
+    "boto3",
+    "botocore",
+    "toml",
+    "zipfile",
+    "poetry",
+    "raypack.build",
+    "raypack.deploy",
+    "raypack.config_loading",
+}
+
+# imported beyond a bare interpreter: argparse, runpy and what they need
+MODULE_BUDGET = 40
+
+
+# python -m raypack finds the package from here
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def imported_modules(*args):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *args], capture_output=True, text=True, check=True, cwd=PROJECT_ROOT
+    )
+    return {line.rsplit("|", 1)[-1].strip() for line in result.stderr.splitlines() if line.startswith("import time:")}
+
+
+@pytest.mark.parametrize("flag", ["--help", "--version"])
+def test_startup_budget(flag):
+    imported = imported_modules("-m", "raypack", flag) - imported_modules("-c", "pass")
+    assert not {name for name in imported if name in HEAVY_MODULES or name.split(".")[0] in HEAVY_MODULES}
+    assert {name for name in imported if name.startswith("raypack")} == {"raypack"}
+    assert len(imported) <= MODULE_BUDGET
+
+
 # Add more tests as needed, particularly for edge cases or other OS and versions.
@@ -0,0 +1,104 @@
+import os
+import subprocess
+import sys
+import zipfile
+
+import pytest
+
+from raypack.manifest import BuildManifest, hash_file
+from raypack.packing import pack_files
+
+
+def make_files(root):
+    files = []
+    for index in range(20):
+        path = root / f"module_{index}.py"
+        # one file bigger than a read chunk
+        lines = 400_000 if index == 7 else index * 100
+        path.write_bytes(os.urandom(1024) + b"x = 1\n" * lines)
+        files.append((str(path), f"venv/module_{index}.py"))
+    return files
+
+
+@pytest.mark.parametrize("compression", [zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED, zipfile.ZIP_BZIP2, zipfile.ZIP_LZMA])
+def test_parallel_matches_serial(tmp_path, compression):
+    files = make_files(tmp_path)
+    serial = tmp_path / "serial.zip"
+    parallel = tmp_path / "parallel.zip"
+    with zipfile.ZipFile(serial, "w", compression) as zipf:
+        assert pack_files(zipf, files, jobs=1) == 20
+    with zipfile.ZipFile(parallel, "w", compression) as zipf:
+        assert pack_files(zipf, files, jobs=4) == 20
+
+    assert serial.read_bytes() == parallel.read_bytes()
+    with zipfile.ZipFile(parallel) as zipf:
+        assert zipf.testzip() is None
+
+
+def test_large_files_are_streamed_and_match_serial(tmp_path):
+    files = make_files(tmp_path)
+    serial = tmp_path / "serial.zip"
+    streamed = tmp_path / "streamed.zip"
+    with zipfile.ZipFile(serial, "w", zipfile.ZIP_DEFLATED) as zipf:
+        pack_files(zipf, files, jobs=1)
+    # module_7 is over the per worker share and gets streamed by the writer
+    with zipfile.ZipFile(streamed, "w", zipfile.ZIP_DEFLATED) as zipf:
+        pack_files(zipf, files, jobs=2, max_memory=4 * 1024 * 1024)
+    assert serial.read_bytes() == streamed.read_bytes()
+
+
+def test_large_files_are_streamed_with_manifest(tmp_path):
+    files = make_files(tmp_path)
+    first = tmp_path / "first.zip"
+    second = tmp_path / "second.zip"
+    manifest = BuildManifest()
+    with zipfile.ZipFile(first, "w", zipfile.ZIP_DEFLATED) as zipf:
+        pack_files(zipf, files, jobs=2, manifest=manifest, max_memory=4 * 1024 * 1024)
+    assert manifest.compressed == 20
+    manifest.save(str(tmp_path / "manifest.json"))
+
+    manifest = BuildManifest.load(str(tmp_path / "manifest.json"), str(first))
+    with zipfile.ZipFile(second, "w", zipfile.ZIP_DEFLATED) as zipf:
+        pack_files(zipf, files, jobs=2, manifest=manifest, max_memory=4 * 1024 * 1024)
+    manifest.close()
+    assert manifest.reused == 20
+    assert first.read_bytes() == second.read_bytes()
+    assert manifest.entries["venv/module_7.py"].sha256 == hash_file(files[7][0])
+
+
+PACK_SPARSE = """
+import resource, sys, zipfile
+from raypack.packing import pack_files
+files = [(sys.argv[1], "venv/big.bin")] + [(sys.argv[3], f"venv/small_{index}.py") for index in range(50)]
+with zipfile.ZipFile(sys.argv[2], "w", zipfile.ZIP_STORED) as zipf:
+    pack_files(zipf, files, jobs=4, max_memory=64 * 1024 * 1024)
+print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+
+@pytest.mark.skipif(sys.platform != "linux", reason="needs sparse files and ru_maxrss in KB")
+def test_multi_gb_file_packs_in_bounded_memory(tmp_path):
+    big = tmp_path / "big.bin"
+    size = 5 * 1024 * 1024 * 1024 // 2
+    with open(big, "wb") as file:
+        file.truncate(size)
+    small = tmp_path / "small.py"
+    small.write_text("x = 1\n" * 1000)
+    output = tmp_path / "big.zip"
+    result = subprocess.run(
+        [sys.executable, "-c", PACK_SPARSE, str(big), str(output), str(small)],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    try:
+        # stored, so holding the member in memory would take 2.5 GB
+        assert int(result.stdout.strip()) < 300 * 1024
+        with zipfile.ZipFile(output) as zipf:
+            info = zipf.getinfo("venv/big.bin")
+            assert info.file_size == size > zipfile.ZIP64_LIMIT
+            with zipf.open(info) as member:
+                assert member.read(1024) == b"\0" * 1024
+            assert len(zipf.namelist()) == 51
+    finally:
+        output.unlink()
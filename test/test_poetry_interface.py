@@ -1,3 +1,7 @@
+import os
+
+from raypack.poetry_interface import remove_distributions, requirements_for
+
 # import shlex
 # import subprocess
 # from unittest.mock import patch, call, Mock
@@ -38,3 +42,30 @@
 #         # Verify logger.debug calls
 #         expected_log_calls = [call(f"Command: {command}") for command in raypack.poetry_interface.NATIVE_COMMANDS]
 #         mock_logger.debug.assert_has_calls(expected_log_calls, any_order=False)
+
+
+def test_remove_distributions_uses_record(tmp_path):
+    for name, files in (("gone", ["gone/__init__.py", "gone/sub/data.txt"]), ("kept", ["kept.py"])):
+        dist_info = f"{name}-1.0.dist-info"
+        os.makedirs(tmp_path / dist_info)
+        (tmp_path / dist_info / "METADATA").write_text(f"Name: {name}\nVersion: 1.0\n")
+        record = [*files, f"{dist_info}/METADATA", f"{dist_info}/RECORD"]
+        (tmp_path / dist_info / "RECORD").write_text("".join(f"{path},,\n" for path in record))
+        for path in files:
+            os.makedirs((tmp_path / path).parent, exist_ok=True)
+            (tmp_path / path).write_text("")
+    # not in RECORD, so it stays, and so does its folder
+    (tmp_path / "gone" / "local.cfg").write_text("")
+
+    assert remove_distributions(str(tmp_path), {"gone"}) == ["gone"]
+    assert sorted(os.listdir(tmp_path)) == ["gone", "kept-1.0.dist-info", "kept.py"]
+    assert os.listdir(tmp_path / "gone") == ["local.cfg"]
+
+
+def test_requirements_for_picks_lines_by_name(tmp_path):
+    (tmp_path / "requirements.txt").write_text(
+        'Typing_Extensions==4.8.0 ; python_version >= "3.9"\nrequests==2.31.0\nurllib3==2.0.7\n'
+    )
+    output = tmp_path / "changed.txt"
+    assert requirements_for(str(tmp_path / "requirements.txt"), {"typing_extensions", "urllib3"}, str(output)) == 2
+    assert output.read_text() == 'Typing_Extensions==4.8.0 ; python_version >= "3.9"\nurllib3==2.0.7\n'
@@ -0,0 +1,47 @@
+import json
+import os
+import shlex
+import sys
+
+from raypack import profiling
+from raypack.poetry_interface import run_commands
+from raypack.profiling import phase
+
+
+def test_phase_without_profiling_is_not_recorded():
+    with phase("nothing") as current:
+        current.add(1, 10)
+    assert profiling._ACTIVE.profiler is None
+
+
+def test_nested_phases_written_as_json(tmp_path):
+    path = str(tmp_path / "profile.json")
+    with profiling.profiling(path), phase("outer") as outer:
+        outer.add(3, 3 * 1024 * 1024)
+        with phase("inner", detail="x"):
+            sum(range(100_000))
+    with open(path, encoding="utf-8") as file:
+        report = json.load(file)
+    phases = {row["name"]: row for row in report["phases"]}
+    assert [row["name"] for row in report["phases"]] == ["total", "outer", "inner"]
+    assert phases["outer"]["depth"] == 1 and phases["inner"]["depth"] == 2
+    assert phases["outer"]["files"] == 3 and phases["outer"]["bytes"] == 3 * 1024 * 1024
+    assert phases["outer"]["mb_per_second"] > 0
+    assert phases["inner"]["details"] == {"detail": "x"}
+    assert phases["outer"]["wall_seconds"] >= phases["inner"]["wall_seconds"]
+    assert profiling._ACTIVE.profiler is None
+
+
+def test_run_commands_recorded_with_child_cpu(tmp_path):
+    path = str(tmp_path / "trace.json")
+    command = shlex.join([sys.executable, "-c", "sum(range(3_000_000))"])
+    with profiling.profiling(path, "chrome", use_cprofile=True):
+        run_commands([command], os.environ.copy())
+    with open(path, encoding="utf-8") as file:
+        trace = json.load(file)
+    events = {event["name"]: event for event in trace["traceEvents"]}
+    event = events[f"command: {command}"]
+    assert event["ph"] == "X"
+    assert event["dur"] > 0
+    assert event["args"]["child_cpu_seconds"] > 0
+    assert os.path.exists(f"{path}.pstats")
@@ -0,0 +1,70 @@
+import os
+import zipfile
+
+from raypack.build import zipup_own_module_from_wheel, zipup_virtualenv
+from raypack.config_loading import Config
+from raypack.reproducible import ZIP_EPOCH, diff_archives, reproducible_date_time
+
+
+def make_tree(root, names):
+    for name in names:
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(f"# {name}\n")
+    return str(root)
+
+
+def make_wheel(path):
+    with zipfile.ZipFile(path, "w") as whl:
+        whl.writestr("mypackage/__init__.py", "")
+        whl.writestr("mypackage/cli.py", "print('hi')")
+        whl.writestr("mypackage-1.0.dist-info/METADATA", "Name: mypackage")
+
+
+def build(venv_path, wheel, output, date_time):
+    config = Config(deterministic=True, pack_jobs=1)
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as zipf:
+        zipup_virtualenv(config, [], "venv", venv_path, zipf, date_time=date_time)
+        zipup_own_module_from_wheel(wheel, "venv", zipf, None, date_time)
+
+
+def test_reproducible_date_time(monkeypatch):
+    monkeypatch.delenv("SOURCE_DATE_EPOCH", raising=False)
+    assert reproducible_date_time() == ZIP_EPOCH
+    monkeypatch.setenv("SOURCE_DATE_EPOCH", "1700000000")
+    assert reproducible_date_time() == (2023, 11, 14, 22, 13, 20)
+    monkeypatch.setenv("SOURCE_DATE_EPOCH", "0")
+    assert reproducible_date_time() == ZIP_EPOCH
+
+
+def test_deterministic_builds_are_identical(tmp_path):
+    names = ["b/module.py", "a/__init__.py", "a/z.py", "c.py"]
+    first = make_tree(tmp_path / "first", names)
+    # same content, created in another order with other timestamps and permissions
+    second = make_tree(tmp_path / "second", list(reversed(names)))
+    os.utime(os.path.join(second, "c.py"), (1_000_000_000, 1_000_000_000))
+    os.chmod(os.path.join(second, "a", "z.py"), 0o600)
+    wheel = str(tmp_path / "mypackage-1.0-py3-none-any.whl")
+    make_wheel(wheel)
+
+    build(first, wheel, tmp_path / "first.zip", ZIP_EPOCH)
+    build(second, wheel, tmp_path / "second.zip", ZIP_EPOCH)
+
+    assert diff_archives(str(tmp_path / "first.zip"), str(tmp_path / "second.zip")) == []
+    with zipfile.ZipFile(tmp_path / "first.zip") as zipf:
+        assert zipf.namelist() == sorted(f"venv/{name}" for name in names) + [
+            "venv/mypackage/__init__.py",
+            "venv/mypackage/cli.py",
+        ]
+        assert {info.date_time for info in zipf.infolist()} == {ZIP_EPOCH}
+
+
+def test_diff_archives_reports_differences(tmp_path):
+    with zipfile.ZipFile(tmp_path / "a.zip", "w") as zipf:
+        zipf.writestr("x.py", "1")
+    with zipfile.ZipFile(tmp_path / "b.zip", "w") as zipf:
+        zipf.writestr("x.py", "2")
+        zipf.writestr("y.py", "")
+    differences = diff_archives(str(tmp_path / "a.zip"), str(tmp_path / "b.zip"))
+    assert any("only in" in difference and "y.py" in difference for difference in differences)
+    assert any(difference.startswith("x.py: CRC") for difference in differences)
@@ -0,0 +1,71 @@
+import os
+import zipfile
+
+from raypack.runtime_baseline import (
+    available_baselines,
+    exclude_runtime_provided,
+    exclude_runtime_provided_wheels,
+    is_compatible,
+    load_baseline,
+)
+from raypack.scanner import scan_tree
+
+
+def install(site_packages, name, version, files):
+    dist_info = site_packages / f"{name}-{version}.dist-info"
+    dist_info.mkdir(parents=True)
+    (dist_info / "METADATA").write_text(f"Metadata-Version: 2.1\nName: {name}\nVersion: {version}\n")
+    record = []
+    for path, content in files.items():
+        (site_packages / path).parent.mkdir(parents=True, exist_ok=True)
+        (site_packages / path).write_text(content)
+        record.append(f"{path},sha256=x,{len(content)}")
+    record += [f"{dist_info.name}/METADATA,,", f"{dist_info.name}/RECORD,,", f"../../bin/{name},,"]
+    (dist_info / "RECORD").write_text("\n".join(record) + "\n")
+
+
+def test_load_shipped_baseline():
+    assert "glue-ray-2023-11-07" in available_baselines()
+    baseline = load_baseline()
+    assert baseline["numpy"] == "1.24.3"
+    assert baseline["typing_extensions"] == "4.5.0"
+    assert baseline["pyamazoncacerts"] == "1.0"
+
+
+def test_is_compatible():
+    assert is_compatible("1.24.3", "1.24.3")
+    assert is_compatible("2.0", "2.0.0")
+    # a pinned patch or security release is not what the runtime has
+    assert not is_compatible("1.24.4", "1.24.3")
+    assert not is_compatible("1.24.3", "1.24.3.post1")
+    assert not is_compatible("1.26.0", "1.24.3")
+    assert not is_compatible("dev", "1.24.3")
+
+
+def test_exclude_runtime_provided(tmp_path):
+    site_packages = tmp_path / "site-packages"
+    baseline = tmp_path / "baseline.txt"
+    baseline.write_text("# runtime\nnumpy==1.24.3\ngoogle-auth==2.18.0\nsix==1.16.0\n")
+    install(site_packages, "numpy", "1.24.3", {"numpy/__init__.py": "x" * 1000, "numpy/core/_core.so": "y" * 500})
+    # namespace package shared with something the runtime doesn't have
+    install(site_packages, "google-auth", "2.18.0", {"google/auth/__init__.py": "auth"})
+    install(site_packages, "google-cloud-storage", "2.0.0", {"google/cloud/storage.py": "storage"})
+    install(site_packages, "six", "1.16.1", {"six.py": "six"})
+
+    index, report = exclude_runtime_provided(scan_tree(str(site_packages)), str(baseline))
+
+    packaged = sorted(entry.relpath for entry in index.files if ".dist-info" not in entry.relpath)
+    assert packaged == [os.path.join("google", "cloud", "storage.py"), "six.py"]
+    assert sorted(distribution.name for distribution in report.excluded) == ["google-auth", "numpy"]
+    assert report.conflicts == [("six", "1.16.1", "1.16.0")]
+    assert report.bytes_saved > 1500
+
+
+def test_exclude_runtime_provided_wheels(tmp_path):
+    wheels = [str(tmp_path / "numpy-1.24.3-py3-none-any.whl"), str(tmp_path / "mylib-1.0-py3-none-any.whl")]
+    for wheel in wheels:
+        with zipfile.ZipFile(wheel, "w") as whl:
+            whl.writestr("module.py", "")
+    kept, report = exclude_runtime_provided_wheels(wheels)
+    assert kept == wheels[1:]
+    assert [distribution.name for distribution in report.excluded] == ["numpy"]
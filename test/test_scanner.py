@@ -0,0 +1,44 @@
+import os
+
+from raypack.scanner import SuffixMatcher, scan_tree
+
+
+def make_tree(root):
+    for name in ["a/b/c.py", "a/d.py", "e.py", "f/g/h/i.txt", "pip/j.py", "pip/sub/k.py"]:
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(name)
+
+
+def test_scan_tree_matches_os_walk_order(tmp_path):
+    make_tree(tmp_path)
+    walked = [os.path.join(folder, name) for folder, _dirs, files in os.walk(str(tmp_path)) for name in files]
+    index = scan_tree(str(tmp_path))
+    assert [entry.path for entry in index.files] == walked
+    assert index.folders == [folder for folder, _dirs, _files in os.walk(str(tmp_path))]
+    assert {entry.relpath for entry in index.files} >= {os.path.join("a", "b", "c.py"), "e.py"}
+
+
+def test_scan_tree_descend(tmp_path):
+    make_tree(tmp_path)
+    excluded = SuffixMatcher(["pip"])
+    index = scan_tree(str(tmp_path), descend=lambda folder: not excluded(folder))
+    relpaths = {entry.relpath for entry in index.files}
+    assert os.path.join("pip", "j.py") in relpaths
+    assert os.path.join("pip", "sub", "k.py") not in relpaths
+
+
+def test_subindex(tmp_path):
+    make_tree(tmp_path)
+    index = scan_tree(str(tmp_path)).subindex(str(tmp_path / "f"))
+    assert [entry.relpath for entry in index.files] == [os.path.join("g", "h", "i.txt")]
+    assert index.find_folder("h") == str(tmp_path / "f" / "g" / "h")
+
+
+def test_suffix_matcher():
+    matcher = SuffixMatcher([".so", ".pyd"])
+    assert matcher("lib/_speedups.so")
+    assert not matcher("lib/_speedups.so.1")
+    assert not matcher("lib/module.py")
+    assert not SuffixMatcher([])("anything")
+    assert SuffixMatcher([".SO"], ignore_case=True)("x.so")
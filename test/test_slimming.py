@@ -0,0 +1,84 @@
+import _ctypes
+import os
+import shutil
+
+import pytest
+
+from raypack.build import DEFAULT_EXCLUSIONS, prepare_venv_index
+from raypack.config_loading import Config
+from raypack.slimming import STRIP_DIR, Slimmer, find_strip_tool, rules_for
+
+
+def make_site_packages(root):
+    files = {
+        "pkg/__init__.py": "x = 1\n",
+        "pkg/__init__.pyi": "x: int\n" * 10,
+        "pkg/py.typed": "",
+        "pkg/_speedups.c": "int main;\n" * 50,
+        "pkg/README.md": "# pkg\n",
+        "pkg/tests/test_pkg.py": "def test(): pass\n" * 20,
+        "pkg/locale/de/messages.mo": "de" * 100,
+        "pkg/contest.py": "not a test folder\n",
+    }
+    for path, content in files.items():
+        (root / path).parent.mkdir(parents=True, exist_ok=True)
+        (root / path).write_text(content)
+
+
+def slim(config):
+    slimmer = Slimmer(rules_for(config.slimming, config.slimming_rules))
+    return prepare_venv_index(config, DEFAULT_EXCLUSIONS, slimmer, install=False), slimmer
+
+
+def kept(index):
+    return sorted(entry.relpath.replace(os.sep, "/") for entry in index.files)
+
+
+def test_safe_rules(tmp_path):
+    make_site_packages(tmp_path)
+    index, slimmer = slim(Config(source_venv=str(tmp_path), slimming="safe"))
+    assert kept(index) == ["pkg/__init__.py", "pkg/contest.py", "pkg/locale/de/messages.mo", "pkg/tests/test_pkg.py"]
+    assert slimmer.savings["type stubs"].files == 2
+    assert slimmer.savings["c sources"].size == len("int main;\n" * 50)
+
+
+def test_aggressive_and_custom_rules(tmp_path):
+    make_site_packages(tmp_path)
+    index, slimmer = slim(
+        Config(source_venv=str(tmp_path), slimming="aggressive", slimming_rules={"locales": ["*/locale/*"]})
+    )
+    assert kept(index) == ["pkg/__init__.py", "pkg/contest.py"]
+    assert slimmer.savings["locales"].files == 1
+    assert slimmer.savings["tests"].files == 1
+    assert "total" in slimmer.report()
+
+
+def test_unknown_rule_set():
+    with pytest.raises(ValueError, match="slimming must be one of"):
+        rules_for("extreme")
+
+
+def test_drop_counts_wheel_members():
+    slimmer = Slimmer(rules_for("safe"))
+    assert slimmer.drop("numpy/__init__.pyi", 100)
+    assert not slimmer.drop("numpy/__init__.py", 100)
+    assert slimmer.savings["type stubs"].size == 100
+
+
+@pytest.mark.skipif(find_strip_tool() is None, reason="no strip on PATH")
+def test_strip_shared_libraries_uses_staged_copies(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    site_packages = tmp_path / "site-packages"
+    site_packages.mkdir()
+    library = site_packages / os.path.basename(_ctypes.__file__)
+    shutil.copyfile(_ctypes.__file__, library)
+    before = library.read_bytes()
+
+    index, slimmer = slim(Config(source_venv=str(site_packages), strip_binaries=True))
+
+    assert library.read_bytes() == before
+    (entry,) = index.files
+    assert entry.path == str(tmp_path / STRIP_DIR / library.name)
+    assert entry.relpath == library.name
+    assert entry.size <= len(before)
+    assert slimmer.savings["strip debug symbols"].files == 1
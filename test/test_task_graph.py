@@ -0,0 +1,95 @@
+import os
+import shlex
+import sys
+import time
+
+import pytest
+
+from raypack.task_graph import CommandFailed, Task, chain, check_graph, run_task_graph
+
+
+def python(code: str) -> str:
+    return shlex.join([sys.executable, "-c", code])
+
+
+def test_independent_tasks_overlap():
+    tasks = [Task("a", python("import time; time.sleep(0.5)")), Task("b", python("import time; time.sleep(0.5)"))]
+    started = time.perf_counter()
+    results = run_task_graph(tasks, os.environ.copy())
+    assert time.perf_counter() - started < 0.9
+    assert {name: result.returncode for name, result in results.items()} == {"a": 0, "b": 0}
+
+
+def test_needs_run_first(tmp_path):
+    marker = tmp_path / "marker"
+    tasks = [
+        Task("check", python(f"import os, sys; sys.exit(0 if os.path.exists({str(marker)!r}) else 3)"), ["write"]),
+        Task("write", python(f"import time; time.sleep(0.2); open({str(marker)!r}, 'w').close()")),
+    ]
+    results = run_task_graph(tasks, os.environ.copy())
+    assert results["check"].returncode == 0
+
+
+def test_output_streamed_with_task_name(capsys):
+    run_task_graph([Task("talk", python("print('one'); print('two')"))], os.environ.copy())
+    out = capsys.readouterr().out
+    assert "[talk] one\n[talk] two\n" in out
+
+
+def test_timeout_stops_command():
+    started = time.perf_counter()
+    with pytest.raises(CommandFailed) as error:
+        run_task_graph([Task("slow", python("import time; time.sleep(30)"))], os.environ.copy(), timeout=0.5)
+    assert error.value.result.timed_out
+    assert time.perf_counter() - started < 10
+
+
+def test_failure_cancels_running_and_pending():
+    tasks = [
+        Task("fails", python("import sys; print('broken'); sys.exit(2)")),
+        Task("slow", python("import time; time.sleep(30)")),
+        Task("after", python("pass"), ["fails"]),
+    ]
+    started = time.perf_counter()
+    with pytest.raises(CommandFailed) as error:
+        run_task_graph(tasks, os.environ.copy(), stream=False)
+    assert time.perf_counter() - started < 10
+    assert error.value.result.name == "fails"
+    assert error.value.result.returncode == 2
+    assert error.value.result.output == "broken"
+
+
+def test_failure_cancels_graphs_run_by_callables():
+    finished = []
+
+    def nested():
+        run_task_graph(
+            [Task("nested slow", python("import time; time.sleep(30)")), Task("nested after", python("pass"))],
+            os.environ.copy(),
+            max_workers=1,
+            stream=False,
+        )
+        finished.append("nested")
+
+    tasks = [Task("fails", python("import sys, time; time.sleep(0.5); sys.exit(2)")), Task("nested", nested)]
+    started = time.perf_counter()
+    with pytest.raises(CommandFailed) as error:
+        run_task_graph(tasks, os.environ.copy(), stream=False)
+    assert time.perf_counter() - started < 10
+    assert error.value.result.name == "fails"
+    assert finished == []
+
+
+def test_callables_and_chain():
+    calls = []
+    tasks = chain([lambda: calls.append(1), python("pass")])
+    assert tasks[1].needs == [tasks[0].name]
+    run_task_graph(tasks, os.environ.copy())
+    assert calls == [1]
+
+
+def test_check_graph_rejects_cycles_and_unknown_needs():
+    with pytest.raises(ValueError, match="cycle"):
+        check_graph([Task("a", "x", ["b"]), Task("b", "x", ["a"])])
+    with pytest.raises(ValueError, match="unknown"):
+        check_graph([Task("a", "x", ["missing"])])
@@ -0,0 +1,57 @@
+import os
+import sys
+
+import pytest
+
+from raypack import build, uv_interface
+from raypack.config_loading import Config
+from raypack.uv_interface import install_command
+
+
+def test_install_command_targets_glue_off_linux_aarch64(tmp_path, monkeypatch):
+    monkeypatch.setattr(uv_interface, "building_on_aarch64", lambda: False)
+    command = install_command("requirements-uv.txt", "vendor", str(tmp_path), no_deps=True)
+    assert command[:7] == ["uv", "pip", "install", "-r", "requirements-uv.txt", "--target", "vendor"]
+    assert command[command.index("--python-platform") + 1] == "aarch64-manylinux2014"
+    assert command[command.index("--python-version") + 1] == f"{sys.version_info.major}.{sys.version_info.minor}"
+    assert "--no-deps" in command
+    assert command[-3:] == ["--no-index", "--find-links", str(tmp_path)]
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="a shell script stands in for the target python")
+def test_install_command_targets_the_configured_python(tmp_path):
+    host = f"{sys.version_info.major}.{sys.version_info.minor}"
+    target = "3.9" if host != "3.9" else "3.10"
+    command = install_command("requirements-uv.txt", "vendor", target_python=target)
+    assert command[command.index("--python-version") + 1] == target
+
+    # a path is asked for its version
+    python = tmp_path / "python"
+    python.write_text(f"#!/bin/sh\necho {target}\n")
+    python.chmod(0o755)
+    command = install_command("requirements-uv.txt", "vendor", target_python=str(python))
+    assert command[command.index("--python-version") + 1] == target
+
+
+def test_install_command_native_on_linux_aarch64(monkeypatch):
+    monkeypatch.setattr(uv_interface, "building_on_aarch64", lambda: True)
+    monkeypatch.setattr(sys, "platform", "linux")
+    command = install_command("requirements-uv.txt", "vendor")
+    assert "--python-platform" not in command
+    assert "--only-binary" not in command
+
+
+def test_uv_venv_tool_fingerprints_uv_lock(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "uv.lock").write_text('version = 1\n\n[[package]]\nname = "six"\nversion = "1.16.0"\n')
+    calls = []
+
+    def create(venv_path, *_args, **_kwargs):
+        os.makedirs(venv_path)
+        calls.append(venv_path)
+
+    monkeypatch.setattr(uv_interface, "create_venv", create)
+    config = Config(source_venv="vendor", venv_tool="uv")
+    build.install_dependencies(config, "vendor")
+    build.install_dependencies(config, "vendor")
+    assert calls == ["vendor"]
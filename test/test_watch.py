@@ -0,0 +1,156 @@
+import os
+import sys
+import zipfile
+
+import pytest
+
+from raypack import build
+from raypack.compression import CompressionPolicy
+from raypack.config_loading import Config
+from raypack.pyproject_interface import current_pyproject_toml, own_package_dirs
+from raypack.watch import InotifyWatcher, LiveZip, PollingWatcher, WatchSession
+
+DATE_TIME = (2020, 1, 1, 0, 0, 0)
+
+
+def make_files(root, names):
+    files = []
+    for name in names:
+        path = root / name
+        if not path.exists():
+            path.write_text(f"# {name}\n" * 50)
+        files.append((str(path), f"venv/{name}"))
+    return files
+
+
+def fresh_build(tmp_path, files):
+    path = str(tmp_path / "fresh.zip")
+    live = LiveZip(path, CompressionPolicy(), DATE_TIME, jobs=2)
+    live.build(files)
+    live.close()
+    with open(path, "rb") as file:
+        return file.read()
+
+
+def test_update_matches_fresh_build(tmp_path):
+    files = make_files(tmp_path, ["a.py", "b.py", "c.py", "d.py"])
+    path = str(tmp_path / "live.zip")
+    live = LiveZip(path, CompressionPolicy(), DATE_TIME, jobs=2)
+    assert live.build(files) == 4
+    assert live.update(files, set()) == 0
+
+    # a change to the last member only rewrites it
+    (tmp_path / "d.py").write_text("changed = True\n")
+    assert live.update(files, {"venv/d.py"}) == 1
+    with open(path, "rb") as file:
+        assert file.read() == fresh_build(tmp_path, files)
+
+    # a new member in the middle, the ones after it are copied back as they were
+    files = make_files(tmp_path, ["a.py", "b.py", "bb.py", "c.py", "d.py"])
+    assert live.update(files, {"venv/bb.py"}) == 3
+    with open(path, "rb") as file:
+        assert file.read() == fresh_build(tmp_path, files)
+
+    # and one gone
+    files = [item for item in files if item[1] != "venv/bb.py"]
+    assert live.update(files, set()) == 2
+    with zipfile.ZipFile(path) as zipf:
+        assert zipf.testzip() is None
+        assert zipf.namelist() == ["venv/a.py", "venv/b.py", "venv/c.py", "venv/d.py"]
+    live.close()
+    with open(path, "rb") as file:
+        assert file.read() == fresh_build(tmp_path, files)
+
+
+def test_update_rebuilds_when_tail_is_over_memory(tmp_path):
+    files = make_files(tmp_path, ["a.py", "b.py", "c.py"])
+    live = LiveZip(str(tmp_path / "live.zip"), CompressionPolicy(), DATE_TIME, max_memory=10)
+    live.build(files)
+    assert live.update(files, {"venv/a.py"}) == 3
+    live.close()
+
+
+def test_session_rebuilds_own_package(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    current_pyproject_toml.cache_clear()
+    (tmp_path / "pyproject.toml").write_text('[tool.poetry]\nname = "my-proj"\nversion = "0.1.0"\n')
+    os.makedirs("vendor/dep")
+    (tmp_path / "vendor" / "dep" / "__init__.py").write_text("VALUE = 1\n")
+    os.makedirs("my_proj/sub/__pycache__")
+    (tmp_path / "my_proj" / "__init__.py").write_text("")
+    (tmp_path / "my_proj" / "sub" / "job.py").write_text("print('v1')\n")
+    (tmp_path / "my_proj" / "sub" / "__pycache__" / "job.cpython-311.pyc").write_bytes(b"stale")
+    assert own_package_dirs() == ["my_proj"]
+
+    config = Config(source_venv="vendor", binary_check="off", deterministic=True)
+    session = WatchSession(config, str(tmp_path / "out.zip"))
+    try:
+        assert session.initial_build() == 3
+        job = tmp_path / "my_proj" / "sub" / "job.py"
+        job.write_text("print('v2, longer than before')\n")
+        assert session.rebuild({str(job)}) == (1, 1)
+        with zipfile.ZipFile(tmp_path / "out.zip") as zipf:
+            assert zipf.namelist() == ["venv/dep/__init__.py", "venv/my_proj/__init__.py", "venv/my_proj/sub/job.py"]
+            assert zipf.read("venv/my_proj/sub/job.py") == b"print('v2, longer than before')\n"
+
+        (tmp_path / "vendor" / "dep" / "extra.py").write_text("")
+        changed, written = session.rebuild({str(tmp_path / "vendor" / "dep" / "extra.py")})
+        assert changed == 1
+        assert written == 3
+        with zipfile.ZipFile(tmp_path / "out.zip") as zipf:
+            assert "venv/dep/extra.py" in zipf.namelist()
+    finally:
+        session.close()
+        current_pyproject_toml.cache_clear()
+
+
+def test_session_installs_only_when_the_lock_file_changes(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    current_pyproject_toml.cache_clear()
+    (tmp_path / "pyproject.toml").write_text('[tool.poetry]\nname = "my-proj"\nversion = "0.1.0"\n')
+    (tmp_path / "poetry.lock").write_text('[[package]]\nname = "dep"\nversion = "1.0"\n')
+    os.makedirs("vendor/dep")
+    (tmp_path / "vendor" / "dep" / "__init__.py").write_text("")
+    installs = []
+    monkeypatch.setattr(build, "install_dependencies", lambda _config, venv_name: installs.append(venv_name))
+
+    session = WatchSession(Config(source_venv="vendor", binary_check="off"), str(tmp_path / "out.zip"))
+    try:
+        session.initial_build()
+        assert installs == ["vendor"]
+        (tmp_path / "vendor" / "dep" / "extra.py").write_text("")
+        assert session.rebuild({str(tmp_path / "vendor" / "dep" / "extra.py")})[0] == 1
+        assert installs == ["vendor"]
+
+        (tmp_path / "poetry.lock").write_text('[[package]]\nname = "dep"\nversion = "2.0"\n')
+        (tmp_path / "vendor" / "dep" / "more.py").write_text("")
+        session.rebuild({str(tmp_path / "vendor" / "dep" / "more.py")})
+        assert installs == ["vendor", "vendor"]
+    finally:
+        session.close()
+        current_pyproject_toml.cache_clear()
+
+
+@pytest.mark.parametrize("watcher_type", ["inotify", "poll"])
+def test_watcher_sees_changes_and_new_folders(tmp_path, watcher_type):
+    if watcher_type == "inotify" and not sys.platform.startswith("linux"):
+        pytest.skip("inotify is Linux only")
+    (tmp_path / "module.py").write_text("")
+    watcher = (
+        InotifyWatcher([str(tmp_path)]) if watcher_type == "inotify" else PollingWatcher([str(tmp_path)], interval=0.01)
+    )
+    try:
+        assert watcher.wait(0.05) == set()
+        (tmp_path / "module.py").write_text("x = 1\n")
+        assert str(tmp_path / "module.py") in watcher.wait(2)
+
+        (tmp_path / "sub").mkdir()
+        watcher.wait(0.2)
+        (tmp_path / "sub" / "new.py").write_text("y = 2\n")
+        changed = watcher.wait(2)
+        while str(tmp_path / "sub" / "new.py") not in changed:
+            more = watcher.wait(2)
+            assert more
+            changed |= more
+    finally:
+        watcher.close()
@@ -0,0 +1,80 @@
+import os
+import zipfile
+
+import pytest
+
+from raypack.poetry_interface import fetch_wheels, wheel_source_args
+from raypack.wheel_cache import WheelCache, parse_wheel_filename
+
+
+def make_wheel(folder, filename, size=100):
+    path = os.path.join(folder, filename)
+    name, version = filename.split("-")[:2]
+    with zipfile.ZipFile(path, "w") as whl:
+        whl.writestr(f"{name}/__init__.py", "#" * size)
+        dist_info = f"{name}-{version}.dist-info"
+        whl.writestr(f"{dist_info}/METADATA", f"Metadata-Version: 2.1\nName: {name}\nVersion: {version}\n")
+        whl.writestr(f"{dist_info}/WHEEL", "Wheel-Version: 1.0\nRoot-Is-Purelib: true\nTag: py3-none-any\n")
+        whl.writestr(f"{dist_info}/RECORD", "")
+    return path
+
+
+def test_parse_wheel_filename():
+    assert parse_wheel_filename("Foo.Bar-1.0-py3-none-any.whl") == ("foo_bar", "1.0", "py3", "any")
+    assert parse_wheel_filename("numpy-1.26.1-1-cp311-cp311-manylinux2014_aarch64.whl") == (
+        "numpy",
+        "1.26.1",
+        "cp311",
+        "manylinux2014_aarch64",
+    )
+    with pytest.raises(ValueError, match="Not a wheel"):
+        parse_wheel_filename("numpy-1.26.1.tar.gz")
+
+
+def test_add_and_prune_least_recently_used(tmp_path):
+    source = tmp_path / "downloads"
+    source.mkdir()
+    cache = WheelCache(str(tmp_path / "cache"))
+    paths = [make_wheel(str(source), f"pkg{number}-1.0-py3-none-any.whl", 50_000) for number in range(3)]
+    assert cache.add(paths) == [os.path.basename(path) for path in paths]
+    assert cache.add(paths[:1]) == []
+    assert sorted(entry.filename for entry in cache.entries()) == [os.path.basename(path) for path in paths]
+
+    # pkg1 used last, pkg0 before it, pkg2 oldest
+    cache.touch(["pkg2-1.0-py3-none-any.whl"])
+    cache.touch(["pkg0-1.0-py3-none-any.whl"])
+    cache.touch(["pkg1-1.0-py3-none-any.whl"])
+    one_wheel = cache.entries()[0].size
+    removed = cache.prune(one_wheel * 2)
+    assert [entry.filename for entry in removed] == ["pkg2-1.0-py3-none-any.whl"]
+    assert [entry.filename for entry in cache.entries()] == ["pkg1-1.0-py3-none-any.whl", "pkg0-1.0-py3-none-any.whl"]
+
+    assert cache.clear() == 2
+    assert cache.entries() == []
+
+
+def test_wheel_source_args(tmp_path):
+    assert wheel_source_args("") == []
+    assert wheel_source_args(str(tmp_path)) == ["--no-index", "--find-links", str(tmp_path)]
+    assert wheel_source_args("file:///srv/wheels") == ["--no-index", "--find-links", "file:///srv/wheels"]
+    assert wheel_source_args("https://pypi.example.com/simple") == ["--index-url", "https://pypi.example.com/simple"]
+
+
+def test_fetch_wheels_from_local_index_then_cache(tmp_path):
+    index = tmp_path / "index"
+    index.mkdir()
+    make_wheel(str(index), "pkg0-1.0-py3-none-any.whl")
+    requirements = tmp_path / "requirements.txt"
+    requirements.write_text("pkg0==1.0\n")
+    cache = WheelCache(str(tmp_path / "cache"))
+
+    first = tmp_path / "first"
+    fetch_wheels(str(requirements), str(first), os.environ.copy(), cache=cache, index=str(index))
+    assert os.listdir(first) == ["pkg0-1.0-py3-none-any.whl"]
+    assert [entry.filename for entry in cache.entries()] == ["pkg0-1.0-py3-none-any.whl"]
+
+    # index is gone, the cache is enough
+    os.remove(index / "pkg0-1.0-py3-none-any.whl")
+    second = tmp_path / "second"
+    fetch_wheels(str(requirements), str(second), os.environ.copy(), cache=cache)
+    assert os.listdir(second) == ["pkg0-1.0-py3-none-any.whl"]
@@ -0,0 +1,54 @@
+import sys
+import zipfile
+
+import pytest
+
+from raypack.wheels import copy_wheel_member, find_wheels, iter_wheel_members, site_packages_path
+
+
+def test_site_packages_path():
+    assert site_packages_path("example/__init__.py") == "example/__init__.py"
+    assert site_packages_path("example-1.0.dist-info/METADATA") is None
+    assert site_packages_path("example-1.0.data/purelib/example/extra.py") == "example/extra.py"
+    assert site_packages_path("example-1.0.data/platlib/_example.so") == "_example.so"
+    assert site_packages_path("example-1.0.data/scripts/example") is None
+    assert site_packages_path("example/") == "example/"
+
+
+def test_find_and_iterate_wheels(tmp_path):
+    assert find_wheels(str(tmp_path / "missing")) == []
+    for name in ["b-1.0-py3-none-any.whl", "a-1.0-py3-none-any.whl"]:
+        with zipfile.ZipFile(tmp_path / name, "w") as whl:
+            whl.writestr("z.py", "")
+            whl.writestr("a.py", "")
+            whl.writestr("a-1.0.dist-info/RECORD", "")
+    (tmp_path / "notes.txt").write_text("not a wheel")
+
+    wheels = find_wheels(str(tmp_path))
+    assert [path.rsplit("/", 1)[-1] for path in wheels] == ["a-1.0-py3-none-any.whl", "b-1.0-py3-none-any.whl"]
+    with zipfile.ZipFile(wheels[0]) as whl:
+        assert [path for _info, path in iter_wheel_members(whl, sort=True)] == ["a.py", "z.py"]
+
+
+@pytest.mark.skipif(sys.platform != "linux", reason="needs sparse files")
+def test_member_over_zip64_limit_is_streamed(tmp_path):
+    size = 5 * 1024 * 1024 * 1024 // 2
+    big = tmp_path / "big.so"
+    with open(big, "wb") as file:
+        file.truncate(size)
+    wheel = tmp_path / "big-1.0-cp311-cp311-linux_aarch64.whl"
+    with zipfile.ZipFile(wheel, "w", zipfile.ZIP_DEFLATED, compresslevel=1) as whl:
+        whl.write(big, "big/_big.so")
+    big.unlink()
+    output = tmp_path / "big.zip"
+    try:
+        # stored in the zip, deflated in the wheel, so it is streamed through zipfile
+        with zipfile.ZipFile(wheel) as whl, zipfile.ZipFile(output, "w", zipfile.ZIP_STORED) as zipf:
+            assert not copy_wheel_member(whl, whl.getinfo("big/_big.so"), "venv/big/_big.so", zipf)
+        with zipfile.ZipFile(output) as zipf:
+            info = zipf.getinfo("venv/big/_big.so")
+            assert info.file_size == size > zipfile.ZIP64_LIMIT
+            with zipf.open(info) as member:
+                assert member.read(1024) == b"\0" * 1024
+    finally:
+        output.unlink(missing_ok=True)